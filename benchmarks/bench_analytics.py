@@ -0,0 +1,214 @@
+"""
+Benchmark the sales report over millions of transactions.
+
+Usage: python benchmarks/bench_analytics.py [transactions] [tickets]
+
+Files of the given numbers of transactions and tickets are written, with
+a few percent of the transactions failed and of the tickets still in a
+cart. The report is then made three times:
+- from scratch, reading every file;
+- again with nothing changed, from the totals kept;
+- after one more transaction, which reads the transactions again.
+The time taken and the peak memory are reported, and the revenue, the
+transactions and the tickets sold per event are checked against the
+totals made while writing the files.
+"""
+
+import random
+import resource
+import sys
+import common
+
+import analytics
+import services
+import storage
+
+TRANSACTION_HEADER = [
+    "transaction_id",
+    "username",
+    "bank_name",
+    "bank_reference_number",
+    "transaction_entry_date",
+    "transaction_entry_time",
+    "payment_mode",
+    "card_type",
+    "transaction_amount",
+    "transaction_status",
+]
+TICKET_HEADER = [
+    "ticket_id",
+    "event_name",
+    "event_code",
+    "username",
+    "customer_name",
+    "email_address",
+    "contact_number",
+    "event_venue",
+    "event_date",
+    "event_time",
+    "event_price",
+    "quantity",
+]
+CART_HEADER = [
+    "ticket_id",
+    "event_name",
+    "event_code",
+    "username",
+    "attendee_name",
+    "price",
+    "quantity",
+    "total_price",
+    "reserved_at",
+]
+CUSTOMERS = 100_000
+FAILED_SHARE = 0.03  # Share of the transactions that failed
+CART_SHARE = 0.05  # Share of the tickets still in a cart
+
+
+def write_transactions(count: int) -> tuple:
+    """
+    Write the transactions file.
+
+    Amounts are whole, so that their float totals are exact.
+
+    :param count: int
+    :return: The revenue and number of the successful transactions.
+    """
+    generator = random.Random(1)
+    expected = {"revenue": 0, "transactions": 0}
+
+    def generate_rows():
+        for number in range(1, count + 1):
+            amount = generator.randint(5, 200)
+            successful = generator.random() >= FAILED_SHARE
+            if successful:
+                expected["revenue"] += amount
+                expected["transactions"] += 1
+            yield [
+                str(number),
+                f"user{generator.randrange(CUSTOMERS)}",
+                "Maybank",
+                str(1000000000 + number),
+                f"2023-{generator.randint(1, 12):02d}-{generator.randint(1, 28):02d}",
+                "21:45",
+                "Debit Card",
+                "VISA",
+                f"{amount}.00",
+                services.TRANSACTION_STATUS if successful else "FAILED",
+            ]
+
+    common.write_file(services.TRANSACTION_FILE, TRANSACTION_HEADER, generate_rows())
+    return expected["revenue"], expected["transactions"]
+
+
+def write_tickets(count: int, event_codes: list) -> dict:
+    """
+    Write the tickets file and the cart holding some of the tickets.
+
+    :param count: int
+    :param event_codes: The events the tickets are for.
+    :return: The seats sold per event code.
+    """
+    generator = random.Random(2)
+    sold = dict.fromkeys(event_codes, 0)
+    cart_items = []
+
+    def generate_rows():
+        for number in range(1, count + 1):
+            event_code = generator.choice(event_codes)
+            quantity = generator.randint(1, 4)
+            record = [
+                str(number),
+                "Event",
+                event_code,
+                f"user{generator.randrange(CUSTOMERS)}",
+                "Customer",
+                "customer@example.com",
+                "012-3456789",
+                "Online",
+                "2030-01-01",
+                "10:00",
+                "10",
+                str(quantity),
+            ]
+            if generator.random() < CART_SHARE:
+                cart_items.append(
+                    [*record[:4], "Customer", "10", str(quantity), "10.00", "1"]
+                )
+            else:
+                sold[event_code] += quantity
+            yield record
+
+    common.write_file(services.TICKET_FILE, TICKET_HEADER, generate_rows())
+    common.write_file(services.CART_FILE, CART_HEADER, cart_items)
+    return sold
+
+
+def make_report(name: str, rows: int) -> dict:
+    """
+    Make the report and print the time taken and the peak memory.
+
+    :param name: str
+    :param rows: The number of rows in the files.
+    :return: The report.
+    """
+    with common.Timer() as timer:
+        report = analytics.sales_report()
+    common.report(name, rows, timer.seconds, "rows")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{'':<44} peak memory so far {peak:,.0f} MB")
+    return report
+
+
+def main(transactions: int, tickets: int) -> int:
+    """
+    Run the benchmark.
+
+    :param transactions: int
+    :param tickets: int
+    :return: The exit status.
+    """
+    common.sandbox()
+    event_codes = [record[3] for record in storage.iter_rows(services.EVENT_FILE)]
+    revenue, successful = write_transactions(transactions)
+    sold = write_tickets(tickets, event_codes)
+    rows = transactions + tickets
+
+    report = make_report("sales report, from scratch", rows)
+    make_report("sales report, nothing changed", rows)
+    # Appended straight to the file, as by another process, so that the
+    # transactions are not loaded into memory here
+    with storage.file_lock(services.TRANSACTION_FILE):
+        with open(services.TRANSACTION_FILE, "a", encoding="utf-8") as file_writer:
+            file_writer.write(
+                f"{transactions + 1};user0;Maybank;1;2023-12-31;23:59;Debit Card;"
+                f"VISA;100.00;{services.TRANSACTION_STATUS}\n"
+            )
+    new_report = make_report("sales report, one transaction more", transactions)
+
+    problems = []
+    if report["total_revenue"] != revenue:
+        problems.append(f"Revenue is {report['total_revenue']}, expected {revenue}")
+    if report["total_transactions"] != successful:
+        problems.append(
+            f"{report['total_transactions']} transactions, expected {successful}"
+        )
+    if new_report["total_revenue"] != revenue + 100:
+        problems.append("The new transaction is not counted")
+    for event in report["events"]:
+        if event["tickets_sold"] != sold[event["event_code"]]:
+            problems.append(f"Tickets sold of {event['event_code']} are wrong")
+    if problems:
+        print("\n".join(problems))
+        return 1
+    print(f"OK: revenue {revenue:,}, {successful:,} successful transactions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000,
+        )
+    )
@@ -0,0 +1,209 @@
+"""
+Benchmark checkout throughput under the latency of the payment gateway.
+
+Usage: python benchmarks/bench_checkout.py [customers] [items per cart]
+       [gateway latency] [gateway failure rate]
+
+Every customer books a cart of items, and the carts are then paid for
+through the simulated gateway:
+- a few of them one after another, as a session blocked on every payment
+  would;
+- the others all at once, in one event loop, as the server does.
+At the end every transaction recorded must have been paid at the gateway
+and every cart paid for emptied, while a checkout that failed must leave
+its cart as it was. The payments of failed checkouts that the gateway
+could not void either are counted.
+"""
+
+import asyncio
+import sys
+import common
+
+import passwords
+import payments
+import services
+import storage
+
+EVENT_CODE = "PAY"
+SEQUENTIAL_CHECKOUTS = 10  # Carts paid for one after another
+PAYMENT = {"bank_name": "Maybank", "payment_mode": "eWallet", "card_type": "VISA"}
+
+
+def prepare(customers: int, items: int) -> None:
+    """
+    Add the customers, an event and a cart of items for every customer.
+
+    :param customers: int
+    :param items: int
+    :return: None
+    """
+    services.create_events(
+        [
+            {
+                "event_name": "Checkout Test",
+                "event_category": "Food and Drink",
+                "event_code": EVENT_CODE,
+                "event_price": "10",
+                "organizer": "Benchmarks",
+                "start_date": "2030-01-01",
+                "start_time": "10:00",
+                "end_date": "2030-01-01",
+                "end_time": "12:00",
+                "venue": "Online",
+                "total_seats_available": str(customers * items),
+            }
+        ]
+    )
+    # A cheap hash, as the cost of hashing is not what is measured here
+    password_hash = passwords.hash_password("Passw0rd!", 1000)
+    booking = {
+        "event_code": EVENT_CODE,
+        "attendee_name": "Payer",
+        "email_address": "payer@example.com",
+        "contact_number": "012-3456789",
+        "quantity": 1,
+    }
+    for number in range(customers):
+        services.register_member(
+            {
+                "username": f"payer{number}",
+                "password": password_hash,
+                "name": "Payer",
+                "gender": "Male",
+                "birthdate": "1990-01-01",
+                "nationality": "Malaysian",
+                "contact_number": "012-3456789",
+                "email_address": f"payer{number}@example.com",
+            }
+        )
+        services.book_tickets(f"payer{number}", [booking] * items)
+
+
+async def pay(username: str):
+    """
+    Pay for the cart of a customer.
+
+    :param username: str
+    :return: The transactions saved, or the error if the checkout failed.
+    """
+    try:
+        transactions, _ = await services.checkout_async(
+            username,
+            PAYMENT["bank_name"],
+            PAYMENT["payment_mode"],
+            PAYMENT["card_type"],
+        )
+    except services.ServiceError as error:
+        return error
+    return transactions
+
+
+async def pay_one_after_another(usernames: list) -> list:
+    """
+    Pay for carts one after another.
+
+    :param usernames: list
+    :return: The result of every checkout.
+    """
+    return [await pay(username) for username in usernames]
+
+
+async def pay_at_once(usernames: list) -> list:
+    """
+    Pay for carts concurrently.
+
+    :param usernames: list
+    :return: The result of every checkout.
+    """
+    return await asyncio.gather(*(pay(username) for username in usernames))
+
+
+def check(usernames: list, results: list, items: int, gateway) -> list:
+    """
+    Check the transactions, carts and gateway payments after the checkouts.
+
+    :param usernames: list
+    :param results: The result of the checkout of every customer.
+    :param items: The items in every cart.
+    :param gateway: SimulatedGateway
+    :return: The problems found.
+    """
+    problems = []
+    for filename in (services.CART_FILE, services.TRANSACTION_FILE):
+        storage.invalidate(filename)
+    transactions = storage.get_table(services.TRANSACTION_FILE)
+    carts = storage.get_table(services.CART_FILE)
+    paid_ids = set()
+    for username, result in zip(usernames, results):
+        cart_size = len(carts.find_all(3, username))
+        if isinstance(result, Exception):
+            if cart_size != items:
+                problems.append(f"{username}: failed but {cart_size} items in cart")
+            continue
+        paid_ids.update(transaction[0] for transaction in result)
+        if cart_size:
+            problems.append(f"{username}: paid but {cart_size} items in cart")
+        if len(transactions.find_all(1, username)) != items:
+            problems.append(f"{username}: transactions missing")
+    charged_ids = {key[len("transaction-") :] for key in gateway.payments}
+    if paid_ids - charged_ids:
+        problems.append(
+            f"{len(paid_ids - charged_ids)} payment(s) recorded but not taken"
+        )
+    if charged_ids - paid_ids:
+        # Every call to void them failed, which the gateway reported back
+        print(
+            f"{len(charged_ids - paid_ids)} payment(s) of failed checkouts could "
+            f"not be voided in {payments.MAX_ATTEMPTS} calls"
+        )
+    return problems
+
+
+def main(customers: int, items: int, latency: float, failure_rate: float) -> int:
+    """
+    Run the benchmark.
+
+    :param customers: int
+    :param items: int
+    :param latency: float
+    :param failure_rate: float
+    :return: The exit status.
+    """
+    common.sandbox()
+    prepare(customers, items)
+    gateway = payments.SimulatedGateway(latency, failure_rate, seed=1)
+    payments._gateway["instance"] = gateway
+    usernames = [f"payer{number}" for number in range(customers)]
+    sequential = usernames[:SEQUENTIAL_CHECKOUTS]
+    concurrent = usernames[SEQUENTIAL_CHECKOUTS:]
+
+    with common.Timer() as timer:
+        results = asyncio.run(pay_one_after_another(sequential))
+    common.report("checkout, one after another", len(sequential), timer.seconds)
+    with common.Timer() as timer:
+        results += asyncio.run(pay_at_once(concurrent))
+    common.report("checkout, all at once", len(concurrent), timer.seconds)
+    failed = sum(isinstance(result, Exception) for result in results)
+    print(
+        f"{items} items per cart, gateway latency {latency * 1000:.0f} ms, "
+        f"failure rate {failure_rate:.0%}: {gateway.calls} gateway calls, "
+        f"{failed} checkout(s) failed"
+    )
+
+    problems = check(usernames, results, items, gateway)
+    if problems:
+        print("\n".join(problems[:20]))
+        return 1
+    print("OK: every transaction paid for, every failed cart left as it was.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 3,
+            float(sys.argv[3]) if len(sys.argv) > 3 else 0.2,
+            float(sys.argv[4]) if len(sys.argv) > 4 else 0.05,
+        )
+    )
@@ -0,0 +1,175 @@
+"""
+Benchmark the date layer against parsing every date with strptime.
+
+Usage: python benchmarks/bench_dates.py [rows]
+
+A transactions file of the given number of rows, with random dates over
+four years and random times, is read once. The rows are then processed
+the old way, with a strptime and a strftime on every value, and through
+the dates module. Both ways must give the same results:
+- render the date and time of every row for display;
+- pick the rows of a month, the old way by rendering every date first and
+  the new way by comparing days since 1970-01-01;
+- sort the rows by date and time.
+The rows of a month are also found through the prefix index of the record
+store, as the admin search does.
+"""
+
+from datetime import datetime
+import random
+import sys
+import common
+
+import dates
+import services
+import storage
+
+TRANSACTION_FILE = common.data_path("transactions.txt")
+MONTH = "2024-02"
+FIRST_DAY = dates.parse_date(f"{MONTH}-01")
+NEXT_MONTH_FIRST_DAY = dates.parse_date("2024-03-01")
+
+
+def generate_rows(count: int):
+    """
+    Generate transactions with random dates over four years and random times.
+
+    :param count: int
+    :return: Generator of records
+    """
+    generator = random.Random(1)
+    for number in range(1, count + 1):
+        yield [
+            str(number),
+            "member",
+            "Maybank",
+            str(1000000000 + number),
+            f"{generator.randint(2022, 2025)}-{generator.randint(1, 12):02d}-"
+            f"{generator.randint(1, 28):02d}",
+            f"{generator.randrange(24):02d}:{generator.randrange(60):02d}",
+            "Debit Card",
+            "VISA",
+            "10.00",
+            "SUCCESSFUL",
+        ]
+
+
+def format_datetime(data: str, initial_format: str, new_format: str) -> str:
+    """
+    Format a date or time as ems.format_datetime did before the date layer.
+
+    :return: str
+    """
+    temp = datetime.strptime(data, initial_format)
+    return str(datetime.strftime(temp, new_format))
+
+
+def compare(name: str, rows: int, old, new) -> list:
+    """
+    Time the old and the new way of a task and check that they agree.
+
+    :param name: str
+    :param rows: int
+    :param old: Function doing the task the old way.
+    :param new: Function doing the task through the dates module.
+    :return: The problems found.
+    """
+    with common.Timer() as old_timer:
+        old_result = old()
+    common.report(f"{name}, strptime", rows, old_timer.seconds, "rows")
+    for function in (dates.parse_date, dates.parse_time, dates.reformat):
+        function.cache_clear()
+    with common.Timer() as new_timer:
+        new_result = new()
+    common.report(f"{name}, dates", rows, new_timer.seconds, "rows")
+    print(f"{'':<44} {old_timer.seconds / new_timer.seconds:.1f}x faster")
+    return [] if old_result == new_result else [f"{name}: the results differ"]
+
+
+def main(rows: int) -> int:
+    """
+    Run the benchmark.
+
+    :param rows: int
+    :return: The exit status.
+    """
+    common.sandbox()
+    header = storage.read_header(TRANSACTION_FILE)
+    common.write_file(TRANSACTION_FILE, header, generate_rows(rows))
+    records = list(storage.iter_rows(TRANSACTION_FILE))
+
+    problems = compare(
+        "render date and time",
+        rows,
+        lambda: [
+            (
+                format_datetime(record[4], dates.DATE_FORMAT, "%A, %b %d, %Y"),
+                format_datetime(record[5], dates.TIME_FORMAT, "%I:%M %p"),
+            )
+            for record in records
+        ],
+        lambda: [
+            (
+                dates.reformat(record[4], dates.DATE_FORMAT, "%A, %b %d, %Y"),
+                dates.reformat(record[5], dates.TIME_FORMAT, "%I:%M %p"),
+            )
+            for record in records
+        ],
+    )
+    problems += compare(
+        "rows of a month",
+        rows,
+        lambda: [
+            record[0]
+            for record in records
+            if format_datetime(record[4], dates.DATE_FORMAT, "%Y-%m") == MONTH
+        ],
+        lambda: [
+            record[0]
+            for record in records
+            if FIRST_DAY <= dates.parse_date(record[4]) < NEXT_MONTH_FIRST_DAY
+        ],
+    )
+    problems += compare(
+        "sort by date and time",
+        rows,
+        lambda: [
+            record[0]
+            for record in sorted(
+                records,
+                key=lambda record: datetime.strptime(
+                    f"{record[4]} {record[5]}",
+                    f"{dates.DATE_FORMAT} {dates.TIME_FORMAT}",
+                ),
+            )
+        ],
+        lambda: [
+            record[0]
+            for record in sorted(
+                records,
+                key=lambda record: (
+                    dates.parse_date(record[4]),
+                    dates.parse_time(record[5]),
+                ),
+            )
+        ],
+    )
+
+    with common.Timer() as timer:
+        month_records = services.search_payments(month=MONTH)
+    common.report("rows of a month, load + prefix index", rows, timer.seconds, "rows")
+    with common.Timer() as timer:
+        services.search_payments(month=MONTH)
+    common.report("rows of a month, prefix index", rows, timer.seconds, "rows")
+    if len(month_records) != sum(record[4].startswith(MONTH) for record in records):
+        problems.append("rows of a month: the prefix index missed rows")
+
+    if problems:
+        print("\n".join(problems))
+        return 1
+    print("OK: both ways give the same results.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000))
@@ -0,0 +1,134 @@
+"""
+Benchmark the id generator and check that ids never collide.
+
+Usage: python benchmarks/bench_ids.py [processes] [ids per process]
+
+Every process generates ids one at a time with ids.generate_data_id and
+then in batches with ids.generate_data_ids, from several threads at
+once, and writes them to a file of its own. The ids generated per second
+are reported for both, and all the ids of all the processes are checked
+for duplicates and for going backwards within a thread.
+"""
+
+from multiprocessing import Process
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+import common
+
+import ids
+
+THREADS = 4  # Threads generating ids at once in every process
+BATCH_SIZE = 1000  # Ids generated per call to generate_data_ids
+
+
+def generate_one_by_one(count: int) -> list:
+    """
+    Generate ids one at a time.
+
+    :param count: int
+    :return: list
+    """
+    generate_data_id = ids.generate_data_id
+    return [generate_data_id() for _ in range(count)]
+
+
+def generate_in_batches(count: int) -> list:
+    """
+    Generate ids in batches.
+
+    :param count: int
+    :return: list
+    """
+    data_ids = []
+    for start in range(0, count, BATCH_SIZE):
+        data_ids.extend(ids.generate_data_ids(min(BATCH_SIZE, count - start)))
+    return data_ids
+
+
+def worker(number: int, count: int, generate) -> None:
+    """
+    Generate ids from several threads and write them to a file.
+
+    :param number: The number of the process.
+    :param count: The number of ids to generate.
+    :param generate: The function generating the ids of a thread.
+    :return: None
+    """
+    with ThreadPoolExecutor(THREADS) as executor:
+        id_lists = list(executor.map(generate, [count // THREADS] * THREADS))
+    with open(f"ids-{number}.txt", "w", encoding="utf-8") as file_writer:
+        for data_ids in id_lists:
+            file_writer.write(" ".join(data_ids) + "\n")
+
+
+def run(name: str, processes: int, count: int, generate) -> list:
+    """
+    Generate ids from several processes and check them.
+
+    :param name: str
+    :param processes: int
+    :param count: The number of ids per process.
+    :param generate: The function generating the ids of a thread.
+    :return: The problems found.
+    """
+    workers = [
+        Process(target=worker, args=(number, count, generate))
+        for number in range(processes)
+    ]
+    with common.Timer() as timer:
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+
+    problems = []
+    seen = set()
+    total = 0
+    for number in range(processes):
+        with open(f"ids-{number}.txt", "r", encoding="utf-8") as file_reader:
+            for line in file_reader:
+                data_ids = [int(data_id) for data_id in line.split()]
+                if data_ids != sorted(data_ids):
+                    problems.append(f"{name}: ids of a thread are not increasing")
+                total += len(data_ids)
+                seen.update(data_ids)
+        os.remove(f"ids-{number}.txt")
+    if len(seen) != total:
+        problems.append(f"{name}: {total - len(seen)} id(s) generated twice")
+    common.report(f"{name}, {processes} processes", total, timer.seconds, "ids")
+    return problems
+
+
+def main(processes: int, count: int) -> int:
+    """
+    Run the benchmark and report its outcome.
+
+    :param processes: int
+    :param count: int
+    :return: The exit status.
+    """
+    common.sandbox()
+    with common.Timer() as timer:
+        generate_one_by_one(count)
+    common.report("generate_data_id, 1 thread", count, timer.seconds, "ids")
+    with common.Timer() as timer:
+        generate_in_batches(count)
+    common.report("generate_data_ids, 1 thread", count, timer.seconds, "ids")
+
+    problems = run("generate_data_id", processes, count, generate_one_by_one)
+    problems += run("generate_data_ids", processes, count, generate_in_batches)
+    if problems:
+        print("\n".join(problems))
+        return 1
+    print(f"OK: no id generated twice by {processes} processes x {THREADS} threads.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 4,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 1000000,
+        )
+    )
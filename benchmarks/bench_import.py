@@ -0,0 +1,374 @@
+"""
+Benchmark the bulk import of events or members against adding them one at a time.
+
+Usage: python benchmarks/bench_import.py [events|members] [rows] [rows added one by one]
+
+With events, a CSV file and a JSON Lines file of new events spread over the
+existing categories are imported with importer.import_events, each into a
+fresh copy of the data. Then some events are added one at a time through
+services.create_events, the way an admin adds them from the menu. After
+the imports the events, their ids and the category totals are checked,
+and importing the same file again must be refused without writing
+anything.
+
+With members, the files hold new members, some of whose rows repeat a
+username taken earlier in the file or by an existing member. They are
+imported with importer.import_members, and then some members are
+registered one at a time through services.register_member, the way they
+sign up from the menu. Every new username must be imported once, every
+repeated one skipped, and importing the same file again must skip every
+row. The passwords are hashed at the configured cost, which
+EMS_PASSWORD_ITERATIONS lowers for a quicker run.
+"""
+
+import csv
+import json
+import os
+import shutil
+import sys
+import common
+
+import importer
+import services
+import storage
+
+MODES = ["events", "members"]
+EVENT_COLUMNS = [
+    "event_name",
+    "event_category",
+    "event_code",
+    "event_price",
+    "organizer",
+    "start_date",
+    "start_time",
+    "end_date",
+    "end_time",
+    "venue",
+    "total_seats_available",
+]
+MEMBER_COLUMNS = [
+    "username",
+    "password",
+    "name",
+    "gender",
+    "birthdate",
+    "nationality",
+    "contact_number",
+    "email_address",
+]
+REPEATED_EVERY = 10  # Rows of members between two that repeat a username
+DEFAULT_ROWS = {"events": (100_000, 1000), "members": (2000, 100)}
+
+
+def generate_events(count: int, prefix: str, categories: list):
+    """
+    Generate the rows of new events, going round the categories.
+
+    :param count: int
+    :param prefix: The start of the event codes.
+    :param categories: list
+    :return: Generator of rows
+    """
+    for number in range(count):
+        yield {
+            "event_name": f"Session {number}",
+            "event_category": categories[number % len(categories)],
+            "event_code": f"{prefix}{number:06d}",
+            "event_price": "12.50",
+            "organizer": "Festival Office",
+            "start_date": "2030-05-01",
+            "start_time": "09:30",
+            "end_date": "2030-05-01",
+            "end_time": "10:30",
+            "venue": "Hall A",
+            "total_seats_available": "100",
+        }
+
+
+def generate_members(count: int, prefix: str, usernames: list):
+    """
+    Generate the rows of members, every REPEATED_EVERY-th of which repeats a
+    username, taken in turn from the existing members and the rows before.
+
+    :param count: int
+    :param prefix: The start of the new usernames.
+    :param usernames: The usernames of the existing members.
+    :return: Generator of rows
+    """
+    for number in range(count):
+        if number % REPEATED_EVERY == REPEATED_EVERY - 1:
+            repeated = number // REPEATED_EVERY
+            if repeated % 2:
+                username = usernames[repeated // 2 % len(usernames)]
+            else:
+                username = f"{prefix}{repeated * REPEATED_EVERY:06d}"
+        else:
+            username = f"{prefix}{number:06d}"
+        yield {
+            "username": username,
+            "password": f"Passw0rd!{number}",
+            "name": f"Member {number}",
+            "gender": "female" if number % 2 else "male",
+            "birthdate": "1990-06-15",
+            "nationality": "Malaysian",
+            "contact_number": "012-3456789",
+            "email_address": f"member{number}@example.com",
+        }
+
+
+def count_repeated(count: int) -> int:
+    """
+    Count the rows of generate_members that repeat a username.
+
+    :param count: int
+    :return: int
+    """
+    return count // REPEATED_EVERY
+
+
+def write_import_file(path: str, columns: list, rows) -> None:
+    """
+    Write rows to a CSV file, or a JSON Lines file if its name says so.
+
+    :param path: str
+    :param columns: The columns of the CSV file.
+    :param rows: Iterable of rows.
+    :return: None
+    """
+    with open(path, "w", encoding="utf-8", newline="") as file_writer:
+        if path.endswith(".jsonl"):
+            file_writer.writelines(f"{json.dumps(row)}\n" for row in rows)
+        else:
+            writer = csv.DictWriter(file_writer, columns)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def category_totals() -> dict:
+    """
+    Get the events counted in every category.
+
+    :return: dict
+    """
+    storage.invalidate(services.CATEGORY_FILE)
+    return {
+        record[1]: int(record[2])
+        for record in storage.iter_rows(services.CATEGORY_FILE)
+    }
+
+
+def check(events: int, totals_before: dict) -> list:
+    """
+    Check the events and category totals after an import.
+
+    :param events: The number of events imported.
+    :param totals_before: The category totals before the import.
+    :return: The problems found.
+    """
+    problems = []
+    storage.invalidate(services.EVENT_FILE)
+    records = list(storage.iter_rows(services.EVENT_FILE))
+    if len({record[0] for record in records}) != len(records):
+        problems.append("Event ids handed out twice")
+    added = sum(category_totals().values()) - sum(totals_before.values())
+    if added != events:
+        problems.append(f"Category totals grew by {added}, expected {events}")
+    return problems
+
+
+def reset_data(data: str) -> None:
+    """
+    Replace the data files with a fresh copy.
+
+    :param data: A copy of the data to start from.
+    :return: None
+    """
+    shutil.rmtree(common.DATA_DIR)
+    shutil.copytree(data, common.DATA_DIR)
+    storage.invalidate(services.EVENT_FILE)
+    storage.invalidate(services.CLIENT_FILE)
+
+
+def run_event_import(path: str, events: int, data: str) -> list:
+    """
+    Import a file of events into a fresh copy of the data and check the outcome.
+
+    :param path: The file to import.
+    :param events: The number of events in it.
+    :param data: A copy of the data to start from.
+    :return: The problems found.
+    """
+    reset_data(data)
+    totals_before = category_totals()
+    with common.Timer() as timer:
+        imported, _ = importer.import_events(path)
+    common.report(
+        f"import_events, {os.path.basename(path)}", imported, timer.seconds, "events"
+    )
+    problems = check(events, totals_before)
+
+    size = os.path.getsize(services.EVENT_FILE)
+    try:
+        importer.import_events(path)
+    except importer.ImportRowError:
+        if os.path.getsize(services.EVENT_FILE) != size:
+            problems.append("A refused import wrote events")
+    else:
+        problems.append("Importing the same events again was not refused")
+    return problems
+
+
+def check_members() -> list:
+    """
+    Check the ids and usernames of the members after an import.
+
+    :return: The problems found.
+    """
+    problems = []
+    storage.invalidate(services.CLIENT_FILE)
+    records = list(storage.iter_rows(services.CLIENT_FILE))
+    if len({record[0] for record in records}) != len(records):
+        problems.append("Customer ids handed out twice")
+    if len({record[1] for record in records}) != len(records):
+        problems.append("Usernames registered twice")
+    return problems
+
+
+def run_member_import(path: str, members: int, data: str) -> list:
+    """
+    Import a file of members into a fresh copy of the data and check the outcome.
+
+    :param path: The file to import.
+    :param members: The number of rows in it.
+    :param data: A copy of the data to start from.
+    :return: The problems found.
+    """
+    reset_data(data)
+    members_before = sum(1 for _ in storage.iter_rows(services.CLIENT_FILE))
+    with common.Timer() as timer:
+        imported, skipped = importer.import_members(path)
+    common.report(
+        f"import_members, {os.path.basename(path)}", members, timer.seconds, "rows"
+    )
+    problems = check_members()
+    repeated = count_repeated(members)
+    if imported != members - repeated or len(skipped) != repeated:
+        problems.append(
+            f"Imported {imported} and skipped {len(skipped)} members, "
+            f"expected {members - repeated} and {repeated}"
+        )
+    members_after = sum(1 for _ in storage.iter_rows(services.CLIENT_FILE))
+    if members_after - members_before != imported:
+        problems.append(f"The client file grew by {members_after - members_before}")
+
+    imported, skipped = importer.import_members(path)
+    if imported or len(skipped) != members:
+        problems.append("Importing the same members again did not skip them all")
+    return problems
+
+
+def benchmark_events(directory: str, data: str, events: int, single_events: int):
+    """
+    Import files of events, then add events one at a time.
+
+    :param directory: The sandbox directory.
+    :param data: A copy of the data to start from.
+    :param events: int
+    :param single_events: int
+    :return: The problems found.
+    """
+    categories = list(category_totals())
+    problems = []
+    for name in ("events.csv", "events.jsonl"):
+        path = os.path.join(directory, name)
+        write_import_file(
+            path, EVENT_COLUMNS, generate_events(events, "BX", categories)
+        )
+        problems += run_event_import(path, events, data)
+
+    totals_before = category_totals()
+    rows = list(generate_events(single_events, "SX", categories))
+    with common.Timer() as timer:
+        for row in rows:
+            services.create_events([row])
+    common.report(
+        "create_events, one at a time", single_events, timer.seconds, "events"
+    )
+    problems += check(single_events, totals_before)
+    return problems
+
+
+def benchmark_members(directory: str, data: str, members: int, single_members: int):
+    """
+    Import files of members, then register members one at a time.
+
+    :param directory: The sandbox directory.
+    :param data: A copy of the data to start from.
+    :param members: int
+    :param single_members: int
+    :return: The problems found.
+    """
+    usernames = [record[1] for record in storage.iter_rows(services.CLIENT_FILE)]
+    problems = []
+    for name in ("members.csv", "members.jsonl"):
+        path = os.path.join(directory, name)
+        write_import_file(
+            path, MEMBER_COLUMNS, generate_members(members, "bx_", usernames)
+        )
+        problems += run_member_import(path, members, data)
+
+    rows = [
+        row
+        for number, row in enumerate(generate_members(single_members, "sx_", usernames))
+        if number % REPEATED_EVERY != REPEATED_EVERY - 1
+    ]
+    with common.Timer() as timer:
+        for row in rows:
+            services.register_member(row)
+    common.report("register_member, one at a time", len(rows), timer.seconds, "rows")
+    problems += check_members()
+    return problems
+
+
+def main(mode: str, rows: int, single_rows: int) -> int:
+    """
+    Run the benchmark.
+
+    :param mode: One of MODES.
+    :param rows: The rows of the files imported.
+    :param single_rows: The rows added one at a time.
+    :return: The exit status.
+    """
+    directory = common.sandbox()
+    data = os.path.join(directory, "original-data")
+    shutil.copytree(common.DATA_DIR, data)
+
+    if mode == "events":
+        problems = benchmark_events(directory, data, rows, single_rows)
+    else:
+        problems = benchmark_members(directory, data, rows, single_rows)
+
+    if problems:
+        print("\n".join(problems))
+        return 1
+    if mode == "events":
+        print("OK: every event imported once, category totals up to date.")
+    else:
+        print("OK: every new member imported once, every repeated username skipped.")
+    return 0
+
+
+if __name__ == "__main__":
+    MODE = sys.argv[1] if len(sys.argv) > 1 else "events"
+    if MODE not in MODES:
+        sys.exit(
+            f"Usage: python {sys.argv[0]} [{'|'.join(MODES)}] [rows] "
+            "[rows added one by one]"
+        )
+    sys.exit(
+        main(
+            MODE,
+            int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_ROWS[MODE][0],
+            int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_ROWS[MODE][1],
+        )
+    )
@@ -0,0 +1,165 @@
+"""
+Benchmark the cost of password hashing and of looking up an account.
+
+Usage: python benchmarks/bench_login.py [members] [processes] [logins per process]
+
+Three things are measured:
+- for a range of PBKDF2 iteration counts, the time taken to hash and to
+  verify a password, i.e. the logins a core can check per second. Each
+  doubling of the count also doubles the cost of guessing a password from
+  a stolen data file;
+- with the given number of members, the time taken to find an account
+  through the username index of the record store, against a linear scan
+  of the file;
+- a burst of logins at the configured cost (EMS_PASSWORD_ITERATIONS) from
+  several processes at once, each login looking up the account and
+  verifying its password.
+"""
+
+from multiprocessing import Process
+import random
+import sys
+import common
+
+import passwords
+import storage
+
+CLIENT_FILE = common.data_path("client.txt")
+PASSWORD = "Passw0rd!"
+ITERATION_COUNTS = [25_000, 50_000, 100_000, 200_000, 400_000, 800_000]
+LOOKUPS = 1000  # Accounts looked up to time the index and the scan
+SCANNED_LOOKUPS = 20  # Of which also looked up by a scan of the file
+
+
+def measure_costs() -> None:
+    """
+    Report the time taken to hash and verify a password at each cost.
+
+    :return: None
+    """
+    for iterations in ITERATION_COUNTS:
+        with common.Timer() as hash_timer:
+            stored_password = passwords.hash_password(PASSWORD, iterations)
+        repeats = max(1, 1_000_000 // iterations)
+        with common.Timer() as verify_timer:
+            for _ in range(repeats):
+                assert passwords.verify_password(PASSWORD, stored_password)
+        default = " (default)" if iterations == passwords.HASH_ITERATIONS else ""
+        print(
+            f"{iterations:>9,} iterations{default:<10}  "
+            f"hash {hash_timer.seconds * 1000:7.1f} ms  "
+            f"verify {verify_timer.seconds / repeats * 1000:7.1f} ms  "
+            f"{repeats / verify_timer.seconds:8.1f} logins/s per core"
+        )
+
+
+def write_members(members: int) -> None:
+    """
+    Write a client file of members sharing the same hashed password.
+
+    :param members: int
+    :return: None
+    """
+    stored_password = passwords.hash_password(PASSWORD)
+    header = storage.read_header(CLIENT_FILE)
+    common.write_file(
+        CLIENT_FILE,
+        header,
+        (
+            [
+                str(number),
+                f"member{number}",
+                stored_password,
+                "Member",
+                "30",
+                "female",
+                "1990-01-01",
+                "Malaysian",
+                "012-3456789",
+                f"member{number}@example.com",
+            ]
+            for number in range(1, members + 1)
+        ),
+    )
+
+
+def measure_lookups(members: int) -> None:
+    """
+    Report the time taken to find accounts by index and by scanning the file.
+
+    :param members: int
+    :return: None
+    """
+    usernames = [f"member{random.randint(1, members)}" for _ in range(LOOKUPS)]
+    with common.Timer() as timer:
+        table = storage.get_table(CLIENT_FILE)
+        table.find(1, "")
+    common.report("load the client file and its index", members, timer.seconds, "rows")
+    with common.Timer() as timer:
+        for username in usernames:
+            assert table.find(1, username) is not None
+    common.report("find account through the index", LOOKUPS, timer.seconds)
+    with common.Timer() as timer:
+        for username in usernames:
+            assert storage.get_table(CLIENT_FILE).find(1, username) is not None
+    common.report("check for changes, then find", LOOKUPS, timer.seconds)
+    storage.invalidate(CLIENT_FILE)
+    with common.Timer() as timer:
+        for username in usernames[:SCANNED_LOOKUPS]:
+            assert any(
+                record[1] == username for record in storage.iter_rows(CLIENT_FILE)
+            )
+    common.report("find account by scanning the file", SCANNED_LOOKUPS, timer.seconds)
+
+
+def log_in(members: int, logins: int) -> None:
+    """
+    Log in as random members, as a process of the burst.
+
+    :param members: int
+    :param logins: int
+    :return: None
+    """
+    for _ in range(logins):
+        username = f"member{random.randint(1, members)}"
+        record = storage.get_table(CLIENT_FILE).find(1, username)
+        assert passwords.verify_password(PASSWORD, record[2])
+
+
+def main(members: int, processes: int, logins: int) -> int:
+    """
+    Run the benchmark.
+
+    :param members: int
+    :param processes: int
+    :param logins: int
+    :return: The exit status.
+    """
+    common.sandbox()
+    measure_costs()
+    write_members(members)
+    measure_lookups(members)
+
+    workers = [Process(target=log_in, args=(members, logins)) for _ in range(processes)]
+    with common.Timer() as timer:
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+    if any(process.exitcode for process in workers):
+        print("A login failed.")
+        return 1
+    common.report(
+        f"login burst, {processes} processes", processes * logins, timer.seconds
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+            int(sys.argv[3]) if len(sys.argv) > 3 else 25,
+        )
+    )
@@ -0,0 +1,112 @@
+"""
+Shared setup of the benchmarks.
+
+Every benchmark runs against a copy of the data files in a temporary
+directory, so that the data of the repository is never touched, and imports
+the modules of the event management system straight from the repository.
+Run the benchmarks from anywhere, e.g. python benchmarks/stress_storage.py.
+"""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_DIR = os.path.join(REPO_ROOT, "event_management_system")
+DATA_DIR = "event_management_system/data"  # Relative to the sandbox
+
+sys.path.insert(0, PACKAGE_DIR)
+
+
+def sandbox() -> str:
+    """
+    Copy the data files into a temporary directory and move into it.
+
+    The data files are opened through paths relative to the working
+    directory, so the benchmark then only changes the copies. The directory
+    is removed when the benchmark exits.
+
+    :return: The path of the temporary directory.
+    """
+    directory = tempfile.mkdtemp(prefix="ems-benchmark-")
+    shutil.copytree(
+        os.path.join(PACKAGE_DIR, "data"),
+        os.path.join(directory, DATA_DIR),
+        ignore=shutil.ignore_patterns("*.lock", "*.log", "*.journal", "*.db*"),
+    )
+    os.chdir(directory)
+    atexit.register(shutil.rmtree, directory, True)
+    return directory
+
+
+def data_path(name: str) -> str:
+    """
+    Get the path of a data file inside the sandbox.
+
+    :param name: str
+    :return: str
+    """
+    return f"{DATA_DIR}/{name}"
+
+
+def write_file(filename: str, header: list, rows) -> None:
+    """
+    Write a data file from a header and an iterable of records, in chunks.
+
+    :param filename: str
+    :param header: list
+    :param rows: Iterable of records.
+    :return: None
+    """
+    with open(filename, "w", encoding="utf-8") as file_writer:
+        file_writer.write(f"{';'.join(header)}\n")
+        chunk = []
+        for record in rows:
+            chunk.append(f"{';'.join(record)}\n")
+            if len(chunk) == 10000:
+                file_writer.writelines(chunk)
+                chunk = []
+        file_writer.writelines(chunk)
+
+
+def percentile(values: list, share: float) -> float:
+    """
+    Get the value below which a share of the values fall.
+
+    :param values: list
+    :param share: float between 0 and 1
+    :return: float
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+class Timer:
+    """Context manager measuring the seconds spent in a with block."""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.seconds = time.perf_counter() - self.start
+
+
+def report(name: str, count: int, seconds: float, unit: str = "ops") -> None:
+    """
+    Print the time taken by a run and its throughput.
+
+    :param name: str
+    :param count: The number of operations made.
+    :param seconds: float
+    :param unit: The name of the operations.
+    :return: None
+    """
+    rate = count / seconds if seconds else float("inf")
+    print(f"{name:<44} {count:>10} {unit:<6} {seconds:>9.3f} s {rate:>14,.0f} {unit}/s")
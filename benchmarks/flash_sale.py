@@ -0,0 +1,185 @@
+"""
+Simulate a flash sale on one event and check that no seat is oversold.
+
+Usage: python benchmarks/flash_sale.py [processes] [bookings per process] [seats]
+
+Every process books one seat at a time for the same event, as its own
+member, until its bookings are made, and gives back every fourth seat it
+got by removing it from its cart. There are fewer seats than bookings, so
+the event sells out while the processes are still racing for it. The
+bookings per second and the p50/p99 latency of a booking are reported,
+and at the end the seats left, the tickets and the cart items are checked
+against the bookings made and given back.
+"""
+
+from multiprocessing import Process, Queue
+import sys
+import time
+import common
+
+import passwords
+import services
+import storage
+
+EVENT_CODE = "FLASH"
+RETURN_EVERY = 4  # Seats booked for every seat given back
+
+
+def prepare(processes: int, seats: int) -> None:
+    """
+    Add a member per process and the event on sale.
+
+    :param processes: int
+    :param seats: int
+    :return: None
+    """
+    # A cheap hash, as the cost of hashing is not what is measured here
+    password_hash = passwords.hash_password("Passw0rd!", 1000)
+    for number in range(processes):
+        services.register_member(
+            {
+                "username": f"flash{number}",
+                "password": password_hash,
+                "name": "Flash Buyer",
+                "gender": "Female",
+                "birthdate": "1990-01-01",
+                "nationality": "Malaysian",
+                "contact_number": "012-3456789",
+                "email_address": f"flash{number}@example.com",
+            }
+        )
+    services.create_events(
+        [
+            {
+                "event_name": "Flash Sale",
+                "event_category": "Food and Drink",
+                "event_code": EVENT_CODE,
+                "event_price": "10",
+                "organizer": "Benchmarks",
+                "start_date": "2030-01-01",
+                "start_time": "10:00",
+                "end_date": "2030-01-01",
+                "end_time": "12:00",
+                "venue": "Online",
+                "total_seats_available": str(seats),
+            }
+        ]
+    )
+
+
+def worker(number: int, bookings: int, results: Queue) -> None:
+    """
+    Book seats one at a time and give some of them back.
+
+    :param number: The number of the process.
+    :param bookings: The number of bookings to try.
+    :param results: Queue receiving the seats booked and given back, the
+        bookings refused and the latencies.
+    :return: None
+    """
+    username = f"flash{number}"
+    booking = {
+        "event_code": EVENT_CODE,
+        "attendee_name": "Flash Buyer",
+        "email_address": f"{username}@example.com",
+        "contact_number": "012-3456789",
+        "quantity": 1,
+    }
+    booked = returned = refused = 0
+    latencies = []
+    for _ in range(bookings):
+        start = time.perf_counter()
+        try:
+            (ticket,) = services.book_tickets(username, [booking])
+        except services.ServiceError:
+            refused += 1
+        else:
+            booked += 1
+            if booked % RETURN_EVERY == 0:
+                services.remove_cart_items(username, [ticket[0]])
+                returned += 1
+        latencies.append(time.perf_counter() - start)
+    results.put((booked, returned, refused, latencies))
+
+
+def check(seats: int, booked: int, returned: int) -> list:
+    """
+    Read the files back from scratch and list what went wrong.
+
+    :param seats: The seats the event started with.
+    :param booked: The seats booked by all the processes.
+    :param returned: The seats given back by all the processes.
+    :return: The problems found.
+    """
+    problems = []
+    for filename in (services.EVENT_FILE, services.TICKET_FILE, services.CART_FILE):
+        storage.invalidate(filename)
+    taken = booked - returned
+    seats_left = int(services.find_event(EVENT_CODE)[11])
+    if seats_left < 0:
+        problems.append(f"Oversold: {seats_left} seats left")
+    if seats_left != seats - taken:
+        problems.append(f"{seats_left} seats left, expected {seats - taken}")
+    tickets = storage.get_table(services.TICKET_FILE).find_all(2, EVENT_CODE)
+    ticket_seats = sum(int(record[11]) for record in tickets)
+    if ticket_seats != taken:
+        problems.append(f"{ticket_seats} seats in tickets, expected {taken}")
+    cart_items = storage.get_table(services.CART_FILE).find_all(2, EVENT_CODE)
+    cart_seats = sum(int(record[6]) for record in cart_items)
+    if cart_seats != taken:
+        problems.append(f"{cart_seats} seats in carts, expected {taken}")
+    return problems
+
+
+def main(processes: int, bookings: int, seats: int) -> int:
+    """
+    Run the flash sale and report its throughput and outcome.
+
+    :param processes: int
+    :param bookings: int
+    :param seats: int
+    :return: The exit status.
+    """
+    common.sandbox()
+    prepare(processes, seats)
+    results = Queue()
+    workers = [
+        Process(target=worker, args=(number, bookings, results))
+        for number in range(processes)
+    ]
+    with common.Timer() as timer:
+        for process in workers:
+            process.start()
+        outcomes = [results.get() for _ in workers]
+        for process in workers:
+            process.join()
+
+    booked = sum(outcome[0] for outcome in outcomes)
+    returned = sum(outcome[1] for outcome in outcomes)
+    refused = sum(outcome[2] for outcome in outcomes)
+    latencies = [latency for outcome in outcomes for latency in outcome[3]]
+    common.report(
+        f"{processes} processes, flash sale", processes * bookings, timer.seconds
+    )
+    print(
+        f"booking p50 {common.percentile(latencies, 0.50) * 1000:.2f} ms  "
+        f"p99 {common.percentile(latencies, 0.99) * 1000:.2f} ms"
+    )
+    print(f"{booked} seats booked, {returned} given back, {refused} bookings refused")
+
+    problems = check(seats, booked, returned)
+    if problems:
+        print("\n".join(problems))
+        return 1
+    print(f"OK: {seats} seats, none oversold or lost.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+            int(sys.argv[3]) if len(sys.argv) > 3 else 1000,
+        )
+    )
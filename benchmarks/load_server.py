@@ -0,0 +1,225 @@
+"""
+Load test of the HTTP/JSON API server.
+
+Usage: python benchmarks/load_server.py [clients] [requests per client] [port]
+
+Starts the server on a copy of the data files, registers one member per
+client and has every client log in and then send its requests over one
+keep-alive connection. The requests cycle through browsing a category,
+booking a ticket, listing the cart and paying for it. The latency of
+every request is measured, and the requests/sec and the p50/p99
+latencies are reported for each endpoint and overall.
+
+The environment is passed on to the server, e.g. EMS_GATEWAY_LATENCY sets
+the latency of the simulated payment gateway.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import common
+
+import passwords
+import services
+
+PASSWORD = "Passw0rd!"
+EVENT_CODE = "LOAD"
+CATEGORY = "Food and Drink"
+
+
+def prepare(clients: int) -> None:
+    """
+    Add the members of the clients and an event with enough seats for all.
+
+    :param clients: int
+    :return: None
+    """
+    # A cheap hash, as the cost of logging in is not what is measured here
+    password_hash = passwords.hash_password(PASSWORD, 1000)
+    for number in range(clients):
+        services.register_member(
+            {
+                "username": f"load{number}",
+                "password": password_hash,
+                "name": "Load Tester",
+                "gender": "Male",
+                "birthdate": "1990-01-01",
+                "nationality": "Malaysian",
+                "contact_number": "012-3456789",
+                "email_address": f"load{number}@example.com",
+            }
+        )
+    services.create_events(
+        [
+            {
+                "event_name": "Load Test",
+                "event_category": CATEGORY,
+                "event_code": EVENT_CODE,
+                "event_price": "10",
+                "organizer": "Benchmarks",
+                "start_date": "2030-01-01",
+                "start_time": "10:00",
+                "end_date": "2030-01-01",
+                "end_time": "12:00",
+                "venue": "Online",
+                "total_seats_available": "1000000",
+            }
+        ]
+    )
+
+
+async def request(reader, writer, method: str, path: str, body=None, token=None):
+    """
+    Send a request over an open connection and read its answer.
+
+    :return: The status and the decoded JSON answer.
+    """
+    data = b"" if body is None else json.dumps(body).encode("utf-8")
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+    head += f"Content-Length: {len(data)}\r\n"
+    if token:
+        head += f"Authorization: Bearer {token}\r\n"
+    writer.write(f"{head}\r\n".encode("latin-1") + data)
+    await writer.drain()
+    response_head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+    status = int(response_head.split(" ")[1])
+    length = 0
+    for line in response_head.split("\r\n"):
+        name, _, value = line.partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(port: int, number: int, requests: int, latencies: dict, errors: list):
+    """
+    Log in as a member and send requests, recording their latencies.
+
+    :return: None
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    _, answer = await request(
+        reader,
+        writer,
+        "POST",
+        "/sessions",
+        {"username": f"load{number}", "password": PASSWORD},
+    )
+    token = answer["token"]
+    booking = {
+        "event_code": EVENT_CODE,
+        "attendee_name": "Load Tester",
+        "email_address": f"load{number}@example.com",
+        "contact_number": "012-3456789",
+        "quantity": 1,
+    }
+    steps = [
+        (
+            "GET /events",
+            "GET",
+            f"/events?category={CATEGORY.replace(' ', '%20')}",
+            None,
+        ),
+        ("POST /bookings", "POST", "/bookings", {"bookings": [booking]}),
+        ("GET /cart", "GET", "/cart", None),
+        (
+            "POST /checkout",
+            "POST",
+            "/checkout",
+            {"bank_name": "Maybank", "payment_mode": "eWallet", "card_type": "VISA"},
+        ),
+    ]
+    for sequence in range(requests):
+        name, method, path, body = steps[sequence % len(steps)]
+        start = time.perf_counter()
+        status, answer = await request(reader, writer, method, path, body, token)
+        latencies.setdefault(name, []).append(time.perf_counter() - start)
+        if status != 200:
+            errors.append(f"{name}: {status} {answer}")
+    writer.close()
+
+
+async def wait_for_server(port: int) -> None:
+    """
+    Wait until the server accepts connections.
+
+    :param port: int
+    :return: None
+    """
+    for _ in range(100):
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            await asyncio.sleep(0.1)
+        else:
+            writer.close()
+            return
+    raise RuntimeError("The server did not start.")
+
+
+async def run(clients: int, requests: int, port: int) -> list:
+    """
+    Run the clients against the server and report their latencies.
+
+    :return: The errors answered by the server.
+    """
+    await wait_for_server(port)
+    latencies = {}
+    errors = []
+    with common.Timer() as timer:
+        await asyncio.gather(
+            *(
+                client(port, number, requests, latencies, errors)
+                for number in range(clients)
+            )
+        )
+    every_latency = [value for values in latencies.values() for value in values]
+    for name, values in [*sorted(latencies.items()), ("all", every_latency)]:
+        print(
+            f"{name:<16} {len(values):>7} requests  "
+            f"p50 {common.percentile(values, 0.50) * 1000:8.2f} ms  "
+            f"p99 {common.percentile(values, 0.99) * 1000:8.2f} ms"
+        )
+    common.report(
+        f"{clients} clients x {requests} requests",
+        len(every_latency),
+        timer.seconds,
+        "req",
+    )
+    return errors
+
+
+def main(clients: int, requests: int, port: int) -> int:
+    """
+    Start the server, load it and stop it.
+
+    :return: The exit status.
+    """
+    common.sandbox()
+    prepare(clients)
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(common.PACKAGE_DIR, "server.py"), str(port)],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        errors = asyncio.run(run(clients, requests, port))
+    finally:
+        server.terminate()
+        server.wait()
+    if errors:
+        print(f"{len(errors)} error(s):\n" + "\n".join(errors[:10]))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 40,
+            int(sys.argv[3]) if len(sys.argv) > 3 else 8765,
+        )
+    )
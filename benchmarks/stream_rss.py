@@ -0,0 +1,138 @@
+"""
+Measure the memory used to scan a large transactions file.
+
+Usage: python benchmarks/stream_rss.py [rows]
+
+A transactions file of the given number of rows is written, and each scan
+runs in a fresh process whose peak resident memory is reported:
+- storage.iter_rows over every row, counting the successful ones;
+- storage.iter_rows stopping at the first row of a given customer;
+- the old way, readlines() and then splitting every row, for comparison.
+The streaming scans should use the same memory whatever the size of the
+file. The old way grows with the file, so it is skipped past
+BASELINE_MAX_ROWS rows.
+"""
+
+from multiprocessing import get_context
+import random
+import resource
+import sys
+import common
+
+import storage
+
+TRANSACTION_FILE = common.data_path("transactions.txt")
+BASELINE_MAX_ROWS = 2_000_000  # Largest file read the old way
+HEADER = [
+    "transaction_id",
+    "username",
+    "bank_name",
+    "bank_reference_number",
+    "transaction_entry_date",
+    "transaction_entry_time",
+    "payment_mode",
+    "card_type",
+    "transaction_amount",
+    "transaction_status",
+]
+
+
+def generate_rows(count: int):
+    """
+    Generate transactions of 10,000 customers over a year.
+
+    :param count: int
+    :return: Generator of records
+    """
+    generator = random.Random(1)
+    for number in range(1, count + 1):
+        yield [
+            str(number),
+            f"user{generator.randrange(10000)}",
+            "Maybank",
+            str(1000000000 + number),
+            f"2023-{generator.randint(1, 12):02d}-{generator.randint(1, 28):02d}",
+            "21:45",
+            "Debit Card",
+            "VISA",
+            f"{generator.randint(5, 200)}.00",
+            "SUCCESSFUL",
+        ]
+
+
+def count_successful() -> int:
+    """Count the successful transactions, streaming the file."""
+    return sum(
+        record[9] == "SUCCESSFUL" for record in storage.iter_rows(TRANSACTION_FILE)
+    )
+
+
+def find_first() -> int:
+    """Find the first transaction of a customer, streaming the file."""
+    for record in storage.iter_rows(TRANSACTION_FILE):
+        if record[1] == "user42":
+            return int(record[0])
+    return 0
+
+
+def count_successful_readlines() -> int:
+    """Count the successful transactions, reading the whole file first."""
+    with open(TRANSACTION_FILE, "r", encoding="utf-8") as file_reader:
+        lines = file_reader.readlines()
+    records = [line.rstrip("\n").split(";") for line in lines[1:]]
+    return sum(record[9] == "SUCCESSFUL" for record in records)
+
+
+def measure(scan, results) -> None:
+    """
+    Run a scan and send back its result, time and peak memory in MB.
+
+    :param scan: The function scanning the file.
+    :param results: Queue receiving the measures.
+    :return: None
+    """
+    with common.Timer() as timer:
+        result = scan()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put((result, timer.seconds, peak))
+
+
+def run(name: str, scan, rows: int = None) -> None:
+    """
+    Run a scan in a fresh process and report it.
+
+    :param name: str
+    :param scan: The function scanning the file.
+    :param rows: The number of rows read, by default the result of the scan.
+    :return: None
+    """
+    context = get_context("spawn")  # Not a fork, so no memory is inherited
+    results = context.Queue()
+    process = context.Process(target=measure, args=(scan, results))
+    process.start()
+    result, seconds, peak = results.get()
+    process.join()
+    common.report(name, result if rows is None else rows, seconds, "rows")
+    print(f"{'':<44} result {result}, peak memory {peak:,.0f} MB")
+
+
+def main(rows: int) -> int:
+    """
+    Write the file and scan it in the different ways.
+
+    :param rows: int
+    :return: The exit status.
+    """
+    common.sandbox()
+    common.write_file(TRANSACTION_FILE, HEADER, generate_rows(rows))
+    run("iter_rows, full scan", count_successful, rows)
+    run("iter_rows, first match", find_first)  # Ids are numbered from 1
+    if rows <= BASELINE_MAX_ROWS:
+        run("readlines, full scan", count_successful_readlines, rows)
+    else:
+        print(f"readlines skipped, as it would read {rows:,} rows into memory")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000))
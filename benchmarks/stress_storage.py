@@ -0,0 +1,159 @@
+"""
+Stress the file storage from many processes and check that nothing is lost.
+
+Usage: python benchmarks/stress_storage.py [processes] [appends per process]
+
+Every process appends numbered rows to the same file, one at a time, and
+adds to a shared counter row through storage.update_rows. Now and then a
+process also simulates a crash in the middle of an append by writing half
+a row and no newline, or deletes the row it has just appended and compacts
+the file. At the end the file is read back and checked:
+- every row appended and not deleted is there exactly once and in one piece;
+- no id was handed out twice, even after the highest one was deleted;
+- the counter holds every increment.
+"""
+
+from multiprocessing import Process
+import sys
+import common
+
+import storage
+
+STRESS_FILE = common.data_path("stress.txt")
+HEADER = ["id", "worker", "sequence", "payload"]
+COUNTER_ID = "1"
+CRASH_EVERY = 50  # Appends between two simulated crashes of a process
+DELETE_EVERY = 40  # Appends between two deletions followed by a compaction
+
+
+def payload(worker: int, sequence: int) -> str:
+    """
+    Get the payload of a row, long enough for a torn write to show.
+
+    :param worker: int
+    :param sequence: int
+    :return: str
+    """
+    return f"{worker}-{sequence}-" + "x" * 200
+
+
+def is_deleted(sequence: int) -> bool:
+    """
+    Check whether the row appended at a step is deleted again by its process.
+
+    :param sequence: int
+    :return: bool
+    """
+    return sequence % DELETE_EVERY == DELETE_EVERY - 1
+
+
+def worker(number: int, appends: int) -> None:
+    """
+    Append rows and increment the counter, simulating a crash now and then,
+    and delete a row and compact the file every so often.
+
+    :param number: The number of the process.
+    :param appends: The number of rows to append.
+    :return: None
+    """
+    for sequence in range(appends):
+        (record,) = storage.append_numbered_rows(
+            STRESS_FILE, [[str(number), str(sequence), payload(number, sequence)]]
+        )
+        if is_deleted(sequence):
+            storage.delete_rows(STRESS_FILE, [record[0]])
+            storage.compact(STRESS_FILE)
+        with storage.file_lock(STRESS_FILE):
+            counter = storage.get_table(STRESS_FILE).find(0, COUNTER_ID)
+            new_counter = counter.copy()
+            new_counter[2] = str(int(counter[2]) + 1)
+            storage.update_rows(STRESS_FILE, [[counter, new_counter]])
+        if sequence % CRASH_EVERY == CRASH_EVERY - 1:
+            with storage.file_lock(STRESS_FILE):
+                with open(STRESS_FILE, "ab") as file_writer:
+                    file_writer.write(f"0;{number};torn;xxx".encode("utf-8"))
+
+
+def check(processes: int, appends: int) -> list:
+    """
+    Read the file back from scratch and list what went wrong.
+
+    :param processes: int
+    :param appends: int
+    :return: The problems found.
+    """
+    storage.invalidate(STRESS_FILE)
+    problems = []
+    seen = set()
+    ids = set()
+    counter = None
+    for record in storage.iter_rows(STRESS_FILE):
+        if record[0] == COUNTER_ID:
+            counter = int(record[2])
+            continue
+        if len(record) != len(HEADER) or not record[2].isdigit():
+            problems.append(f"Torn row: {';'.join(record)[:60]}")
+            continue
+        key = (int(record[1]), int(record[2]))
+        if record[3] != payload(*key):
+            problems.append(f"Corrupted row: {';'.join(record)[:60]}")
+        if key in seen:
+            problems.append(f"Row appended twice: {key}")
+        if record[0] in ids:
+            problems.append(f"Id handed out twice: {record[0]}")
+        seen.add(key)
+        ids.add(record[0])
+    kept = processes * sum(not is_deleted(sequence) for sequence in range(appends))
+    lost = kept - len(seen)
+    if lost:
+        problems.append(f"{lost} row(s) lost")
+    # Ids are given in order after the counter's, so reusing one leaves a gap
+    last_id = storage.get_table(STRESS_FILE).last_id
+    if last_id != int(COUNTER_ID) + processes * appends:
+        problems.append(
+            f"Highest id is {last_id}, expected {int(COUNTER_ID) + processes * appends}"
+        )
+    if counter != processes * appends:
+        problems.append(f"Counter is {counter}, expected {processes * appends}")
+    return problems
+
+
+def main(processes: int, appends: int) -> int:
+    """
+    Run the stress test and report its throughput and outcome.
+
+    :param processes: int
+    :param appends: int
+    :return: The exit status.
+    """
+    common.sandbox()
+    common.write_file(STRESS_FILE, HEADER, [[COUNTER_ID, "counter", "0", ""]])
+    workers = [Process(target=worker, args=(n, appends)) for n in range(processes)]
+    with common.Timer() as timer:
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+    common.report(
+        f"{processes} processes, append + update", processes * appends, timer.seconds
+    )
+
+    problems = check(processes, appends)
+    if problems:
+        print("\n".join(problems[:20]))
+        return 1
+    print(
+        f"OK: {processes * appends} rows, none lost, torn or duplicated, "
+        f"{processes * (appends // CRASH_EVERY)} simulated crashes recovered, "
+        f"no id reused after {processes * (appends // DELETE_EVERY)} deletions."
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 500,
+        )
+    )
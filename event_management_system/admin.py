@@ -2,7 +2,16 @@
 
 # ALEX CHIEW (TP056952)
 
+import os
+import sys
+import analytics
 import ems
+import services
+import storage
+
+RECORDS_PER_PAGE = int(os.environ.get("EMS_PAGE_SIZE", "20"))
+if RECORDS_PER_PAGE < 1:
+    raise ValueError(f"EMS_PAGE_SIZE must be at least 1, not {RECORDS_PER_PAGE}.")
 
 
 def display_admin_main_menu() -> list:
@@ -17,11 +26,30 @@ def display_admin_main_menu() -> list:
         "Modify Event Records",
         "Display Records",
         "Search Specific Event Record",
+        "Reports",
         "Logout",
     ]
     return menu_list
 
 
+def display_reports_menu() -> list:
+    """
+    Display a list of options for the admin to select from to view reports.
+
+    :return: list of menu options
+    """
+    menu_list = [
+        "Revenue Summary",
+        "Revenue Per Event",
+        "Revenue Per Category",
+        "Revenue Per Day",
+        "Revenue Per Month",
+        "Top Customers",
+        "Back to Admin Menu",
+    ]
+    return menu_list
+
+
 def display_view_all_records_menu() -> list:
     """
     Display a list of options for the admin to select from to view records.
@@ -135,70 +163,16 @@ def create_event_category() -> list:
     return master_list
 
 
-def add_event_headers() -> None:
-    """
-    Create a header for the event file.
-
-    :return: None
-    """
-    event_headers = [
-        "event_id",
-        "event_name",
-        "event_category",
-        "event_code",
-        "event_price",
-        "organizer",
-        "start_date",
-        "start_time",
-        "end_date",
-        "end_time",
-        "venue",
-        "total_seats_available",
-        "event_status",
-    ]
-    filename = "event_management_system/data/events.txt"
-    ems.add_file_headers(filename, event_headers)
-
-
-def update_category_total_events(category: str) -> None:
-    """
-    Increment the total number of events in a category based on selected category.
-
-    :param category: str
-    :return: None
-    """
-    filename = "event_management_system/data/category.txt"
-    records = ems.split_multi_delimiters(filename)
-    for data in records:
-        category_name = "".join(data[1]).strip()  # Get only the category name
-        old_record = [
-            item.strip() for item in data
-        ]  # Strip newlines from data and get the values
-        new_record = old_record.copy()  # Copy the values to a new variable
-        if category == category_name:
-            current_value = int(new_record[-1])  # Get last value from the list
-            new_value = current_value + 1  # Add 1 to the value
-            new_record[2] = str(
-                new_value
-            )  # Update the value of total_events in the list
-        # Read the old content of the file
-        with open(filename, "r") as infile:
-            filedata = infile.read()
-            old_data = ";".join(old_record)
-            new_data = ";".join(new_record)
-            new_content = filedata.replace(old_data, new_data)
-        # Overwrite the old content with the new content
-        with open(filename, "w") as outfile:
-            outfile.write(new_content)
-
-
 def create_event() -> list:
     """
-    Accept user inputs to create a list of event details.
+    Accept user inputs to create events and save them once the admin is done.
+
+    An event that does not pass the checks of services.check_event is
+    reported and has to be entered again.
 
-    :return: list of event details
+    :return: The event records as saved.
     """
-    add_event_headers()
+    services.add_event_headers()
     master_list = []
 
     while True:
@@ -222,27 +196,37 @@ def create_event() -> list:
             ems.validate_int_input("Enter the total available seats for the event: ")
         )
 
-        event_info = [
-            event_title,
-            event_category,
-            event_code,
-            ticket_price,
-            organizer_name,
-            start_date,
-            start_time,
-            end_date,
-            end_time,
-            venue,
-            total_seats_available,
-        ]
-
+        event_info = {
+            "event_name": event_title,
+            "event_category": event_category,
+            "event_code": event_code,
+            "event_price": ticket_price,
+            "organizer": organizer_name,
+            "start_date": start_date,
+            "start_time": start_time,
+            "end_date": end_date,
+            "end_time": end_time,
+            "venue": venue,
+            "total_seats_available": total_seats_available,
+        }
+
+        try:
+            services.check_event(
+                event_info, {event["event_code"] for event in master_list}
+            )
+        except services.ServiceError as error:
+            print(f"\n** {error} Please enter the event again. **")
+            continue
         master_list.append(event_info)
 
-        update_category_total_events(event_category)
-
         if not ems.ask_user_yes_no("\nWould you like to add another event? (y/n): "):
             break
-    return master_list
+
+    try:
+        return services.create_events(master_list)
+    except services.ServiceError as error:
+        print(f"\n** {error} No events were saved. **")
+        return []
 
 
 def get_event_status() -> str:
@@ -251,13 +235,10 @@ def get_event_status() -> str:
 
     :return: str
     """
-    status = [
-        "Active",
-        "Completed",
-        "Cancelled",
-    ]
-    user_choice = ems.create_menu(status, "\nSelect the status of the event: ")
-    return status[user_choice - 1]
+    user_choice = ems.create_menu(
+        services.EVENT_STATUSES, "\nSelect the status of the event: "
+    )
+    return services.EVENT_STATUSES[user_choice - 1]
 
 
 def modify_event_record() -> None:
@@ -324,23 +305,62 @@ def modify_event_record() -> None:
             break
 
     ems.update_record(event_file, record_difference)
+    if new_event_record[2] != old_event_record[2]:  # The event changed category
+        services.update_category_total_events(
+            {old_event_record[2]: -1, new_event_record[2]: 1}
+        )
 
     print("\n\n** EVENT RECORD UPDATED SUCCESSFULLY **\n")
     print("-- BACK TO MENU --\n")
 
 
-def view_records(filename: str) -> None:
+def view_records(filename: str, page_size: int = RECORDS_PER_PAGE) -> None:
     """
-    Display all records of the specified file.
+    Display the records of the specified file one page at a time.
+
+    Each page is written to the terminal in one go, and the admin can move
+    to the next or previous page, jump to a page number or stop viewing.
 
     :param filename: str
+    :param page_size: The number of records shown on each page.
     :return: None
     """
-    with open(filename, "r") as file_reader:
-        content = file_reader.readlines()
-        record_list = [item.strip().split(";") for item in content]
-        for data in record_list:
-            print(f"\n{', '.join(data)}")
+    headers = storage.read_header(filename)
+    page_number = 0
+
+    while True:
+        records, total_pages = storage.read_page(filename, page_number, page_size)
+        if not records and total_pages == 0:
+            print("\nNo Records Found.")
+            break
+
+        page = [f"\n{', '.join(headers)}\n"]
+        page.extend(f"\n{', '.join(data)}\n" for data in records)
+        page.append(f"\n\033[1mPAGE {page_number + 1} OF {total_pages}\033[0m\n")
+        sys.stdout.write("".join(page))
+        sys.stdout.flush()
+
+        choice = (
+            input("\n[N]ext page, [P]revious page, page number or [Q]uit: ")
+            .strip()
+            .lower()
+        )
+        if choice in ["", "n", "next"]:
+            if page_number + 1 >= total_pages:
+                print("\nThis is the last page.")
+            else:
+                page_number += 1
+        elif choice in ["p", "previous"]:
+            if page_number == 0:
+                print("\nThis is the first page.")
+            else:
+                page_number -= 1
+        elif choice in ["q", "quit"]:
+            break
+        elif choice.isdigit() and 0 < int(choice) <= total_pages:
+            page_number = int(choice) - 1
+        else:
+            print("\nInvalid choice. Try again.")
 
 
 def find_all_registered_member_records() -> None:
@@ -370,113 +390,28 @@ def save_file_headers(filename: str) -> None:
     :param filename: str
     :return: None
     """
-    with open(filename, "r") as file_reader:
-        content = file_reader.readline()
-        headers = content.strip().split(";")
+    headers = storage.get_table(filename).header
     return headers
 
 
-def search_specific_record_by_string(
-    prompt: str, filename: str, value_index: int
-) -> None:
-    """
-    Search for a specific record in a file based on search term.
-
-    :param prompt: A message that prompts the user to enter the search term.
-    :param filename: The filename for the record to be searched.
-    :return: None
-    """
-    headers = save_file_headers(filename)
-    record_found = False
-
-    while True:
-        search_term = input(prompt)
-        print(f"\n\n{', '.join(headers)}")
-        with open(filename, "r") as file_reader:
-            content = file_reader.readlines()[1:]
-            record_list = [item.strip().split(";") for item in content]
-            result_list = [
-                data for data in record_list if search_term == data[value_index]
-            ]
-            for data in result_list:
-                print(f"\n{', '.join(data)}")
-                record_found = True
-
-        if not record_found:
-            print("\n\n--- No Record Found. ---\n")
-        else:
-            print(f"\n\n\033[1mTOTAL RECORDS FOUND:\033[0m {len(result_list)}")
-        break
-
-
-def search_specific_record_by_date(
-    prompt: str, filename: str, date_length: int, date_format: str, dt_index: int
-) -> None:
+def display_search_results(filename: str, records: list, show_total: bool) -> None:
     """
-    Search for a specific record in a file based on date.
+    Display the records found by a search under the headers of their file.
 
-    :param filename: The filename for the record to be searched.
-    :param kwargs: The keyword arguments for the date and index of date from record.
+    :param filename: The filename of the records.
+    :param records: list
+    :param show_total: Whether to show the number of records found.
     :return: None
     """
     headers = save_file_headers(filename)
-    record_found = False
-
-    while True:
-        search_term = ems.validate_date_format(prompt, date_length, date_format)
-
-        print(f"\n\n{', '.join(headers)}")
-
-        with open(filename, "r") as file_reader:
-            content = file_reader.readlines()[1:]
-            record_list = [item.strip().split(";") for item in content]
-            for data in record_list:
-                formatted_date = ems.format_datetime(
-                    data[dt_index], "%Y-%m-%d", "%Y-%m"
-                )
-                if search_term == formatted_date:
-                    print(f"\n{', '.join(data)}")
-                    record_found = True
-
-        if not record_found:
-            print("\n--- No Record Found. ---")
-        break
-
-
-def search_specific_payment_record_by_amount(
-    prompt: str, filename: str, dt_index: int
-) -> None:
-    """
-    Search payment record by transaction amount.
-
-    :return: None
-    """
-    headers = save_file_headers(filename)
-    record_found = False
-    result_counter = 0
-
-    while True:
-        transaction_amount = ems.validate_int_input(prompt)
-        if transaction_amount < 0:
-            print("\n--- INVALID INPUT! --- Try again.")
-            continue
-
-        print(f"\n\n{', '.join(headers)}")
-
-        with open(filename, "r") as file_reader:
-            content = file_reader.readlines()[1:]
-            record_list = [item.strip().split(";") for item in content]
-            for data in record_list:
-                if 0 <= int(float(data[dt_index])) >= transaction_amount:
-                    print(f"\n{', '.join(data)}")
-                    record_found = True
-                    result_counter += 1
+    print(f"\n\n{', '.join(headers)}")
+    for data in records:
+        print(f"\n{', '.join(data)}")
 
-        if not record_found:
-            print("\n--- No Record Found. ---")
-        else:
-            print(f"\n\n\033[1mTOTAL RECORDS FOUND:\033[0m {result_counter}")
-        break
+    if not records:
+        print("\n\n--- No Record Found. ---\n")
+    elif show_total:
+        print(f"\n\n\033[1mTOTAL RECORDS FOUND:\033[0m {len(records)}")
 
 
 # -------------------- WRAPPER FUNCTIONS TO GET CUSTOMER PAYMENT RECORDS --------------------
@@ -486,10 +421,10 @@ def retrieve_member_record_by_username() -> None:
 
     :return: None
     """
-    client_file = "event_management_system/data/client.txt"
-    logon_name = "\nEnter a username to view their record: "
-    data_index = 1
-    search_specific_record_by_string(logon_name, client_file, data_index)
+    username = input("\nEnter a username to view their record: ")
+    display_search_results(
+        services.CLIENT_FILE, services.search_members(username=username), True
+    )
 
 
 def retrieve_member_record_by_nationality() -> None:
@@ -498,10 +433,10 @@ def retrieve_member_record_by_nationality() -> None:
 
     :return: None
     """
-    client_file = "event_management_system/data/client.txt"
-    nationality = "\nEnter a nationality to begin filtering records: "
-    data_index = 7
-    search_specific_record_by_string(nationality, client_file, data_index)
+    nationality = input("\nEnter a nationality to begin filtering records: ")
+    display_search_results(
+        services.CLIENT_FILE, services.search_members(nationality=nationality), True
+    )
 
 
 def retrieve_member_record_by_birthyear() -> None:
@@ -510,13 +445,10 @@ def retrieve_member_record_by_birthyear() -> None:
 
     :return: None
     """
-    client_file = "event_management_system/data/client.txt"
     year_prompt = "\nEnter a year to begin searching customer records: "
-    date_format = "%Y"  # Format of datetime to be year-only.
-    year_string_length = 4  # Length of string that is to be validated.
-    column_index = 6  # The index of the column that contains the birthdate
-    search_specific_record_by_date(
-        year_prompt, client_file, year_string_length, date_format, column_index
+    birth_year = ems.validate_date_format(year_prompt, 4, "%Y")
+    display_search_results(
+        services.CLIENT_FILE, services.search_members(birth_year=birth_year), False
     )
 
 
@@ -527,10 +459,11 @@ def retrieve_payment_record_by_username() -> None:
 
     :return: None
     """
-    transaction_file = "event_management_system/data/transactions.txt"
-    login_name = "\n\nEnter the username to search for their payment record: "
-    data_index = 1
-    search_specific_record_by_string(login_name, transaction_file, data_index)
+    prompt = "\n\nEnter the username to search for their payment record: "
+    username = input(prompt)
+    display_search_results(
+        services.TRANSACTION_FILE, services.search_payments(username=username), True
+    )
 
 
 def retrieve_payment_record_by_amount() -> None:
@@ -540,10 +473,15 @@ def retrieve_payment_record_by_amount() -> None:
     :return: None
     """
     input_message = "\n\nEnter amount to start searching: > RM "
-    transaction_file = "event_management_system/data/transactions.txt"
-    column_index = -2
-    search_specific_payment_record_by_amount(
-        input_message, transaction_file, column_index
+    while True:
+        transaction_amount = ems.validate_int_input(input_message)
+        if transaction_amount >= 0:
+            break
+        print("\n--- INVALID INPUT! --- Try again.")
+    display_search_results(
+        services.TRANSACTION_FILE,
+        services.search_payments(min_amount=transaction_amount),
+        True,
     )
 
 
@@ -553,18 +491,10 @@ def retrieve_payment_record_by_date() -> None:
 
     :return: None
     """
-    transaction_file = "event_management_system/data/transactions.txt"
     input_message = "\nEnter date in format YYYY-MM (e.g. 2020-01) to search Record: "
-    date_format = "%Y-%m"
-    date_length = 7  # The length of the date string - YYYY-MM
-    value_index = 4  # The index of the date in the transaction record
-
-    search_specific_record_by_date(
-        input_message,
-        transaction_file,
-        date_length,
-        date_format,
-        value_index,
+    month = ems.validate_date_format(input_message, 7, "%Y-%m")
+    display_search_results(
+        services.TRANSACTION_FILE, services.search_payments(month=month), False
     )
 
 
@@ -642,6 +572,84 @@ def check_view_record_selection() -> None:
             break
 
 
+def display_report_rows(title: str, columns: list, rows: list) -> None:
+    """
+    Display the rows of a report under the names of their columns.
+
+    :param title: str
+    :param columns: The keys of the rows to display, in order.
+    :param rows: list of dict
+    :return: None
+    """
+    print(f"\n\n** {title} **")
+    if not rows:
+        print("\n\n--- No Sales Found. ---\n")
+        return
+    print(f"\n\n{', '.join(columns)}")
+    for row in rows:
+        values = [
+            f"{row[column]:.2f}" if isinstance(row[column], float) else str(row[column])
+            for column in columns
+        ]
+        print(f"\n{', '.join(values)}")
+
+
+def check_report_selection() -> None:
+    """
+    Check which sales report to be viewed by the admin.
+
+    :return: None
+    """
+    report = analytics.sales_report()
+    submenu = display_reports_menu()
+    prompt_message = "\nSelect a report to display: "
+    while True:
+        choice = ems.create_menu(submenu, prompt_message)
+        if choice == 1:
+            print("\n\n** REVENUE SUMMARY **")
+            print(f"\n\033[1mTOTAL REVENUE:\033[0m RM {report['total_revenue']:.2f}")
+            print(
+                f"\033[1mSUCCESSFUL TRANSACTIONS:\033[0m "
+                f"{report['total_transactions']}"
+            )
+        elif choice == 2:
+            display_report_rows(
+                "REVENUE PER EVENT",
+                [
+                    "event_code",
+                    "event_name",
+                    "revenue",
+                    "tickets_sold",
+                    "seats_reserved",
+                    "seats_available",
+                    "sell_through",
+                ],
+                report["events"],
+            )
+        elif choice == 3:
+            display_report_rows(
+                "REVENUE PER CATEGORY",
+                ["category", "revenue", "tickets_sold"],
+                report["revenue_per_category"],
+            )
+        elif choice == 4:
+            display_report_rows(
+                "REVENUE PER DAY", ["date", "revenue"], report["revenue_per_day"]
+            )
+        elif choice == 5:
+            display_report_rows(
+                "REVENUE PER MONTH", ["month", "revenue"], report["revenue_per_month"]
+            )
+        elif choice == 6:
+            display_report_rows(
+                "TOP CUSTOMERS",
+                ["username", "revenue", "transactions"],
+                report["top_customers"],
+            )
+        elif choice == 7:
+            break
+
+
 def check_search_record_selection() -> None:
     """
     Check which record to be viewed by the admin.
@@ -678,9 +686,7 @@ def admin_main() -> None:
             ems.append_data_to_file(category_filename, category_details)
             print("\n** Category Added Successfully. **\n")
         elif user_choice == 2:
-            event_details = create_event()
-            event_filename = "event_management_system/data/events.txt"
-            ems.append_data_to_file(event_filename, event_details)
+            create_event()
         elif user_choice == 3:
             print("\n** MODIFYING EVENT RECORDS **")
             modify_event_record()
@@ -689,6 +695,8 @@ def admin_main() -> None:
         elif user_choice == 5:
             check_search_record_selection()
         elif user_choice == 6:
+            check_report_selection()
+        elif user_choice == 7:
             if ems.should_logout():
                 break
 
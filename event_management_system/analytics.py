@@ -0,0 +1,321 @@
+"""
+Sales and revenue reports over the transactions and tickets.
+
+Each file is read once, in a single pass, into columns held in typed arrays:
+the values repeated from row to row (dates, usernames and event codes) are
+stored as integer codes into a list of their distinct values, and the
+amounts as doubles. The totals are then made in one pass over these arrays
+instead of over records made of strings, and ten million transactions only
+take about 160 MB while they are totalled. The totals are kept until the
+files change, so a report asked for again does not read the files again.
+
+Only the successful transactions are counted. The transactions do not say
+which event they paid for, so the figures per event and per category come
+from the tickets paid for, that is the tickets no longer in a cart.
+"""
+
+from array import array
+from typing import NamedTuple
+import heapq
+import services
+import storage
+
+TOP_CUSTOMERS = 10  # Customers listed in the report, by revenue
+
+_totals = {}  # File names -> (version of the files, totals made from them)
+
+
+class PaymentColumns(NamedTuple):
+    """The successful transactions, one array entry per transaction."""
+
+    dates: array  # Code of the entry date
+    customers: array  # Code of the username
+    amounts: array  # Amount paid
+    date_names: list  # Date of every date code
+    customer_names: list  # Username of every customer code
+
+
+class PaymentTotals(NamedTuple):
+    """The revenue of the successful transactions per day and per customer."""
+
+    transactions: int
+    date_names: list
+    day_revenue: list
+    customer_names: list
+    customer_revenue: list
+    customer_transactions: list
+
+
+class TicketColumns(NamedTuple):
+    """The tickets, one array entry per ticket."""
+
+    events: array  # Code of the event code
+    quantities: array  # Seats taken, none while in a cart without a hold
+    revenues: array  # Price times quantity, 0 while the ticket is in a cart
+    paid: array  # 1 for a ticket paid for, 0 for one in a cart
+    event_codes: list  # Event code of every event code
+
+
+class TicketTotals(NamedTuple):
+    """The seats sold and reserved and the revenue per event code."""
+
+    event_codes: list
+    sold: list
+    reserved: list
+    revenue: list
+
+
+def file_version(filename: str):
+    """
+    Get a value that changes whenever a data file is written to.
+
+    :param filename: str
+    :return: tuple
+    """
+    if storage.BACKEND == storage.SQLITE_BACKEND:
+        return storage.get_table(filename).version
+    return (
+        storage.file_signature(filename),
+        storage.file_signature(storage.log_path(filename)),
+    )
+
+
+def read_rows(filename: str):
+    """
+    Iterate over the records of a file, yielding none if it does not exist.
+
+    :param filename: str
+    :return: Generator of records
+    """
+    try:
+        yield from storage.iter_rows(filename)
+    except FileNotFoundError:
+        return
+
+
+def get_totals(filenames: tuple, compute):
+    """
+    Get the totals made from files, making them again if any file has changed.
+
+    :param filenames: The files the totals are made from.
+    :param compute: The function reading the files and making the totals.
+    :return: The totals returned by compute.
+    """
+    version = tuple(file_version(filename) for filename in filenames)
+    cached = _totals.get(filenames)
+    if cached is None or cached[0] != version:
+        cached = (version, compute())
+        _totals[filenames] = cached
+    return cached[1]
+
+
+def read_payment_columns() -> PaymentColumns:
+    """
+    Read the successful transactions into columns.
+
+    :return: PaymentColumns
+    """
+    dates, customers, amounts = array("l"), array("l"), array("d")
+    date_codes, customer_codes = {}, {}
+    for record in read_rows(services.TRANSACTION_FILE):
+        if record[9] != services.TRANSACTION_STATUS:
+            continue
+        date_code = date_codes.get(record[4])
+        if date_code is None:
+            date_code = date_codes[record[4]] = len(date_codes)
+        customer_code = customer_codes.get(record[1])
+        if customer_code is None:
+            customer_code = customer_codes[record[1]] = len(customer_codes)
+        dates.append(date_code)
+        customers.append(customer_code)
+        amounts.append(float(record[8]))
+    return PaymentColumns(
+        dates, customers, amounts, list(date_codes), list(customer_codes)
+    )
+
+
+def read_ticket_columns() -> TicketColumns:
+    """
+    Read the tickets into columns, telling those paid for from those in a cart.
+
+    Cart items booked before seats were held did not take any seats, and
+    are counted neither as sold nor as reserved.
+
+    :return: TicketColumns
+    """
+    # Ticket id of every cart item -> whether the item holds its seats
+    unpaid = {
+        record[0]: len(record) > 8 and record[8] != services.NOT_RESERVED
+        for record in read_rows(services.CART_FILE)
+    }
+    events, quantities = array("l"), array("l")
+    revenues, paid = array("d"), array("b")
+    event_codes = {}
+    for record in read_rows(services.TICKET_FILE):
+        event_code = event_codes.get(record[2])
+        if event_code is None:
+            event_code = event_codes[record[2]] = len(event_codes)
+        quantity = int(record[11])
+        is_paid = record[0] not in unpaid
+        if not is_paid and not unpaid[record[0]]:
+            quantity = 0
+        events.append(event_code)
+        quantities.append(quantity)
+        revenues.append(float(record[10]) * quantity if is_paid else 0.0)
+        paid.append(is_paid)
+    return TicketColumns(events, quantities, revenues, paid, list(event_codes))
+
+
+def total_payments() -> PaymentTotals:
+    """
+    Total the revenue per day and per customer in a single pass.
+
+    :return: PaymentTotals
+    """
+    columns = read_payment_columns()
+    day_revenue = [0.0] * len(columns.date_names)
+    customer_revenue = [0.0] * len(columns.customer_names)
+    customer_transactions = [0] * len(columns.customer_names)
+    for date, customer, amount in zip(
+        columns.dates, columns.customers, columns.amounts
+    ):
+        day_revenue[date] += amount
+        customer_revenue[customer] += amount
+        customer_transactions[customer] += 1
+    return PaymentTotals(
+        len(columns.amounts),
+        columns.date_names,
+        day_revenue,
+        columns.customer_names,
+        customer_revenue,
+        customer_transactions,
+    )
+
+
+def total_tickets() -> TicketTotals:
+    """
+    Total the seats sold and reserved and the revenue per event in a single pass.
+
+    :return: TicketTotals
+    """
+    columns = read_ticket_columns()
+    size = len(columns.event_codes)
+    sold, reserved, revenue = [0] * size, [0] * size, [0.0] * size
+    for event, quantity, ticket_revenue, paid in zip(
+        columns.events, columns.quantities, columns.revenues, columns.paid
+    ):
+        if paid:
+            sold[event] += quantity
+            revenue[event] += ticket_revenue
+        else:
+            reserved[event] += quantity
+    return TicketTotals(columns.event_codes, sold, reserved, revenue)
+
+
+def payment_report(totals: PaymentTotals, top: int) -> dict:
+    """
+    Report the revenue in total, per day, per month and of the top customers.
+
+    :param totals: PaymentTotals
+    :param top: The number of customers to list.
+    :return: dict
+    """
+    days = sorted(zip(totals.date_names, totals.day_revenue))
+    months = {}
+    for date, revenue in days:
+        months[date[:7]] = months.get(date[:7], 0.0) + revenue
+    top_customers = heapq.nlargest(
+        top,
+        range(len(totals.customer_revenue)),
+        key=totals.customer_revenue.__getitem__,
+    )
+    return {
+        "total_revenue": round(sum(totals.day_revenue), 2),
+        "total_transactions": totals.transactions,
+        "revenue_per_day": [
+            {"date": date, "revenue": round(revenue, 2)} for date, revenue in days
+        ],
+        "revenue_per_month": [
+            {"month": month, "revenue": round(revenue, 2)}
+            for month, revenue in months.items()
+        ],
+        "top_customers": [
+            {
+                "username": totals.customer_names[customer],
+                "revenue": round(totals.customer_revenue[customer], 2),
+                "transactions": totals.customer_transactions[customer],
+            }
+            for customer in top_customers
+        ],
+    }
+
+
+def ticket_report(totals: TicketTotals) -> dict:
+    """
+    Report the revenue and seats of every event, and the revenue per category.
+
+    Seats still in a cart are reserved: they are off the seats available but
+    not sold yet. The capacity of an event is its seats sold, reserved and
+    available, and its sell-through the share of that capacity sold.
+
+    :param totals: TicketTotals
+    :return: dict
+    """
+    codes = {code: index for index, code in enumerate(totals.event_codes)}
+    events = []
+    categories = {}
+    for record in read_rows(services.EVENT_FILE):
+        index = codes.get(record[3])
+        sold = totals.sold[index] if index is not None else 0
+        reserved = totals.reserved[index] if index is not None else 0
+        revenue = totals.revenue[index] if index is not None else 0.0
+        seats_available = int(record[11])
+        capacity = sold + reserved + seats_available
+        events.append(
+            {
+                "event_code": record[3],
+                "event_name": record[1],
+                "category": record[2],
+                "revenue": round(revenue, 2),
+                "tickets_sold": sold,
+                "seats_reserved": reserved,
+                "seats_available": seats_available,
+                "sell_through": round(sold / capacity, 4) if capacity else 0.0,
+            }
+        )
+        category = categories.setdefault(
+            record[2], {"category": record[2], "revenue": 0.0, "tickets_sold": 0}
+        )
+        category["revenue"] += revenue
+        category["tickets_sold"] += sold
+
+    for category in categories.values():
+        category["revenue"] = round(category["revenue"], 2)
+    return {
+        "events": sorted(events, key=lambda event: -event["revenue"]),
+        "revenue_per_category": sorted(
+            categories.values(), key=lambda category: -category["revenue"]
+        ),
+    }
+
+
+def sales_report(top: int = TOP_CUSTOMERS) -> dict:
+    """
+    Compute the sales and revenue report.
+
+    The report holds the total revenue and number of successful transactions,
+    the revenue per day and per month in date order, the top customers by
+    revenue, and per event and per category the revenue and tickets sold,
+    the events also with their seats reserved, available and sell-through.
+
+    :param top: The number of customers to list.
+    :return: dict
+    """
+    report = payment_report(
+        get_totals((services.TRANSACTION_FILE,), total_payments), top
+    )
+    ticket_totals = get_totals(
+        (services.TICKET_FILE, services.CART_FILE), total_tickets
+    )
+    report.update(ticket_report(ticket_totals))
+    return report
@@ -0,0 +1,80 @@
+"""Cache of the events grouped by category, ready to be displayed."""
+
+from datetime import datetime
+from typing import NamedTuple
+import threading
+import dates
+import storage
+
+EVENT_FILE = "event_management_system/data/events.txt"
+CATEGORY_INDEX = 2  # The index of the event category in events.txt
+
+# Entries of every category read, with the version of the table they were read at
+_catalogue = {"table": None, "categories": {}}
+_catalogue_lock = threading.Lock()
+
+
+class CatalogueEntry(NamedTuple):
+    """An event record with its start parsed and its details pre-rendered."""
+
+    record: list
+    starts_at: datetime
+    details: str
+
+
+def create_entry(record: list) -> CatalogueEntry:
+    """
+    Parse the start of an event and render its details for display.
+
+    :param record: The event record without its event id.
+    :return: CatalogueEntry
+    """
+    start_date, start_time = dates.parse_date(record[5]), dates.parse_time(record[6])
+    starts_at = dates.to_datetime(start_date, start_time)
+    formatted_date = dates.format_date(start_date)
+    formatted_time = dates.format_time(start_time)
+    details = "\n".join(
+        [
+            f"\n\n\033[1mEvent Name:\033[0m {record[0]}",
+            f"\033[1mEvent Category:\033[0m {record[1]}",
+            f"\033[1mOrganizer:\033[0m {record[4]}",
+            f"\033[1mDate and Time:\033[0m {formatted_date}, {formatted_time} GMT",
+            f"\033[1mLocation:\033[0m {record[9]}",
+            f"\033[1mTicket Price:\033[0m RM {float(record[3]):.2f}",
+            f"\033[1mSeats Available:\033[0m {record[-2]}",
+            f"\033[1mStatus:\033[0m {record[-1]}",
+            f"\n\033[1mEVENT CODE:\033[0m {record[2]}",
+        ]
+    )
+    return CatalogueEntry(record, starts_at, details)
+
+
+def get_category_events(category: str) -> list:
+    """
+    Get the catalogue entries of the events in a category.
+
+    The entries of a category are brought up to date whenever the events have
+    changed since they were last read, whether by this process or by another
+    one. Only the events of the category are read, through the index of the
+    category column, and only those that changed are rendered again, so a
+    booking elsewhere costs a category as much as its own events.
+
+    :param category: str
+    :return: List of CatalogueEntry in file order.
+    """
+    with storage.file_lock(EVENT_FILE, exclusive=False), _catalogue_lock:
+        table = storage.get_table(EVENT_FILE)
+        if _catalogue["table"] is not table:
+            _catalogue.update(table=table, categories={})
+        version = table.version
+        entries_version, entries = _catalogue["categories"].get(category, (None, []))
+        if entries_version != version:
+            previous_entries = {entry.record[2]: entry for entry in entries}
+            entries = []
+            for record in table.find_all(CATEGORY_INDEX, category):
+                entry = previous_entries.get(record[3])
+                if entry is None or entry.record != record[1:]:
+                    entry = create_entry(record[1:])
+                entries.append(entry)
+            _catalogue["categories"][category] = (version, entries)
+        return entries
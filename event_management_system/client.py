@@ -3,8 +3,42 @@
 # Alex Chiew (TP056952)
 # Achreen Kaur (TP063334)
 
-from datetime import datetime
 import ems
+import passwords
+import services
+import storage
+
+
+class CustomerSession:
+    """
+    Record of the logged-in customer, kept for the length of one session.
+
+    The record is taken from the login and only replaced when the customer
+    edits their profile, so the menus never have to read client.txt again.
+    A new username is only taken once the cart, tickets and transactions of
+    the customer have been moved to it.
+    """
+
+    def __init__(self, record: list) -> None:
+        self.record = record
+
+    @property
+    def username(self) -> str:
+        """
+        Get the username of the customer.
+
+        :return: str
+        """
+        return self.record[1]
+
+    def refresh(self, record: list) -> None:
+        """
+        Replace the cached record after the profile has been written to file.
+
+        :param record: list
+        :return: None
+        """
+        self.record = record.copy()
 
 
 def display_customer_main_menu() -> list:
@@ -44,12 +78,7 @@ def display_payment_method() -> list:
 
     :return: list
     """
-    payment_options = [
-        "Credit Card",
-        "Debit Card",
-        "eWallet",
-    ]
-    return payment_options
+    return services.PAYMENT_MODES.copy()
 
 
 def display_profile_modification_menu() -> list:
@@ -68,29 +97,32 @@ def display_profile_modification_menu() -> list:
     return menu_list
 
 
-def login() -> str:
+def login() -> CustomerSession:
     """
     Login to the system.
 
-    :return: The username of the customer
+    :return: The session of the customer
     """
     client_file_path = "event_management_system/data/client.txt"
     account_details = ems.authenticate_login_credentials(client_file_path)
+    session = CustomerSession(
+        storage.get_table(client_file_path).find(1, account_details[0]).copy()
+    )
     print("\n" + ("*" * 42))
     print(f"\tWelcome Back, {account_details[2].upper()}!")
     print("*" * 42)
-    return account_details[0]
+    return session
 
 
-def edit_profile(username: str) -> None:
+def edit_profile(session: CustomerSession) -> None:
     """
     Edit and update profile based on selected column.
 
+    :param session: The session of the logged-in customer.
     :return: None
     """
-    client_filename = "event_management_system/data/client.txt"
     menu_prompt = "\nSelect the detail you wish to modify: "
-    old_profile_record = ems.find_customer_record_by_username(username)
+    old_profile_record = session.record
     new_profile_record = old_profile_record.copy()
     submenu = display_profile_modification_menu()
     record_difference = []
@@ -98,11 +130,19 @@ def edit_profile(username: str) -> None:
     while True:
         user_choice = ems.create_menu(submenu, menu_prompt)
         if user_choice == 1:
-            new_profile_record[1] = input("\nEnter your new username: ")
+            try:
+                new_profile_record[1] = services.check_username(
+                    input("\nEnter your new username: "), old_profile_record[0]
+                )
+            except services.ServiceError as error:
+                print(f"\n** {error} Please choose another username. **")
+                continue
             record_difference.append([old_profile_record, new_profile_record])
             print("\n\n** USERNAME UPDATED SUCCESSFULLY **")
         elif user_choice == 2:
-            new_profile_record[2] = ems.validate_password("\nEnter your new password: ")
+            new_profile_record[2] = passwords.hash_password(
+                ems.validate_password("\nEnter your new password: ")
+            )
             record_difference.append([old_profile_record, new_profile_record])
             print("\n\n** PASSWORD UPDATED SUCCESSFULLY **")
         elif user_choice == 3:
@@ -121,22 +161,30 @@ def edit_profile(username: str) -> None:
         if not ems.ask_user_yes_no("\nWould you like to edit another value? (y/n): "):
             break
 
-    ems.update_record(client_filename, record_difference)
+    if record_difference:
+        try:
+            session.refresh(
+                services.update_member(old_profile_record, new_profile_record)
+            )
+        except services.ServiceError as error:
+            print(f"\n** {error} Your profile was not changed. **\n")
+            return
 
     print("\n\n** PROFILE UPDATED SUCCESSFULLY **\n")
     print("-- BACK TO MENU --\n")
 
 
-def view_profile(username: str) -> None:
+def view_profile(session: CustomerSession) -> None:
     """
     Display user profile.
 
+    :param session: The session of the logged-in customer.
     :return: None
     """
-    profile = ems.find_customer_record_by_username(username)
+    profile = session.record
     print("\n\n** VIEWING PROFILE **")
     print(f"\n\033[1mUsername:\033[0m {profile[1]}")
-    print(f"\033[1mPassword:\033[0m {profile[2]}")
+    print(f"\033[1mPassword:\033[0m {'*' * 8}")
     print(f"\033[1mName:\033[0m {profile[3]}")
     print(f"\033[1mAge:\033[0m {profile[4]}")
     print(f"\033[1mGender:\033[0m {profile[5]}")
@@ -147,273 +195,74 @@ def view_profile(username: str) -> None:
     print("-- BACK TO MENU --\n")
 
 
-def generate_data_id() -> str:
-    """
-    Generate a unique id for each record using microseconds.
-
-    :return: A string of numbers for the id generated by datetime microseconds.
-    """
-    data_id = datetime.now().strftime("%f%f")
-    return data_id
-
-
-def create_event_tickets_file_headers() -> None:
-    """
-    Create the headers for the orders file.
-
-    :return: None
-    """
-    event_tickets_file_path = "event_management_system/data/tickets.txt"
-    ticket_headers = [
-        "ticket_id",
-        "event_name",
-        "event_code",
-        "username",
-        "customer_name",
-        "email_address",
-        "contact_number",
-        "event_venue",
-        "event_date",
-        "event_time",
-        "event_price",
-        "quantity",
-    ]
-    ems.add_file_headers(event_tickets_file_path, ticket_headers)
-
-
-def create_cart_file_headers() -> None:
-    """
-    Create headers for the cart file.
-
-    :return: None
-    """
-    cart_filename = "event_management_system/data/cart.txt"
-    cart_headers = [
-        "ticket_id",
-        "event_name",
-        "event_code",
-        "username",
-        "attendee_name",
-        "price",
-        "quantity",
-        "total_price",
-    ]
-    ems.add_file_headers(cart_filename, cart_headers)
-
-
 def book_event_ticket(username: str) -> list:
     """
-    Book an event ticket.
+    Book event tickets and add them to the cart of the customer.
 
-    :return: list
+    :return: The ticket records as saved.
     """
-    create_event_tickets_file_headers()
-    record_found = False
-    master_list = []
+    bookings = []
 
     while True:
-        event_summary = ems.get_event_summary()
+        event_summary = ems.get_event_summary() or []
         event_code = input("\nEnter the event code you wish to add to your cart: ")
-        ticket_id = generate_data_id()
-
-        for record in event_summary:
-            if event_code == record[2]:
-                event_name = record[0]
-                event_code = record[2]
-                event_price = record[3]
-                event_date = record[5]
-                event_time = record[6]
-                event_venue = record[-3]
-                customer_name = input("\n\nEnter your name: ")
-                email_address = ems.validate_email("Enter your email address: ")
-                contact_number = input("Enter your contact number: ")
-                quantity = str(
-                    ems.validate_int_input(
-                        "Enter the number of tickets you wish to book: "
-                    )
-                )
-                master_list.append(
-                    [
-                        ticket_id[:4],
-                        event_name,
-                        event_code,
-                        username,
-                        customer_name,
-                        email_address,
-                        contact_number,
-                        event_venue,
-                        event_date,
-                        event_time,
-                        event_price,
-                        quantity,
-                    ]
-                )
-                record_found = True
 
-        if not record_found:
+        if event_code not in [record[2] for record in event_summary]:
             print("\n\n** Invalid event code. Please try again. **\n")
             continue
 
+        customer_name = input("\n\nEnter your name: ")
+        email_address = ems.validate_email("Enter your email address: ")
+        contact_number = input("Enter your contact number: ")
+        quantity = ems.validate_int_input(
+            "Enter the number of tickets you wish to book: "
+        )
+        bookings.append(
+            {
+                "event_code": event_code,
+                "attendee_name": customer_name,
+                "email_address": email_address,
+                "contact_number": contact_number,
+                "quantity": quantity,
+            }
+        )
+
         if not ems.ask_user_yes_no(
             "\nWould you like to add another event to your cart? (y/n): "
         ):
             break
 
-    return master_list
-
-
-def save_details_to_file(filename: str, data: list) -> None:
-    """
-    Save data to file based on given filename.
-
-    :filename: The name of the file to save the data to.
-    :mode: Whether to append or write to file
-    :data: Records to be saved to file
-    :return: None
-    """
-    with open(filename, "a+") as file_handler:
-        file_handler.seek(0)
-        for records in data:
-            file_handler.write(f"{';'.join(records)}\n")
-
-
-def save_order_details(ticket_details: list) -> None:
-    """
-    Wrapper function to save the order details to the orders file.
-
-    :return: None
-    """
-    orders_file_path = "event_management_system/data/tickets.txt"
-    save_details_to_file(orders_file_path, ticket_details)
-
+    try:
+        return services.book_tickets(username, bookings)
+    except services.ServiceError as error:
+        print(f"\n\n** {error} No tickets were booked. **\n")
+        return []
 
-def save_orders_to_cart(ticket_details: list) -> None:
-    """
-    Wrapper function to save the order details to the cart file.
 
-    :param ticket_details: Details containing the order details.
-    :return: list
-    """
-    create_cart_file_headers()
-    cart_file_path = "event_management_system/data/cart.txt"
-    order_details = []
-
-    for data in ticket_details:
-        event_price = float(data[-2])
-        quantity = int(data[-1])
-        total_price = f"{event_price * quantity:.2f}"
-
-        order_details.append(
-            [
-                data[0],
-                data[1],
-                data[2],
-                data[3],
-                data[4],
-                data[-2],
-                data[-1],
-                total_price,
-            ]
-        )
-
-    save_details_to_file(cart_file_path, order_details)
-
-
-def create_transaction_file_headers() -> None:
-    """
-    Create headers for the transaction file.
-
-    :return: None
-    """
-    cart_filename = "event_management_system/data/transactions.txt"
-    cart_headers = [
-        "transaction_id",
-        "username",
-        "bank_name",
-        "bank_reference_number",
-        "transaction_entry_date",
-        "transaction_entry_time",
-        "payment_mode",
-        "card_type",
-        "transaction_amount",
-        "transaction_status",
-    ]
-    ems.add_file_headers(cart_filename, cart_headers)
-
-
-def display_ticket_summary(username: str, event_code: str) -> None:
+def display_ticket_summary(tickets: list) -> None:
     """
     Display the ticket summary for the customer after checking out their cart.
 
-    :username: The username of the user.
-    :event_code: The event code of the event.
+    :tickets: The ticket records paid for.
     :return: None
     """
     print("\n\n" + ("+" * 32))
     print("\tTICKET SUMMARY")
     print("+" * 32)
 
-    tickets_file = "event_management_system/data/tickets.txt"
-
-    with open(tickets_file, "r") as infile:
-        contents = infile.readlines()[1:]  # Skip the header row
-        data_list = [item.strip().split(";") for item in contents]
-        for data in data_list:
-            if username == data[3] and event_code == data[2]:
-                formatted_date = ems.format_datetime(
-                    data[-4], "%Y-%m-%d", "%A, %b %d, %Y"
-                )
-                formatted_time = ems.format_datetime(
-                    data[-3], "%H:%M", "%#H:%M %p"
-                )  # Format the time (replace hastag with dash on Linux)
-                print(f"\n\033[1mTicket ID:\033[0m {data[0]}")
-                print(f"\033[1mEvent Name:\033[0m {data[1]}")
-                print(f"\033[1mEvent Code:\033[0m {data[2]}")
-                print(f"\033[1mAttendee Name:\033[0m {data[4]}")
-                print(f"\033[1mEmail Address:\033[0m {data[5]}")
-                print(f"\033[1mContact Number:\033[0m {data[6]}")
-                print(f"\033[1mLocation:\033[0m {data[7]}")
-                print(
-                    f"\033[1mEvent Date:\033[0m {formatted_date}, {formatted_time} GMT"
-                )
-
-
-def save_transaction_details(
-    username: str, event_code: str, transaction_details: list
-) -> None:
-    """
-    Wrapper function to save the transaction details to the transaction file.
-
-    :param username: The username of the user.
-    :param event_code: The event code of the event.
-    :return: None
-    """
-    create_transaction_file_headers()
-    transaction_file_path = "event_management_system/data/transactions.txt"
-    transaction_status = "SUCCESSFUL"
-    transaction_record = []
-
-    for data in transaction_details:
-        transaction_record.append(
-            [
-                data[0],
-                data[1],
-                data[2],
-                data[3],
-                data[4],
-                data[5],
-                data[6],
-                data[7],
-                data[8],
-                transaction_status,
-            ]
-        )
-
-    save_details_to_file(transaction_file_path, transaction_record)
-    print("\n" + ("-" * 31))
-    print("----- PAYMENT SUCCESSFUL! -----")
-    print("-" * 31)
-    display_ticket_summary(username, event_code)
+    for data in tickets:
+        formatted_date = ems.format_datetime(data[-4], "%Y-%m-%d", "%A, %b %d, %Y")
+        formatted_time = ems.format_datetime(
+            data[-3], "%H:%M", "%#H:%M %p"
+        )  # Format the time (replace hastag with dash on Linux)
+        print(f"\n\033[1mTicket ID:\033[0m {data[0]}")
+        print(f"\033[1mEvent Name:\033[0m {data[1]}")
+        print(f"\033[1mEvent Code:\033[0m {data[2]}")
+        print(f"\033[1mAttendee Name:\033[0m {data[4]}")
+        print(f"\033[1mEmail Address:\033[0m {data[5]}")
+        print(f"\033[1mContact Number:\033[0m {data[6]}")
+        print(f"\033[1mLocation:\033[0m {data[7]}")
+        print(f"\033[1mEvent Date:\033[0m {formatted_date}, {formatted_time} GMT")
 
 
 def display_cart_item_summary(username: str) -> list:
@@ -423,54 +272,23 @@ def display_cart_item_summary(username: str) -> list:
     :username: The username of the client
     :return: list
     """
-    cart_file = "event_management_system/data/cart.txt"
-    record_found = False
-    cart_items = []
-
-    with open(cart_file, "r") as infile:
-        contents = infile.readlines()[1:]  # Skip the header row
-        data_list = [
-            item.strip().split(";") for item in contents
-        ]  # Strip whitespace/newlines in data and split them using ";" as delimiter
-        for record in data_list:
-            if username == record[3]:
-                print(f"\n\033[1mOrder ID:\033[0m {record[0]}")
-                print(f"\033[1mEvent Name:\033[0m {record[1]}")
-                print(f"\033[1mAttendee Name:\033[0m {record[4]}")
-                print(f"\033[1mTicket Price:\033[0m RM {float(record[-3]):.2f}")
-                print(f"\033[1mPax:\033[0m {record[-2]}")
-                print(f"\033[1mTotal:\033[0m RM {record[-1]}")
-                print(f"\n\033[1mEVENT CODE:\033[0m {record[2]}\n")
-                cart_items.append(record)
-                record_found = True
-
-    if not record_found:
+    cart_items = services.get_cart(username)
+
+    for record in cart_items:
+        print(f"\n\033[1mOrder ID:\033[0m {record[0]}")
+        print(f"\033[1mEvent Name:\033[0m {record[1]}")
+        print(f"\033[1mAttendee Name:\033[0m {record[4]}")
+        print(f"\033[1mTicket Price:\033[0m RM {float(record[5]):.2f}")
+        print(f"\033[1mPax:\033[0m {record[6]}")
+        print(f"\033[1mTotal:\033[0m RM {record[7]}")
+        print(f"\n\033[1mEVENT CODE:\033[0m {record[2]}\n")
+
+    if not cart_items:
         print("\n\n--- Your cart is empty. ---")
     else:
         return cart_items
 
 
-def remove_cart_item(username: str, event_code: str) -> None:
-    """
-    Update the cart file after removing the customer has made payment for the order.
-
-    :param username: The username of the user.
-    :param event_code: The event code of the event.
-    :return: None
-    """
-    cart_file = "event_management_system/data/cart.txt"
-
-    with open(cart_file, "r") as infile:
-        filedata = infile.readlines()
-        data_list = [item.strip().split(";") for item in filedata]
-
-    with open(cart_file, "w") as outfile:
-        outfile.write(filedata[0])
-        for data in data_list[1:]:
-            if not (username == data[3] and event_code == data[2]):
-                outfile.write(f"{';'.join(data)}\n")
-
-
 def checkout_session(username: str, cart_details: list) -> None:
     """
     Manage the checkout session.
@@ -482,52 +300,62 @@ def checkout_session(username: str, cart_details: list) -> None:
     print(f"\n\n\033[1m{'-'*33}\033[0m")
     print("\t\033[1mCHECKOUT PANEL\033[0m")
     print(f"\033[1m{'-'*33}\033[0m")
-    payment_details = []
-    record_found = False
 
-    while True:
-        display_cart_item_summary(username)
-        now = datetime.now()  # Get current date and time
-        transaction_id = generate_data_id()[
-            :8
-        ]  # Generate 10 numbers for transasction id
-        bank_reference_number = generate_data_id()[
-            :10
-        ]  # Generate 8 numbers for bank reference number
-        transaction_entry_date = now.strftime("%Y-%m-%d")
-        transaction_entry_time = now.strftime("%H:%M")
-        event_code_input = input("\nEnter the event code you wish to make payment on: ")
-        for record in cart_details:
-            if event_code_input == record[2]:
-                card_type = input("\nCard Type (e.g. VISA/MASTERCARD/AMEX): ").upper()
-                bank_name = input("\nEnter your bank name: ")
-                payment_options = display_payment_method()
-                selection = ems.create_menu(payment_options, "\nCard Type: ")
-                payment_mode = payment_options[selection - 1]
-                total_amount = record[-1]
-                payment_details.append(
-                    [
-                        transaction_id,
-                        username,
-                        bank_name,
-                        bank_reference_number,
-                        transaction_entry_date,
-                        transaction_entry_time,
-                        payment_mode,
-                        card_type,
-                        total_amount,
-                    ]
-                )
-                record_found = True
-
-        if not record_found:
+    display_cart_item_summary(username)
+    cart_event_codes = [record[2] for record in cart_details]
+    event_codes = None
+    if not ems.ask_user_yes_no("\nPay for every item in your cart? (y/n): "):
+        while True:
+            event_codes = [
+                event_code.strip()
+                for event_code in input(
+                    "\nEnter the event codes you wish to make payment on, "
+                    "separated by commas: "
+                ).split(",")
+                if event_code.strip()
+            ]
+            if event_codes and all(code in cart_event_codes for code in event_codes):
+                break
             print("\n\n** Invalid event code. **")
-            continue
 
-        if not ems.ask_user_yes_no("\nMake another payment? (y/n): "):
-            save_transaction_details(username, event_code_input, payment_details)
-            remove_cart_item(username, event_code_input)
-            break
+    card_type = input("\nCard Type (e.g. VISA/MASTERCARD/AMEX): ")
+    bank_name = input("\nEnter your bank name: ")
+    payment_options = display_payment_method()
+    selection = ems.create_menu(payment_options, "\nCard Type: ")
+    try:
+        _, tickets = services.checkout(
+            username,
+            bank_name,
+            payment_options[selection - 1],
+            card_type,
+            event_codes,
+        )
+    except services.ServiceError as error:
+        print(f"\n\n** {error} **")
+        for note in getattr(error, "__notes__", []):
+            print(f"** {note} Please contact your bank. **")
+        return
+
+    print("\n" + ("-" * 31))
+    print("----- PAYMENT SUCCESSFUL! -----")
+    print("-" * 31)
+    display_ticket_summary(tickets)
+
+
+def remove_cart_item(username: str) -> None:
+    """
+    Remove an item from the cart of the customer and release its seats.
+
+    :username: The username of the client
+    :return: None
+    """
+    ticket_id = input("\nEnter the order ID of the item you wish to remove: ")
+    try:
+        services.remove_cart_items(username, [ticket_id.strip()])
+    except services.ServiceError as error:
+        print(f"\n\n** {error} **")
+    else:
+        print("\n\n** Item removed from your cart. **")
 
 
 def view_cart_item_details(username: str) -> None:
@@ -541,23 +369,27 @@ def view_cart_item_details(username: str) -> None:
     if cart_items is not None:
         if ems.ask_user_yes_no("Would you like to checkout now? (y/n): "):
             checkout_session(username, cart_items)
+        elif ems.ask_user_yes_no(
+            "Would you like to remove an item from your cart? (y/n): "
+        ):
+            remove_cart_item(username)
     print("\n** BACK TO MENU **\n")
 
 
-def check_profile_submenu_selection(username: str) -> None:
+def check_profile_submenu_selection(session: CustomerSession) -> None:
     """
     Check user profile submenu choice.
 
-    :username: str
+    :session: The session of the logged-in customer.
     :return: None
     """
     profile_submenu = display_profile_submenu()
     while True:
         choice = ems.create_menu(profile_submenu)
         if choice == 1:
-            view_profile(username)
+            view_profile(session)
         elif choice == 2:
-            edit_profile(username)
+            edit_profile(session)
         elif choice == 3:
             break
 
@@ -568,14 +400,12 @@ def client_main() -> None:
 
     :return: None
     """
-    login_name = login()
+    session = login()
     customer_main_menu = display_customer_main_menu()
     while True:
         user_selection = ems.create_menu(customer_main_menu)
         if user_selection == 1:
-            booking_details = book_event_ticket(login_name)
-            save_order_details(booking_details)
-            save_orders_to_cart(booking_details)
+            book_event_ticket(session.username)
         elif user_selection == 2:
             category_filename = "event_management_system/data/category.txt"
             print("\n\n** You are viewing all current event categories **")
@@ -584,10 +414,10 @@ def client_main() -> None:
         elif user_selection == 3:
             ems.get_event_summary()
         elif user_selection == 4:
-            check_profile_submenu_selection(login_name)
+            check_profile_submenu_selection(session)
         elif user_selection == 5:
             print("\n\n** You are now viewing your shopping cart **")
-            view_cart_item_details(login_name)
+            view_cart_item_details(session.username)
         elif user_selection == 6:
             if ems.should_logout():
                 break
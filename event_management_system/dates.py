@@ -0,0 +1,98 @@
+"""
+Parsing and display of the dates and times stored in the data files.
+
+Dates ("YYYY-MM-DD") are parsed into the number of days since 1970-01-01
+and times ("HH:MM") into the number of minutes since midnight, so that they
+can be compared as plain integers. Parsing and rendering are memoized, as
+the same few dates and times repeat across the records.
+"""
+
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+DATE_FORMAT = "%Y-%m-%d"
+TIME_FORMAT = "%H:%M"
+DISPLAY_DATE_FORMAT = "%A, %b %d, %Y"
+DISPLAY_TIME_FORMAT = "%#H:%M %p"  # Replace the hastag with a dash on Linux
+CACHE_SIZE = 4096  # Distinct values remembered by each memoized function
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_date(data: str) -> int:
+    """
+    Parse a stored date into the number of days since 1970-01-01.
+
+    :param data: str
+    :return: int
+    """
+    year, month, day = data.split("-")
+    return date(int(year), int(month), int(day)).toordinal() - EPOCH_ORDINAL
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_time(data: str) -> int:
+    """
+    Parse a stored time into the number of minutes since midnight.
+
+    :param data: str
+    :return: int
+    """
+    hours, minutes = data.split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"time data '{data}' is out of range")
+    return hours * 60 + minutes
+
+
+def to_datetime(days: int, minutes: int = 0) -> datetime:
+    """
+    Convert a parsed date and time back into a datetime.
+
+    :param days: int
+    :param minutes: int
+    :return: datetime
+    """
+    return datetime.fromordinal(days + EPOCH_ORDINAL) + timedelta(minutes=minutes)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def format_date(days: int, new_format: str = DISPLAY_DATE_FORMAT) -> str:
+    """
+    Render a parsed date for display.
+
+    :param days: int
+    :param new_format: str
+    :return: str
+    """
+    return to_datetime(days).strftime(new_format)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def format_time(minutes: int, new_format: str = DISPLAY_TIME_FORMAT) -> str:
+    """
+    Render a parsed time for display.
+
+    :param minutes: int
+    :param new_format: str
+    :return: str
+    """
+    return to_datetime(0, minutes).strftime(new_format)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def reformat(data: str, initial_format: str, new_format: str) -> str:
+    """
+    Convert a date or time from one format to another.
+
+    :param data: The value to be formatted.
+    :param initial_format: The original format of the data.
+    :param new_format: The new format for the value.
+    :return: str
+    """
+    if initial_format == DATE_FORMAT:
+        return format_date(parse_date(data), new_format)
+    if initial_format == TIME_FORMAT:
+        return format_time(parse_time(data), new_format)
+    return datetime.strptime(data, initial_format).strftime(new_format)
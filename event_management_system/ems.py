@@ -4,8 +4,14 @@
 # ACHREEN KAUR (TP063334)
 
 from datetime import datetime
+from functools import lru_cache
 import admin
+import catalogue
 import client
+import dates
+import passwords
+import services
+import storage
 import sys
 
 
@@ -150,6 +156,28 @@ def validate_gender(prompt: str) -> str:
             return user_gender
 
 
+@lru_cache(maxsize=dates.CACHE_SIZE)
+def check_date_format(date_value: str, length: int, date_format: str) -> str:
+    """
+    Check that a date is in the specified date format.
+
+    :param date_value: str
+    :param length: int
+    :param date_format: str
+    :return: The date, unchanged.
+    :raises ValueError: With the reason the date was rejected.
+    """
+    if len(date_value) != length:
+        if not date_value:
+            raise ValueError("Field must not be blank.")
+        raise ValueError("Invalid date format.")
+    try:
+        datetime.strptime(date_value, date_format)
+    except ValueError:
+        raise ValueError("Invalid date.") from None
+    return date_value
+
+
 def validate_date_format(date_prompt: str, length: int, date_format: str) -> str:
     """
     Validate the date format.
@@ -160,26 +188,18 @@ def validate_date_format(date_prompt: str, length: int, date_format: str) -> str
     """
     while True:
         try:
-            user_input = input(date_prompt)
-            if len(user_input) == length:
-                str(
-                    datetime.strptime(user_input, date_format).date()
-                )  # Convert user input date format into a specified date format
-                return user_input
-            if not user_input:
-                print("\nField must not be blank.\n")
-            else:
-                print("\nInvalid date format.\n")
-        except ValueError:
-            print("\nInvalid date.\n")
+            return check_date_format(input(date_prompt), length, date_format)
+        except ValueError as error:
+            print(f"\n{error}\n")
 
 
-def validate_password(password_prompt: str) -> str:
+def check_password(password: str) -> str:
     """
-    Validate user password.
+    Check that a password is strong enough.
 
-    :param password_prompt: str
-    :return: str
+    :param password: str
+    :return: The password, unchanged.
+    :raises ValueError: With the reason the password was rejected.
     """
     special_symbols = [
         "!",
@@ -209,26 +229,55 @@ def validate_password(password_prompt: str) -> str:
         "/",
         "?",
     ]
+    if len(password) < 8:  # Check if the length of the password is less than eight
+        raise ValueError("Password must be at least 8 characters long.")
+    if not any(
+        char.isdigit() for char in password
+    ):  # Check if the password contains at least one digit
+        raise ValueError("Password must contain at least one digit.")
+    if not any(
+        char.isupper() for char in password
+    ):  # Check if the password contains at least one uppercase letter
+        raise ValueError("Password must contain at least one uppercase letter.")
+    if not any(
+        char in special_symbols for char in password
+    ):  # Check if the password contains at least one special symbol
+        raise ValueError("Password must contain at least one special symbol.")
+    return password
+
+
+def validate_password(password_prompt: str) -> str:
+    """
+    Validate user password.
+
+    :param password_prompt: str
+    :return: str
+    """
     while True:
-        user_password = input(password_prompt)
-        if (
-            len(user_password) < 8
-        ):  # Check if the length of the password is less than eight
-            print("\nPassword must be at least 8 characters long.\n")
-        elif not any(
-            char.isdigit for char in user_password
-        ):  # Check if the password contains at least one digit
-            print("\nPassword must contain at least one digit.\n")
-        elif not any(
-            char.isupper() for char in user_password
-        ):  # Check if the password contains at least one uppercase letter
-            print("\nPassword must contain at least one uppercase letter.\n")
-        elif not any(
-            char in special_symbols for char in user_password
-        ):  # Check if the password contains at least one special symbol
-            print("\nPassword must contain at least one special symbol.\n")
-        else:
-            return user_password
+        try:
+            return check_password(input(password_prompt))
+        except ValueError as error:
+            print(f"\n{error}\n")
+
+
+def check_email(email: str) -> str:
+    """
+    Check the format of an email address.
+
+    :param email: str
+    :return: The email address, stripped and in lowercase.
+    :raises ValueError: If the email address is invalid.
+    """
+    email = email.strip().lower()  # strip whitespace and make lowercase
+    if "@" not in email:  # Check if the email contains @ symbol
+        raise ValueError("Invalid email address.")
+    if email[-4:] not in [
+        ".com",
+        ".net",
+        ".org",
+    ]:  # Check if the email contains .com, .net or .org top level domain names
+        raise ValueError("Invalid email address.")
+    return email
 
 
 def validate_email(email_prompt: str) -> str:
@@ -238,22 +287,11 @@ def validate_email(email_prompt: str) -> str:
     :param email_prompt: str
     :return: str
     """
-    error_email_message = "Invalid email address.\n"
-
     while True:
-        user_email = (
-            input(email_prompt).strip().lower()
-        )  # strip whitespace and make lowercase
-        if "@" not in user_email:  # Check if the email contains @ symbol
-            print(f"\n{error_email_message}")
-        elif user_email[-4:] not in [
-            ".com",
-            ".net",
-            ".org",
-        ]:  # Check if the email contains .com, .net or .org top level domain names
-            print(f"\n{error_email_message}")
-        else:
-            return user_email
+        try:
+            return check_email(input(email_prompt))
+        except ValueError as error:
+            print(f"\n{error}\n")
 
 
 def format_datetime(data: str, initial_format: str, new_format: str) -> str:
@@ -265,14 +303,17 @@ def format_datetime(data: str, initial_format: str, new_format: str) -> str:
     :param new_format: The new datetime format for the value.
     :return: str
     """
-    temp = datetime.strptime(data, initial_format)
-    return str(datetime.strftime(temp, new_format))
+    return dates.reformat(data, initial_format, new_format)
 
 
 def authenticate_login_credentials(filename: str) -> bool:
     """
     Authenticate the login credentials of the user.
 
+    The account is looked up through the username index of the record store
+    and the password is checked against its salted hash. Plaintext passwords
+    left from before hashing was introduced are hashed on a successful login.
+
     :param account_details: list
     :return: bool
     """
@@ -280,20 +321,19 @@ def authenticate_login_credentials(filename: str) -> bool:
     while True:
         username = input("\nUsername: ")
         password = input("Password: ")
-        with open(filename, "r") as file_reader:
-            content = file_reader.readlines()[1:]
-            for line in content:
-                login_info = line.strip().split(";")[1:]
-                if (
-                    not username or not password
-                ):  # Check if the username or password is empty
-                    print("\n**Username or Password field must not be blank.**")
-                    break
-                if username == login_info[0] and password == login_info[1]:
-                    print("\nLOGIN SUCCESSFUL!\n")
-                    return login_info
-            else:
-                print("\nIncorrect Credentials Entered. Try again.")
+        if not username or not password:  # Check if the username or password is empty
+            print("\n**Username or Password field must not be blank.**")
+            continue
+        record = storage.get_table(filename).find(1, username)
+        if record is not None and passwords.verify_password(password, record[2]):
+            if passwords.needs_rehash(record[2]):
+                new_record = record.copy()
+                new_record[2] = passwords.hash_password(password)
+                update_record(filename, [[record, new_record]])
+                record = new_record
+            print("\nLOGIN SUCCESSFUL!\n")
+            return record[1:]
+        print("\nIncorrect Credentials Entered. Try again.")
 
 
 def create_menu(choices: list[str], prompt: str = "\nChoose an option: ") -> int:
@@ -320,46 +360,34 @@ def create_menu(choices: list[str], prompt: str = "\nChoose an option: ") -> int
         print("\n** Please enter a number within the listed options. **\n")
 
 
-def create_header(filename: str, column_name: list[str]) -> None:
+def create_header(
+    filename: str, column_name: list[str], default_values: dict = None
+) -> None:
     """
     Create headers for data files.
 
     :param filename: str
     :param column_name: list[str]
+    :param default_values: Values of the columns added since an older file.
     :return: None
     """
-    try:
-        # Try to read the first line of the file
-        with open(filename, "r", encoding="utf-8") as file_writer:
-            old_column_name = file_writer.readline()
-    except FileNotFoundError:
-        old_column_name = ""
-    if not old_column_name:
-        with open(filename, "w", encoding="utf-8") as file_writer:
-            file_writer.write(f"{';'.join(column_name)}\n")
-    elif (
-        old_column_name.split("\n")[0].split(";") != column_name
-    ):  # Split by newline first and then by semicolon
-        raise AssertionError(
-            "Incorrect file headers detected."
-        )  # Detect incorrect column names
-    elif not old_column_name.endswith("\n"):
-        # Append a newline if the column names are not terminated by a newline
-        with open(filename, "a", encoding="utf-8") as file_writer:
-            file_writer.write("\n")
-
-
-def add_file_headers(filename: str, headers: list[str]) -> None:
+    storage.ensure_header(filename, column_name, default_values)
+
+
+def add_file_headers(
+    filename: str, headers: list[str], default_values: dict = None
+) -> None:
     """
     Check whether the headers has been added to the file for the calling functions.
 
     :param filename: str
     :param headers: list[str]
+    :param default_values: Values of the columns added since an older file.
     :return: None
     """
     is_headers_added = False
     if not is_headers_added:
-        create_header(filename, headers)
+        create_header(filename, headers, default_values)
         is_headers_added = True
 
 
@@ -367,15 +395,14 @@ def append_data_to_file(filename: str, record_details: list[list[str]]) -> None:
     """
     Generate a new line of data to be appended to the file.
 
+    The ids continue from the highest id kept by the record store, so the
+    whole batch is written in one append without reading the file again.
+
     :param filename: str
     :param record_details: list[list[str]]
     :return: None
     """
-    with open(filename, "a+") as file_handler:
-        file_handler.seek(0)
-        total_lines = len(file_handler.readlines())
-        for data_id, records in enumerate(record_details):
-            file_handler.write(f"{total_lines + data_id};{';'.join(records)}\n")
+    storage.append_numbered_rows(filename, record_details)
 
 
 def add_admin_file_headers() -> None:
@@ -393,21 +420,22 @@ def create_default_admin_account() -> list:
     """
     Create a default admin account if one does not exist.
 
-    :return: list
+    The password is only hashed when the account is created, as hashing
+    takes a noticeable time on every login otherwise.
+
+    :return: The accounts created, none if an admin exists already.
     """
     add_admin_file_headers()
     master_list = []
     filename = "event_management_system/data/admin.txt"
-    admin_username = "admin"
-    admin_password = "superuser"
-    admin_email = "su@aems.apu.edu.my"
-    account_info = [admin_username, admin_password, admin_email]
-    master_list.append(account_info)
-
-    with open(filename, "r") as file_writer:
-        record_exist = file_writer.readlines()[1:]
-        if not record_exist:
-            append_data_to_file(filename, master_list)
+
+    if next(storage.iter_rows(filename), None) is None:
+        admin_username = "admin"
+        admin_password = passwords.hash_password("superuser")
+        admin_email = "su@aems.apu.edu.my"
+        account_info = [admin_username, admin_password, admin_email]
+        master_list.append(account_info)
+        append_data_to_file(filename, master_list)
     return master_list
 
 
@@ -442,22 +470,18 @@ def check_duplicate_username(username_prompt: str) -> str:
     """
     while True:
         logon_name = input(username_prompt)
-        with open("event_management_system/data/client.txt", "r") as file_reader:
-            content = file_reader.readlines()[1:]
-            data_list = [item.strip().split(";") for item in content]
-            for record in data_list:
-                if logon_name == record[1]:
-                    print("\n**Username already exists. Try again**")
-                    break
-            else:
-                return logon_name
+        client_file_path = "event_management_system/data/client.txt"
+        if storage.get_table(client_file_path).find(1, logon_name) is not None:
+            print("\n**Username already exists. Try again**")
+        else:
+            return logon_name
 
 
 def create_new_member_account() -> list:
     """
     Create a new member account.
 
-    :return: list
+    :return: The client record of the new member, or None if it was rejected.
     """
     create_customer_file_headers()
     print("\n\n" + ("*" * 45))
@@ -477,21 +501,26 @@ def create_new_member_account() -> list:
         member_contact = input("Enter your contact number: ")
         member_email = validate_email("Enter your email address: ")
 
-        account_info = [
-            username,
-            password,
-            member_name,
-            member_age,
-            member_gender,
-            member_birthdate,
-            member_nationality,
-            member_contact,
-            member_email,
-        ]
+        account_info = {
+            "username": username,
+            "password": password,
+            "name": member_name,
+            "age": member_age,
+            "gender": member_gender,
+            "birthdate": member_birthdate,
+            "nationality": member_nationality,
+            "contact_number": member_contact,
+            "email_address": member_email,
+        }
         break
 
+    try:
+        member_record = services.register_member(account_info)
+    except services.ServiceError as error:
+        print(f"\n**{error}**")
+        return None
     print("\n**ACCOUNT CREATED**")
-    return account_info
+    return member_record
 
 
 def split_multi_delimiters(filename: str) -> list:
@@ -504,11 +533,9 @@ def split_multi_delimiters(filename: str) -> list:
     records = []
     data_list = []
 
-    with open(filename, "r") as file_reader:
-        contents = file_reader.readlines()[1:]
-        for value in contents:
-            data_value = ". ".join(value.strip().split(";", 1))
-            records.append(data_value)
+    for record in storage.iter_rows(filename):
+        data_value = ". ".join(";".join(record).split(";", 1))
+        records.append(data_value)
 
     for data in records:
         id_split = data.split(".", 1)
@@ -555,16 +582,19 @@ def display_all_records(filename: str) -> None:
     :return: None
     """
     try:
-        with open(filename, "r") as file_reader:
-            content_list = file_reader.readlines()
-            if len(content_list) == 0:
-                print("\nFile is empty.")
-            elif len(content_list) == 1:
+        headers = storage.read_header(filename)
+        record_found = False
+        if not headers:
+            print("\nFile is empty.")
+        else:
+            for data in storage.iter_rows(filename):
+                if not record_found:
+                    print("\n", end="")
+                    print(f"\n{', '.join(headers)}")
+                    record_found = True
+                print(f"\n{', '.join(data)}")
+            if not record_found:
                 print("\nNo Records Found.")
-            else:
-                print("\n", end="")
-                for data in content_list:
-                    print(f"\n{', '.join(data.strip().split(';'))}")
     except FileNotFoundError:
         print(f"Sorry, '{filename}' does not exist.")
 
@@ -573,19 +603,13 @@ def update_record(filename: str, data_difference: list) -> None:
     """
     Update changed values of a record in the file.
 
+    Only the rows of the changed records are rewritten.
+
     :param filename: str
     :param data_difference: list
     :return: None
     """
-    with open(filename, "r") as file_reader:
-        filedata = file_reader.read()
-        for data in data_difference:
-            old_data = ";".join(data[0])
-            new_data = ";".join(data[1])
-            new_content = filedata.replace(old_data, new_data)
-
-    with open(filename, "w") as file_writer:
-        file_writer.write(new_content)
+    storage.update_rows(filename, data_difference)
 
 
 def find_record(filename: str, data: str, value_index: int) -> list:
@@ -596,13 +620,10 @@ def find_record(filename: str, data: str, value_index: int) -> list:
     :param data: str
     :return: list
     """
-    with open(filename, "r") as infile:
-        contents = infile.readlines()[1:]
-        data_list = [item.strip().split(";") for item in contents]
-        for record in data_list:
-            if data == record[value_index]:
-                return record
-        print("\n\n --- No Such Record Found. ---\n")
+    record = storage.get_table(filename).find(value_index, data)
+    if record is not None:
+        return record.copy()
+    print("\n\n --- No Such Record Found. ---\n")
 
 
 def find_customer_record_by_username(username: str) -> list:
@@ -636,42 +657,15 @@ def get_event_summary() -> list:
 
     :return: None
     """
-    event_file_path = "event_management_system/data/events.txt"
     prompt_message = "\nSelect a category to view event details: "
     category = check_category_selection(prompt_message)
-    record_found = False
-    record_list = []
-
-    with open(event_file_path, "r") as file_reader:
-        event_content = file_reader.readlines()[1:]  # Skip the header
-        # Get the record of the selected category
-        event_details = [item.strip().split(";")[1:] for item in event_content]
-        for data in event_details:
-            if category in data:
-                formatted_date = format_datetime(
-                    data[5], "%Y-%m-%d", "%A, %b %d, %Y"
-                )  # Format the date
-                formatted_time = format_datetime(
-                    data[6], "%H:%M", "%#H:%M %p"
-                )  # Format the time (replace hastag with dash on Linux)
-                print(f"\n\n\033[1mEvent Name:\033[0m {data[0]}")
-                print(f"\033[1mEvent Category:\033[0m {data[1]}")
-                print(f"\033[1mOrganizer:\033[0m {data[4]}")
-                print(
-                    f"\033[1mDate and Time:\033[0m {formatted_date}, {formatted_time} GMT"
-                )
-                print(f"\033[1mLocation:\033[0m {data[9]}")
-                print(f"\033[1mTicket Price:\033[0m RM {float(data[3]):.2f}")
-                print(f"\033[1mSeats Available:\033[0m {data[-2]}")
-                print(f"\033[1mStatus:\033[0m {data[-1]}")
-                print(f"\n\033[1mEVENT CODE:\033[0m {data[2]}")
-                record_list.append(data)
-                record_found = True
-
-    if not record_found:
+    category_events = catalogue.get_category_events(category)
+
+    if not category_events:
         print("\n --- No Records Found ---\n")
     else:
-        return record_list
+        print("\n".join(entry.details for entry in category_events))
+        return [entry.record.copy() for entry in category_events]
 
 
 def should_logout() -> bool:
@@ -694,10 +688,7 @@ def check_guest_menu_selection() -> None:
     while True:
         choice = create_menu(guest_menu)
         if choice == 1:
-            member_account = create_new_member_account()
-            append_data_to_file(
-                "event_management_system/data/client.txt", member_account
-            )
+            create_new_member_account()
             break
         elif choice == 2:
             get_event_summary()
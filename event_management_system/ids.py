@@ -0,0 +1,119 @@
+"""
+Unique, time-ordered ids of the records.
+
+An id packs the time in milliseconds, the process id and a sequence number
+that counts the ids generated within the same millisecond, so that threads
+and processes generating ids at once never hand out the same one.
+"""
+
+import os
+import threading
+import time
+
+ID_SEQUENCE_BITS = 12  # Ids that can be generated within the same millisecond
+ID_PROCESS_BITS = 22  # Large enough to hold any process id on Linux
+
+_id_lock = threading.Lock()
+_last_id_timestamp = 0
+_id_sequence = 0
+_id_process_bits = 0  # Process id shifted into place, set again on fork
+
+
+def set_id_process() -> None:
+    """
+    Keep the process id shifted into its place in the ids.
+
+    It is set when the module is loaded and again in a forked child, so that
+    generating an id does not ask for the process id every time.
+
+    :return: None
+    """
+    global _id_process_bits
+
+    process_id = os.getpid() & ((1 << ID_PROCESS_BITS) - 1)
+    _id_process_bits = process_id << ID_SEQUENCE_BITS
+
+
+set_id_process()
+if hasattr(os, "register_at_fork"):  # Not available on Windows
+    os.register_at_fork(after_in_child=set_id_process)
+
+
+def reserve_id_sequences(count: int) -> int:
+    """
+    Reserve the sequence numbers of a number of ids.
+
+    The time in milliseconds and the sequence number within it are counted
+    together as one number, the first of those reserved being returned.
+
+    :param count: int
+    :return: int
+    """
+    global _last_id_timestamp, _id_sequence
+
+    with _id_lock:
+        timestamp = time.time_ns() // 1_000_000
+        if timestamp > _last_id_timestamp:
+            first = timestamp << ID_SEQUENCE_BITS
+        else:
+            first = (_last_id_timestamp << ID_SEQUENCE_BITS) + _id_sequence + 1
+        last = first + count - 1
+        _last_id_timestamp = last >> ID_SEQUENCE_BITS
+        _id_sequence = last & ((1 << ID_SEQUENCE_BITS) - 1)
+    return first
+
+
+def generate_data_id() -> str:
+    """
+    Generate a unique, time-ordered id for each record.
+
+    The id packs the current time in milliseconds, the process id and a
+    sequence number that counts the ids generated within the same millisecond.
+    When the sequence runs out the id borrows the next millisecond, so ids
+    never repeat and always increase within a process.
+
+    :return: A string of numbers for the id.
+    """
+    global _last_id_timestamp, _id_sequence
+
+    with _id_lock:
+        timestamp = time.time_ns() // 1_000_000
+        if timestamp > _last_id_timestamp:
+            _last_id_timestamp = timestamp
+            _id_sequence = 0
+        else:
+            _id_sequence += 1
+            if _id_sequence >> ID_SEQUENCE_BITS:
+                _last_id_timestamp += 1
+                _id_sequence = 0
+        timestamp, sequence = _last_id_timestamp, _id_sequence
+
+    return str(
+        (timestamp << (ID_PROCESS_BITS + ID_SEQUENCE_BITS))
+        | _id_process_bits
+        | sequence
+    )
+
+
+def generate_data_ids(count: int) -> list:
+    """
+    Generate a number of ids at once, as generate_data_id would one by one.
+
+    The sequence numbers are reserved all together, and the ids of the same
+    millisecond only differ by their sequence number, so they are made as a
+    range of numbers.
+
+    :param count: int
+    :return: list
+    """
+    data_ids = []
+    sequence = reserve_id_sequences(count)
+    end = sequence + count
+    while sequence < end:
+        timestamp = sequence >> ID_SEQUENCE_BITS
+        first = sequence & ((1 << ID_SEQUENCE_BITS) - 1)
+        last = min(1 << ID_SEQUENCE_BITS, first + end - sequence)
+        base = (timestamp << (ID_PROCESS_BITS + ID_SEQUENCE_BITS)) | _id_process_bits
+        data_ids.extend(map(str, range(base + first, base + last)))
+        sequence += last - first
+    return data_ids
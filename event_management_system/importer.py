@@ -0,0 +1,187 @@
+"""
+Non-interactive bulk import of records from CSV or JSON Lines files.
+
+Usage: python event_management_system/importer.py {events|members} <file>
+
+The first line of a CSV file names the columns, while each line of a JSON
+Lines file (".jsonl") is an object keyed by the column names. Every row is
+checked before anything is written, so a file with any invalid row imports
+nothing. Members whose username is already taken are skipped instead, so
+that an interrupted migration can simply be run again.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import json
+import os
+import sys
+import ems
+import passwords
+import services
+import storage
+
+MAX_REPORTED_ERRORS = 20  # Invalid rows listed before the rest are summed up
+
+
+class ImportRowError(ValueError):
+    """Raised when a row of an import file does not pass validation."""
+
+
+def read_rows(path: str):
+    """
+    Read the rows of a CSV or JSON Lines file as dictionaries.
+
+    :param path: str
+    :return: Generator of (line number, row) pairs
+    """
+    with open(path, "r", encoding="utf-8", newline="") as file_reader:
+        if os.path.splitext(path)[1].lower() == ".jsonl":
+            for line_number, line in enumerate(file_reader, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                if not isinstance(row, dict):
+                    raise ImportRowError(f"Line {line_number}: Not a JSON object.")
+                yield line_number, row
+        else:
+            reader = csv.DictReader(file_reader)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def summarize(messages: list) -> str:
+    """
+    Join messages into one, listing only the first few of a long list.
+
+    :param messages: list
+    :return: str
+    """
+    if len(messages) > MAX_REPORTED_ERRORS:
+        hidden = len(messages) - MAX_REPORTED_ERRORS
+        messages = messages[:MAX_REPORTED_ERRORS] + [f"... and {hidden} more."]
+    return "\n".join(messages)
+
+
+def import_events(path: str) -> tuple:
+    """
+    Import every event of a file, or none of them if any row is invalid.
+
+    The ids are allocated as one block and the events are written in a
+    single append, after which the category totals are updated once.
+
+    :param path: str
+    :return: The number of events imported and the messages about the rows
+        skipped, which is always empty for events.
+    :raises ImportRowError: Listing every invalid row with its line number.
+    """
+    services.add_event_headers()
+    records = []
+    errors = []
+
+    with storage.file_lock(services.EVENT_FILE):
+        tables = (
+            storage.get_table(services.CATEGORY_FILE),
+            storage.get_table(services.EVENT_FILE),
+        )
+        new_event_codes = set()
+        for line_number, row in read_rows(path):
+            try:
+                record = services.check_event(row, new_event_codes, tables)
+            except services.ServiceError as error:
+                errors.append(f"Line {line_number}: {error}")
+                continue
+            new_event_codes.add(record[2])
+            records.append(record)
+
+        if errors:
+            raise ImportRowError(summarize(errors))
+        services.save_events(records)
+
+    return len(records), []
+
+
+def hash_new_password(password: str) -> str:
+    """
+    Hash a password, unless it has been hashed already.
+
+    :param password: str
+    :return: str
+    """
+    return (
+        password if passwords.is_hashed(password) else passwords.hash_password(password)
+    )
+
+
+def import_members(path: str) -> tuple:
+    """
+    Register every member of a file, skipping the usernames already taken.
+
+    The usernames of the existing members are read into a set once. Rows with
+    a taken username are reported and skipped, while any other invalid row
+    stops the import before anything is written. The passwords are hashed in
+    a thread pool, as hashing is what takes the bulk of the time and runs
+    outside the interpreter lock. The client file is only locked once the
+    passwords are hashed, to check the usernames again against the members
+    registered in the meantime and write the new ones in one append, so that
+    logins and registrations are not held up by the import.
+
+    :param path: str
+    :return: The number of members imported and the messages about the rows
+        skipped.
+    :raises ImportRowError: Listing every invalid row with its line number.
+    """
+    ems.create_customer_file_headers()
+    records = []
+    line_numbers = []
+    errors = []
+    skipped = []
+
+    usernames = {record[1] for record in storage.iter_rows(services.CLIENT_FILE)}
+    for line_number, row in read_rows(path):
+        try:
+            record = services.check_member(row)
+        except services.ServiceError as error:
+            errors.append(f"Line {line_number}: {error}")
+            continue
+        if record[0] in usernames:
+            skipped.append(f"Line {line_number}: Username '{record[0]}' exists.")
+            continue
+        usernames.add(record[0])
+        records.append(record)
+        line_numbers.append(line_number)
+
+    if errors:
+        raise ImportRowError(summarize(errors))
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        hashed = executor.map(hash_new_password, [record[1] for record in records])
+        for record, password in zip(records, hashed):
+            record[1] = password
+
+    with storage.file_lock(services.CLIENT_FILE):
+        table = storage.get_table(services.CLIENT_FILE)
+        new_records = []
+        for line_number, record in zip(line_numbers, records):
+            if table.find(1, record[0]) is not None:
+                skipped.append(f"Line {line_number}: Username '{record[0]}' exists.")
+            else:
+                new_records.append(record)
+        if new_records:
+            storage.append_numbered_rows(services.CLIENT_FILE, new_records)
+
+    return len(new_records), skipped
+
+
+if __name__ == "__main__":
+    importers = {"events": import_events, "members": import_members}
+    if len(sys.argv) != 3 or sys.argv[1] not in importers:
+        sys.exit(f"Usage: python {sys.argv[0]} {{{'|'.join(importers)}}} <file>")
+    try:
+        total, skipped = importers[sys.argv[1]](sys.argv[2])
+    except ImportRowError as error:
+        sys.exit(f"Nothing was imported:\n{error}")
+    print(f"Imported {total} {sys.argv[1]} from '{sys.argv[2]}'.")
+    if skipped:
+        print(f"Skipped {len(skipped)} row(s):\n{summarize(skipped)}")
@@ -0,0 +1,93 @@
+"""
+Seat inventory of the events, kept in the total_seats_available column.
+
+Booking reserves seats by taking them off the seats available and paying
+for the cart item at checkout confirms the reservation, so the seats stay
+taken. Seats that are not paid for are released back to the event. Every
+change is checked and made while holding the lock on the event file, so
+that concurrent sessions, in this process or another one, can never take
+more seats than there are. A change is appended to the log of the event
+file as a single entry per event instead of rewriting the file.
+"""
+
+import storage
+
+EVENT_FILE = "event_management_system/data/events.txt"
+CODE_INDEX = 3  # The index of the event code in events.txt
+SEATS_INDEX = 11  # The index of the total seats available in events.txt
+STATUS_INDEX = 12  # The index of the event status in events.txt
+ACTIVE_STATUS = "Active"
+
+
+class InventoryError(ValueError):
+    """Raised when seats cannot be reserved or released."""
+
+
+def adjust_seats(seat_changes: dict, bookable_only: bool = False, changes=None) -> None:
+    """
+    Change the seats available of several events, all of them or none.
+
+    Within a batch the change is only made when the batch ends, so the
+    seats of an event must be changed once per batch.
+
+    :param seat_changes: Mapping of event codes to the number of seats to add,
+        which is negative to take seats.
+    :param bookable_only: Whether to refuse events that are not active.
+    :param changes: The storage.Batch holding the event file to make the
+        change in, or None to make it at once.
+    :return: None
+    :raises InventoryError: If an event does not exist, is not active when
+        required, or does not have enough seats left.
+    """
+    with storage.file_lock(EVENT_FILE):
+        table = storage.get_table(EVENT_FILE)
+        data_difference = []
+        for event_code, change in seat_changes.items():
+            record = table.find(CODE_INDEX, event_code)
+            if record is None:
+                raise InventoryError(f"Invalid event code '{event_code}'.")
+            if (
+                bookable_only
+                and len(record) > STATUS_INDEX
+                and record[STATUS_INDEX] != ACTIVE_STATUS
+            ):
+                raise InventoryError(f"Event '{event_code}' is not open for booking.")
+            seats_available = int(record[SEATS_INDEX]) + change
+            if seats_available < 0:
+                raise InventoryError(
+                    f"Only {record[SEATS_INDEX]} seat(s) left for event '{event_code}'."
+                )
+            new_record = record.copy()
+            new_record[SEATS_INDEX] = str(seats_available)
+            data_difference.append([record, new_record])
+        if changes is None:
+            storage.update_rows(EVENT_FILE, data_difference)
+        else:
+            changes.update(
+                EVENT_FILE,
+                {new_record[0]: new_record for _, new_record in data_difference},
+            )
+
+
+def reserve_seats(seat_counts: dict, changes=None) -> None:
+    """
+    Take seats of active events for tickets that are being booked.
+
+    :param seat_counts: Mapping of event codes to the number of seats.
+    :param changes: The storage.Batch to make the change in, if any.
+    :return: None
+    :raises InventoryError: If any event cannot take all of its seats, in
+        which case no seat is taken.
+    """
+    adjust_seats({code: -count for code, count in seat_counts.items()}, True, changes)
+
+
+def release_seats(seat_counts: dict, changes=None) -> None:
+    """
+    Give back seats that were reserved but will not be paid for.
+
+    :param seat_counts: Mapping of event codes to the number of seats.
+    :param changes: The storage.Batch to make the change in, if any.
+    :return: None
+    """
+    adjust_seats(seat_counts, changes=changes)
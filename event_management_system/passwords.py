@@ -0,0 +1,113 @@
+"""Salted password hashing for the admin and client accounts."""
+
+import hashlib
+import hmac
+import os
+import sys
+import storage
+
+HASH_ALGORITHM = "pbkdf2_sha256"
+# Number of PBKDF2 rounds: each doubling doubles both the cost of a login and
+# the cost of guessing a password from a stolen data file.
+HASH_ITERATIONS = int(os.environ.get("EMS_PASSWORD_ITERATIONS", "200000"))
+SALT_LENGTH = 16
+PASSWORD_INDEX = 2  # The index of the password column in admin.txt and client.txt
+
+
+def hash_password(password: str, iterations: int = HASH_ITERATIONS) -> str:
+    """
+    Hash a password with a random salt.
+
+    :param password: str
+    :param iterations: int
+    :return: The algorithm, iterations, salt and hash joined by "$".
+    """
+    salt = os.urandom(SALT_LENGTH)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{HASH_ALGORITHM}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def is_hashed(stored_password: str) -> bool:
+    """
+    Check whether a stored password has already been hashed.
+
+    :param stored_password: str
+    :return: bool
+    """
+    return stored_password.startswith(f"{HASH_ALGORITHM}$")
+
+
+def is_valid_hash(stored_password: str) -> bool:
+    """
+    Check whether a hashed password is made of the parts joined by hash_password.
+
+    :param stored_password: str
+    :return: bool
+    """
+    parts = stored_password.split("$")
+    if len(parts) != 4 or parts[0] != HASH_ALGORITHM or not parts[1].isdigit():
+        return False
+    try:
+        return bool(bytes.fromhex(parts[2])) and bool(bytes.fromhex(parts[3]))
+    except ValueError:
+        return False
+
+
+def verify_password(password: str, stored_password: str) -> bool:
+    """
+    Check a password against a stored hash, or a plaintext password not yet migrated.
+
+    A malformed hash matches no password.
+
+    :param password: str
+    :param stored_password: str
+    :return: bool
+    """
+    if not is_hashed(stored_password):
+        return hmac.compare_digest(password.encode(), stored_password.encode())
+    if not is_valid_hash(stored_password):
+        return False
+    _, iterations, salt, digest = stored_password.split("$")
+    candidate = hashlib.pbkdf2_hmac(
+        "sha256", password.encode("utf-8"), bytes.fromhex(salt), int(iterations)
+    )
+    return hmac.compare_digest(candidate.hex(), digest)
+
+
+def needs_rehash(stored_password: str) -> bool:
+    """
+    Check whether a stored password is plaintext or hashed with another cost.
+
+    :param stored_password: str
+    :return: bool
+    """
+    return not is_hashed(stored_password) or stored_password.split("$")[1] != str(
+        HASH_ITERATIONS
+    )
+
+
+def migrate_plaintext_passwords(filename: str) -> int:
+    """
+    Replace every plaintext password of an account file with its hash.
+
+    :param filename: str
+    :return: The number of passwords that were hashed.
+    """
+    with storage.file_lock(filename):
+        record_difference = []
+        for record in storage.iter_rows(filename):
+            if not is_hashed(record[PASSWORD_INDEX]):
+                new_record = record.copy()
+                new_record[PASSWORD_INDEX] = hash_password(record[PASSWORD_INDEX])
+                record_difference.append([record, new_record])
+        storage.update_rows(filename, record_difference)
+    return len(record_difference)
+
+
+if __name__ == "__main__":
+    for account_file in sys.argv[1:] or [
+        "event_management_system/data/admin.txt",
+        "event_management_system/data/client.txt",
+    ]:
+        total = migrate_plaintext_passwords(account_file)
+        print(f"Hashed {total} password(s) in '{account_file}'.")
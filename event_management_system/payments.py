@@ -0,0 +1,214 @@
+"""
+Payment gateways that authorize the transactions of a checkout.
+
+The gateway is picked by the EMS_PAYMENT_GATEWAY environment variable among
+GATEWAYS. The "simulated" gateway stands in for a payment provider: it
+waits EMS_GATEWAY_LATENCY seconds on every call and fails with a probability
+of EMS_GATEWAY_FAILURE_RATE, either before or after it has taken the money.
+
+The transactions of a checkout are authorized concurrently. A failed call
+is retried with the same idempotency key, derived from the transaction id,
+so a retry after a lost answer never charges twice. If any transaction
+cannot be authorized, the others are voided.
+"""
+
+from abc import ABC, abstractmethod
+import asyncio
+import os
+import random
+import secrets
+
+GATEWAY = os.environ.get("EMS_PAYMENT_GATEWAY", "simulated")
+GATEWAY_LATENCY = float(os.environ.get("EMS_GATEWAY_LATENCY", "0.2"))
+GATEWAY_FAILURE_RATE = float(os.environ.get("EMS_GATEWAY_FAILURE_RATE", "0"))
+MAX_ATTEMPTS = 3  # Calls made to authorize a transaction before giving up
+RETRY_DELAY = 0.1  # Seconds before the first retry, doubled for every retry
+
+_gateway = {"instance": None}
+
+
+class GatewayError(Exception):
+    """Raised when the gateway cannot be reached or fails to answer."""
+
+
+class PaymentDeclined(ValueError):
+    """Raised when the gateway refuses a payment."""
+
+
+class PaymentGateway(ABC):
+    """
+    Interface of a payment provider.
+
+    Calls are keyed by an idempotency key: calling again with the same key
+    gives the same result instead of making the change again.
+    """
+
+    @abstractmethod
+    async def authorize(self, idempotency_key: str, amount: float, details: dict):
+        """
+        Take an amount from the account of the customer.
+
+        :param idempotency_key: str
+        :param amount: float
+        :param details: The bank_name, payment_mode and card_type of the payment.
+        :return: The reference of the payment at the bank.
+        :raises GatewayError: If the call may be retried.
+        :raises PaymentDeclined: If the payment is refused.
+        """
+
+    @abstractmethod
+    async def void(self, idempotency_key: str) -> None:
+        """
+        Give back the amount of an authorized payment.
+
+        :param idempotency_key: str
+        :return: None
+        :raises GatewayError: If the call may be retried.
+        """
+
+
+class SimulatedGateway(PaymentGateway):
+    """Local stand-in for a payment provider, keeping its payments in memory."""
+
+    def __init__(
+        self,
+        latency: float = GATEWAY_LATENCY,
+        failure_rate: float = GATEWAY_FAILURE_RATE,
+        seed: int = None,
+    ) -> None:
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.payments = {}  # Idempotency key -> [bank reference, amount]
+        self.calls = 0
+
+    async def call(self) -> bool:
+        """
+        Wait for the simulated network, failing now and then.
+
+        :return: Whether the answer is lost after the call has been handled.
+        :raises GatewayError: If the call fails before it is handled.
+        """
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.random.random() >= self.failure_rate:
+            return False
+        if self.random.random() < 0.5:
+            raise GatewayError("The payment gateway is unavailable.")
+        return True
+
+    async def authorize(self, idempotency_key: str, amount: float, details: dict):
+        """
+        Record a payment, or return the one already made with the same key.
+
+        :return: str
+        """
+        answer_lost = await self.call()
+        if idempotency_key not in self.payments:
+            if amount < 0:
+                raise PaymentDeclined(f"Invalid amount {amount:.2f}.")
+            self.payments[idempotency_key] = [secrets.token_hex(8).upper(), amount]
+        if answer_lost:
+            raise GatewayError("The payment gateway timed out.")
+        return self.payments[idempotency_key][0]
+
+    async def void(self, idempotency_key: str) -> None:
+        """
+        Forget a payment, if it was made.
+
+        :return: None
+        """
+        answer_lost = await self.call()
+        self.payments.pop(idempotency_key, None)
+        if answer_lost:
+            raise GatewayError("The payment gateway timed out.")
+
+
+GATEWAYS = {"simulated": SimulatedGateway}
+
+
+def get_gateway() -> PaymentGateway:
+    """
+    Get the payment gateway configured, creating it on first use.
+
+    :return: PaymentGateway
+    """
+    if _gateway["instance"] is None:
+        if GATEWAY not in GATEWAYS:
+            raise GatewayError(f"Unknown payment gateway '{GATEWAY}'.")
+        _gateway["instance"] = GATEWAYS[GATEWAY]()
+    return _gateway["instance"]
+
+
+def idempotency_key(transaction_id: str) -> str:
+    """
+    Get the idempotency key of the gateway calls made for a transaction.
+
+    :param transaction_id: str
+    :return: str
+    """
+    return f"transaction-{transaction_id}"
+
+
+async def retry(operation, *args):
+    """
+    Call the gateway, retrying with an increasing delay when the call fails.
+
+    :param operation: The gateway method to call.
+    :param args: The arguments of the method.
+    :return: The result of the method.
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return await operation(*args)
+        except GatewayError:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            await asyncio.sleep(RETRY_DELAY * 2**attempt)
+
+
+async def authorize_all(payments: list, details: dict) -> list:
+    """
+    Authorize the payments of a checkout concurrently, all of them or none.
+
+    :param payments: The transaction id and amount of every payment.
+    :param details: The bank_name, payment_mode and card_type of the payments.
+    :return: The bank references of the payments.
+    :raises GatewayError: If a payment could not be made, in which case the
+        payments that were made are voided.
+    :raises PaymentDeclined: If a payment was refused, likewise.
+    """
+    gateway = get_gateway()
+    results = await asyncio.gather(
+        *(
+            retry(gateway.authorize, idempotency_key(transaction_id), amount, details)
+            for transaction_id, amount in payments
+        ),
+        return_exceptions=True,
+    )
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        await void_all([transaction_id for transaction_id, _ in payments])
+        raise errors[0]
+    return results
+
+
+async def void_all(transaction_ids: list) -> None:
+    """
+    Void the payments of transactions, whether they were authorized or not.
+
+    :param transaction_ids: list
+    :return: None
+    :raises GatewayError: If a payment could not be voided.
+    """
+    gateway = get_gateway()
+    results = await asyncio.gather(
+        *(
+            retry(gateway.void, idempotency_key(transaction_id))
+            for transaction_id in transaction_ids
+        ),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
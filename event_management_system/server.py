@@ -0,0 +1,429 @@
+"""
+HTTP server exposing the booking engine as a JSON API.
+
+Usage: python event_management_system/server.py [port]
+
+Endpoints:
+    GET  /categories                    List the event categories.
+    GET  /events?category=<name>        List the events of a category.
+    GET  /events/<event_code>           Get one event.
+    POST /sessions                      Log in with a username and password.
+    POST /bookings                      Book tickets into the cart.
+    GET  /cart                          List the items in the cart.
+    DELETE /cart/<ticket_id>            Remove an item from the cart.
+    POST /checkout                      Pay for the items in the cart.
+    GET  /metrics                       Get the metrics of the cart sweeper.
+
+The endpoints below /sessions expect the token returned by logging in, in
+an "Authorization: Bearer <token>" header.
+
+Requests are served concurrently on a single event loop. Every change to
+the data files goes through one writer task that applies the changes in
+the order they were queued, on a thread of its own, so writers never
+interleave and a write waiting for a file lock or a disk flush never holds
+up the event loop. Reads and password checks, which are slow on purpose,
+run in a thread pool, and hold the lock of the file they read so that they
+never see half of a change. Payments are authorized concurrently while
+other requests are served. The cart items left unpaid are expired by a sweep
+queued every sweeper.SWEEP_INTERVAL seconds.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+import asyncio
+import json
+import os
+import secrets
+import sys
+import catalogue
+import passwords
+import services
+import storage
+import sweeper
+
+HOST = os.environ.get("EMS_HOST", "127.0.0.1")
+PORT = int(os.environ.get("EMS_PORT", "8080"))
+MAX_BODY_SIZE = 1 << 20  # Largest request body accepted, in bytes
+WRITE_QUEUE_SIZE = 1000  # Changes waiting for the writer before requests wait
+
+
+class HttpError(Exception):
+    """Raised to answer a request with an error status."""
+
+    def __init__(self, status: HTTPStatus, message: str = None) -> None:
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+def as_dicts(filename: str, records: list) -> list:
+    """
+    Convert records into dictionaries keyed by the columns of their file.
+
+    :param filename: str
+    :param records: list
+    :return: list
+    """
+    header = storage.get_table(filename).header
+    return [dict(zip(header, record)) for record in records]
+
+
+def apply_writes(writes: list) -> list:
+    """
+    Apply queued changes in order, keeping the outcome of each one.
+
+    :param writes: The operation, arguments and future of every change.
+    :return: The error raised by every change, or None, and its result.
+    """
+    results = []
+    for operation, args, _ in writes:
+        try:
+            results.append((None, operation(*args)))
+        except Exception as error:  # Handed over to the waiting request
+            results.append((error, None))
+    return results
+
+
+def find_member(username: str) -> list:
+    """
+    Get the client record of a username.
+
+    :param username: str
+    :return: The client record, or None if there is no such member.
+    """
+    with storage.file_lock(services.CLIENT_FILE, exclusive=False):
+        record = storage.get_table(services.CLIENT_FILE).find(1, username)
+        return None if record is None else record.copy()
+
+
+class BookingServer:
+    """
+    State of the running server: the logged-in sessions and the write queue.
+    """
+
+    def __init__(self) -> None:
+        self.sessions = {}
+        self.write_queue = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer")
+        self.routes = {
+            ("GET", "categories"): self.list_categories,
+            ("GET", "events"): self.list_events,
+            ("POST", "sessions"): self.log_in,
+            ("POST", "bookings"): self.book_tickets,
+            ("GET", "cart"): self.get_cart,
+            ("DELETE", "cart"): self.remove_cart_item,
+            ("POST", "checkout"): self.checkout,
+            ("GET", "metrics"): self.get_metrics,
+        }
+
+    async def write(self, operation, *args):
+        """
+        Queue a change to the data files and wait for the writer to apply it.
+
+        :param operation: The function that makes the change.
+        :param args: The arguments of the function.
+        :return: The result of the function.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.write_queue.put((operation, args, future))
+        return await future
+
+    async def read(self, operation, *args):
+        """
+        Read the data files in the thread pool and wait for the result.
+
+        :param operation: The function that reads the files.
+        :param args: The arguments of the function.
+        :return: The result of the function.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, operation, *args)
+
+    async def run_writer(self) -> None:
+        """
+        Apply the queued changes one at a time, on the writer thread.
+
+        The changes queued while the writer was busy are handed over to its
+        thread together, so that a burst of changes does not wait for the
+        event loop between every two of them.
+
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            writes = [await self.write_queue.get()]
+            while not self.write_queue.empty():
+                writes.append(self.write_queue.get_nowait())
+            results = await loop.run_in_executor(self.writer, apply_writes, writes)
+            for (_, _, future), (error, result) in zip(writes, results):
+                if not future.cancelled():
+                    if error is None:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(error)
+                self.write_queue.task_done()
+
+    async def run_sweeper(self, interval: float) -> None:
+        """
+        Queue a sweep of the expired cart items at a regular interval.
+
+        :param interval: The number of seconds between two sweeps.
+        :return: None
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.write(sweeper.sweep)
+            except Exception as error:  # Tried again at the next sweep
+                print(f"Sweep failed: {type(error).__name__}: {error}")
+
+    def get_username(self, headers: dict) -> str:
+        """
+        Get the username of the session whose token is in the request headers.
+
+        :param headers: dict
+        :return: str
+        """
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or token not in self.sessions:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Log in through /sessions first.")
+        return self.sessions[token]
+
+    async def list_categories(self, path: list, query: dict, headers: dict, body):
+        """
+        List the event categories.
+
+        :return: list
+        """
+        records = await self.read(list, storage.iter_rows(services.CATEGORY_FILE))
+        return [
+            {"category_name": record[1], "total_events": record[2]}
+            for record in records
+        ]
+
+    async def list_events(self, path: list, query: dict, headers: dict, body):
+        """
+        List the events of a category, or get one event by its event code.
+
+        :return: list, or dict for a single event
+        """
+        fields = services.EVENT_FIELDS
+        if path:
+            try:
+                record = await self.read(services.find_event, path[0])
+            except services.ServiceError as error:
+                raise HttpError(HTTPStatus.NOT_FOUND, str(error)) from None
+            return dict(zip(["event_id", *fields], record))
+        if "category" not in query:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "The category is missing.")
+        entries = await self.read(catalogue.get_category_events, query["category"])
+        return [dict(zip(fields, entry.record)) for entry in entries]
+
+    async def log_in(self, path: list, query: dict, headers: dict, body):
+        """
+        Check the credentials of a customer and open a session.
+
+        :return: dict holding the token of the session
+        """
+        username = str(body.get("username", ""))
+        password = str(body.get("password", ""))
+        record = await self.read(find_member, username)
+        stored_password = record[2] if record is not None else ""
+        verified = await asyncio.get_running_loop().run_in_executor(
+            None, passwords.verify_password, password, stored_password
+        )
+        if record is None or not verified:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Incorrect credentials.")
+        token = secrets.token_urlsafe(32)
+        self.sessions[token] = username
+        return {"token": token}
+
+    async def book_tickets(self, path: list, query: dict, headers: dict, body):
+        """
+        Book tickets into the cart of the customer.
+
+        :return: list of the tickets booked
+        """
+        username = self.get_username(headers)
+        bookings = body.get("bookings")
+        if not isinstance(bookings, list) or not bookings:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "The bookings are missing.")
+        if not all(isinstance(booking, dict) for booking in bookings):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Each booking must be an object.")
+        tickets = await self.write(services.book_tickets, username, bookings)
+        return await self.read(as_dicts, services.TICKET_FILE, tickets)
+
+    async def get_cart(self, path: list, query: dict, headers: dict, body):
+        """
+        List the items in the cart of the customer.
+
+        :return: list
+        """
+        cart_items = await self.read(services.get_cart, self.get_username(headers))
+        return await self.read(as_dicts, services.CART_FILE, cart_items)
+
+    async def remove_cart_item(self, path: list, query: dict, headers: dict, body):
+        """
+        Remove an item from the cart of the customer and release its seats.
+
+        :return: dict of the cart item removed
+        """
+        username = self.get_username(headers)
+        if not path:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "The ticket id is missing.")
+        cart_items = await self.write(services.remove_cart_items, username, path[:1])
+        return (await self.read(as_dicts, services.CART_FILE, cart_items))[0]
+
+    async def checkout(self, path: list, query: dict, headers: dict, body):
+        """
+        Pay for the items in the cart of the customer, or for those of the
+        events listed in "event_codes".
+
+        :return: dict of the transactions recorded and the tickets paid for
+        """
+        username = self.get_username(headers)
+        event_codes = body.get("event_codes")
+        if event_codes is not None and not isinstance(event_codes, list):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "The event codes must be a list.")
+        transactions, tickets = await services.checkout_async(
+            username,
+            str(body.get("bank_name", "")),
+            str(body.get("payment_mode", "")),
+            str(body.get("card_type", "")),
+            None if event_codes is None else [str(code) for code in event_codes],
+            write=self.write,
+        )
+        return {
+            "transactions": await self.read(
+                as_dicts, services.TRANSACTION_FILE, transactions
+            ),
+            "tickets": await self.read(as_dicts, services.TICKET_FILE, tickets),
+        }
+
+    async def get_metrics(self, path: list, query: dict, headers: dict, body):
+        """
+        Get the metrics of the cart sweeper.
+
+        :return: dict
+        """
+        return sweeper.metrics
+
+    async def dispatch(self, method: str, target: str, headers: dict, body: bytes):
+        """
+        Route a request to its endpoint.
+
+        :param method: str
+        :param target: The path and query of the request.
+        :param headers: The request headers, with lowercase names.
+        :param body: bytes
+        :return: The value to send back as JSON.
+        """
+        url = urlsplit(target)
+        path = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        handler = self.routes.get((method, path[0] if path else ""))
+        if handler is None:
+            raise HttpError(HTTPStatus.NOT_FOUND)
+        if body:
+            try:
+                body = json.loads(body)
+            except ValueError:
+                raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid JSON.") from None
+        if not isinstance(body, dict):
+            body = {}
+        try:
+            return await handler(path[1:], query, headers, body)
+        except services.ServiceError as error:
+            raise HttpError(HTTPStatus.BAD_REQUEST, str(error)) from None
+
+    async def handle_connection(self, reader, writer) -> None:
+        """
+        Serve the requests of one connection until the client closes it.
+
+        :return: None
+        """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, target, version = (request_line.split(" ") + ["", ""])[:3]
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+
+                keep_alive = (
+                    headers.get("connection", "").lower() != "close"
+                    and version == "HTTP/1.1"
+                )
+                try:
+                    length = int(headers.get("content-length", "0"))
+                    if not 0 <= length <= MAX_BODY_SIZE:
+                        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+                    body = await reader.readexactly(length)
+                    status, result = HTTPStatus.OK, await self.dispatch(
+                        method, target, headers, body
+                    )
+                except HttpError as error:
+                    status, result = error.status, {"error": str(error)}
+                    keep_alive = keep_alive and length <= MAX_BODY_SIZE
+                except ValueError:
+                    status, result = HTTPStatus.BAD_REQUEST, {"error": "Bad request."}
+                    keep_alive = False
+                except Exception as error:  # Answer instead of dropping the client
+                    status = HTTPStatus.INTERNAL_SERVER_ERROR
+                    result = {"error": f"{type(error).__name__}: {error}"}
+                    keep_alive = False
+
+                payload = json.dumps(result).encode("utf-8")
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(payload)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                        "\r\n"
+                    ).encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = HOST, port: int = PORT) -> None:
+        """
+        Accept connections until the server is stopped.
+
+        :param host: str
+        :param port: int
+        :return: None
+        """
+        tasks = [
+            asyncio.create_task(self.run_writer()),
+            asyncio.create_task(self.run_sweeper(sweeper.SWEEP_INTERVAL)),
+        ]
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving on http://{host}:{port}/")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.writer.shutdown()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(
+            BookingServer().serve(port=int(sys.argv[1]) if len(sys.argv) > 1 else PORT)
+        )
+    except KeyboardInterrupt:
+        pass
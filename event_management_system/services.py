@@ -0,0 +1,795 @@
+"""
+Operations of the system that take plain values and return records.
+
+Nothing here prompts for input or prints, so the same operations can be
+driven by the menus, by the importer or by a program. Invalid input is
+reported by raising ServiceError with a message fit to show to the user.
+"""
+
+from datetime import datetime
+import asyncio
+import os
+import time
+import ems
+import ids
+import inventory
+import passwords
+import payments
+import storage
+
+CLIENT_FILE = "event_management_system/data/client.txt"
+CATEGORY_FILE = "event_management_system/data/category.txt"
+EVENT_FILE = "event_management_system/data/events.txt"
+TICKET_FILE = "event_management_system/data/tickets.txt"
+CART_FILE = "event_management_system/data/cart.txt"
+TRANSACTION_FILE = "event_management_system/data/transactions.txt"
+
+# Fields of an event in the order they are stored, after the event id
+EVENT_FIELDS = [
+    "event_name",
+    "event_category",
+    "event_code",
+    "event_price",
+    "organizer",
+    "start_date",
+    "start_time",
+    "end_date",
+    "end_time",
+    "venue",
+    "total_seats_available",
+    "event_status",
+]
+EVENT_STATUSES = ["Active", "Completed", "Cancelled"]
+DEFAULT_EVENT_STATUS = "Active"
+MINIMUM_MEMBER_AGE = 16
+GENDERS = ["male", "female", "m", "f"]
+PAYMENT_MODES = ["Credit Card", "Debit Card", "eWallet"]
+TRANSACTION_STATUS = "SUCCESSFUL"
+CART_TTL = int(os.environ.get("EMS_CART_TTL", "900"))  # Seconds seats are held
+NOT_RESERVED = ""  # reserved_at of the cart items booked before seats were held
+
+
+class ServiceError(ValueError):
+    """Raised when an operation is given invalid input."""
+
+
+def get_field(details: dict, field: str) -> str:
+    """
+    Get a required field, stripped of surrounding whitespace.
+
+    :param details: dict
+    :param field: str
+    :return: str
+    """
+    value = str(details.get(field) or "").strip()
+    if not value:
+        raise ServiceError(f"'{field}' must not be blank.")
+    if ";" in value or "\n" in value:
+        raise ServiceError(f"'{field}' must not contain ';' or line breaks.")
+    return value
+
+
+def add_event_headers() -> None:
+    """
+    Create a header for the event file.
+
+    :return: None
+    """
+    event_headers = [
+        "event_id",
+        "event_name",
+        "event_category",
+        "event_code",
+        "event_price",
+        "organizer",
+        "start_date",
+        "start_time",
+        "end_date",
+        "end_time",
+        "venue",
+        "total_seats_available",
+        "event_status",
+    ]
+    ems.add_file_headers(EVENT_FILE, event_headers)
+
+
+def update_category_total_events(category_counts: dict) -> None:
+    """
+    Add to the total number of events of each category in a single write.
+
+    :param category_counts: Mapping of category names to the number of events
+        added to them, negative for events moved out of them.
+    :return: None
+    """
+    record_difference = []
+
+    with storage.file_lock(CATEGORY_FILE):
+        table = storage.get_table(CATEGORY_FILE)
+        for category, count in category_counts.items():
+            old_record = table.find(1, category)
+            if old_record is not None and count:
+                new_record = old_record.copy()
+                new_record[2] = str(int(new_record[2]) + count)  # total_events
+                record_difference.append([old_record, new_record])
+        if record_difference:
+            ems.update_record(CATEGORY_FILE, record_difference)
+
+
+def create_event_tickets_file_headers() -> None:
+    """
+    Create the headers for the orders file.
+
+    :return: None
+    """
+    ticket_headers = [
+        "ticket_id",
+        "event_name",
+        "event_code",
+        "username",
+        "customer_name",
+        "email_address",
+        "contact_number",
+        "event_venue",
+        "event_date",
+        "event_time",
+        "event_price",
+        "quantity",
+    ]
+    ems.add_file_headers(TICKET_FILE, ticket_headers)
+
+
+def create_cart_file_headers() -> None:
+    """
+    Create headers for the cart file.
+
+    :return: None
+    """
+    cart_headers = [
+        "ticket_id",
+        "event_name",
+        "event_code",
+        "username",
+        "attendee_name",
+        "price",
+        "quantity",
+        "total_price",
+        "reserved_at",
+    ]
+    # Items booked before seats were reserved hold none, so they never expire
+    ems.add_file_headers(CART_FILE, cart_headers, {"reserved_at": NOT_RESERVED})
+
+
+def create_transaction_file_headers() -> None:
+    """
+    Create headers for the transaction file.
+
+    :return: None
+    """
+    transaction_headers = [
+        "transaction_id",
+        "username",
+        "bank_name",
+        "bank_reference_number",
+        "transaction_entry_date",
+        "transaction_entry_time",
+        "payment_mode",
+        "card_type",
+        "transaction_amount",
+        "transaction_status",
+    ]
+    ems.add_file_headers(TRANSACTION_FILE, transaction_headers)
+
+
+def check_member(details: dict) -> list:
+    """
+    Check the details of a new member and convert them into a client record.
+
+    The fields follow the same rules as the member registration prompts. The
+    age is worked out from the year of the birthdate unless it is given. The
+    password is left in plain text, or as given if it is a well-formed hash.
+
+    :param details: Mapping of the client columns to their values.
+    :return: The client record, without its customer id.
+    """
+    username = get_field(details, "username")
+    password = str(details.get("password") or "")
+    if passwords.is_hashed(password):
+        if not passwords.is_valid_hash(password):
+            raise ServiceError("'password' is not a valid password hash.")
+    else:
+        try:
+            ems.check_password(password)
+        except ValueError as error:
+            raise ServiceError(str(error)) from None
+    name = get_field(details, "name")
+    gender = get_field(details, "gender").lower()
+    if gender not in GENDERS:
+        raise ServiceError("'gender' must be Male or Female.")
+    birthdate = get_field(details, "birthdate")
+    try:
+        ems.check_date_format(birthdate, 10, "%Y-%m-%d")
+    except ValueError as error:
+        raise ServiceError(f"'birthdate': {error}") from None
+    try:
+        age = int(details.get("age") or datetime.now().year - int(birthdate[:4]))
+    except ValueError:
+        raise ServiceError("'age' must be an integer.") from None
+    if age < MINIMUM_MEMBER_AGE:
+        raise ServiceError(f"Age must be {MINIMUM_MEMBER_AGE} or older to register.")
+    nationality = get_field(details, "nationality")
+    contact_number = get_field(details, "contact_number")
+    try:
+        email_address = ems.check_email(get_field(details, "email_address"))
+    except ValueError as error:
+        raise ServiceError(str(error)) from None
+    return [
+        username,
+        password,
+        name,
+        str(age),
+        gender,
+        birthdate,
+        nationality,
+        contact_number,
+        email_address,
+    ]
+
+
+def register_member(details: dict) -> list:
+    """
+    Register a new member.
+
+    :param details: Mapping of the client columns to their values.
+    :return: The client record as saved, with a hashed password.
+    """
+    record = check_member(details)
+    if not passwords.is_hashed(record[1]):
+        record[1] = passwords.hash_password(record[1])
+    ems.create_customer_file_headers()
+    with storage.file_lock(CLIENT_FILE):
+        check_username(record[0])
+        (record,) = storage.append_numbered_rows(CLIENT_FILE, [record])
+    return record
+
+
+def check_username(username: str, customer_id: str = None) -> str:
+    """
+    Check that a username is valid and not taken by another member.
+
+    :param username: str
+    :param customer_id: The id of the member taking the username, if any.
+    :return: The username, stripped of surrounding whitespace.
+    """
+    username = get_field({"username": username}, "username")
+    record = storage.get_table(CLIENT_FILE).find(1, username)
+    if record is not None and record[0] != customer_id:
+        raise ServiceError(f"Username '{username}' already exists.")
+    return username
+
+
+def update_member(old_record: list, new_record: list) -> list:
+    """
+    Save the changes made by a member to their profile.
+
+    When the username changes, the cart, tickets and transactions of the
+    member are moved to the new username together with the profile, in one
+    batch, so that the member keeps them and nobody else can see them.
+
+    :param old_record: The client record the changes were made from.
+    :param new_record: The client record with the changes made.
+    :return: The client record as saved.
+    """
+    customer_id, old_username = old_record[0], old_record[1]
+    if new_record[1] == old_username:
+        storage.update_rows(CLIENT_FILE, [[old_record, new_record]])
+        return storage.get_table(CLIENT_FILE).find(0, customer_id).copy()
+
+    create_event_tickets_file_headers()
+    create_cart_file_headers()
+    create_transaction_file_headers()
+    owned_columns = {CART_FILE: 3, TICKET_FILE: 3, TRANSACTION_FILE: 1}
+    with storage.batch([CLIENT_FILE, *owned_columns]) as changes:
+        new_username = check_username(new_record[1], customer_id)
+        current_record = storage.get_table(CLIENT_FILE).find(0, customer_id)
+        if current_record is None:
+            raise ServiceError(f"No member with the id '{customer_id}'.")
+        record = storage.merge_record(current_record, old_record, new_record)
+        record[1] = new_username
+        changes.update(CLIENT_FILE, {customer_id: record})
+        for filename, column in owned_columns.items():
+            moved_records = {}
+            for owned_record in storage.get_table(filename).find_all(
+                column, old_username
+            ):
+                moved_records[owned_record[0]] = owned_record.copy()
+                moved_records[owned_record[0]][column] = new_username
+            changes.update(filename, moved_records)
+    return record
+
+
+def check_event(
+    details: dict, new_event_codes: set = frozenset(), tables: tuple = None
+) -> list:
+    """
+    Check the details of a new event and convert them into an event record.
+
+    Dates and the number of seats follow the same rules as the admin
+    prompts, and a missing status is taken as Active.
+
+    :param details: Mapping of the event columns to their values.
+    :param new_event_codes: The codes of other events about to be created.
+    :param tables: The category and event tables, when checking many events.
+    :return: The event record, without its event id.
+    """
+    categories, events = tables or (
+        storage.get_table(CATEGORY_FILE),
+        storage.get_table(EVENT_FILE),
+    )
+    record = []
+    for field in EVENT_FIELDS:
+        if field == "event_status" and not str(details.get(field) or "").strip():
+            record.append(DEFAULT_EVENT_STATUS)
+        else:
+            record.append(get_field(details, field))
+    event = dict(zip(EVENT_FIELDS, record))
+
+    if categories.find(1, event["event_category"]) is None:
+        raise ServiceError(f"Unknown category '{event['event_category']}'.")
+    if (
+        event["event_code"] in new_event_codes
+        or events.find(3, event["event_code"]) is not None
+    ):
+        raise ServiceError(f"Event code '{event['event_code']}' is already taken.")
+    try:
+        float(event["event_price"])
+    except ValueError:
+        raise ServiceError("'event_price' must be a number.") from None
+    for field in ["start_date", "end_date"]:
+        try:
+            ems.check_date_format(event[field], 10, "%Y-%m-%d")
+        except ValueError as error:
+            raise ServiceError(f"'{field}': {error}") from None
+    for field in ["start_time", "end_time"]:
+        try:
+            ems.check_date_format(event[field], 5, "%H:%M")
+        except ValueError:
+            raise ServiceError(f"'{field}' must be in the format HH:MM.") from None
+    try:
+        int(event["total_seats_available"])
+    except ValueError:
+        raise ServiceError("'total_seats_available' must be an integer.") from None
+    if event["event_status"] not in EVENT_STATUSES:
+        raise ServiceError(
+            f"'event_status' must be one of {', '.join(EVENT_STATUSES)}."
+        )
+    return record
+
+
+def save_events(records: list) -> list:
+    """
+    Save checked event records and add them to the totals of their categories.
+
+    :param records: Event records returned by check_event.
+    :return: The event records as saved, with their ids.
+    """
+    records = storage.append_numbered_rows(EVENT_FILE, records)
+    category_counts = {}
+    for record in records:
+        category_counts[record[2]] = category_counts.get(record[2], 0) + 1
+    update_category_total_events(category_counts)
+    return records
+
+
+def create_events(events: list) -> list:
+    """
+    Create events, or none of them if any is invalid.
+
+    :param events: Mappings of the event columns to their values.
+    :return: The event records as saved, with their ids.
+    """
+    add_event_headers()
+    records = []
+    new_event_codes = set()
+    with storage.file_lock(EVENT_FILE):
+        tables = storage.get_table(CATEGORY_FILE), storage.get_table(EVENT_FILE)
+        for position, details in enumerate(events, start=1):
+            try:
+                record = check_event(details, new_event_codes, tables)
+            except ServiceError as error:
+                raise ServiceError(f"Event {position}: {error}") from None
+            new_event_codes.add(record[2])
+            records.append(record)
+        return save_events(records)
+
+
+def find_event(event_code: str) -> list:
+    """
+    Get the event with the given event code.
+
+    :param event_code: str
+    :return: The event record.
+    """
+    with storage.file_lock(EVENT_FILE, exclusive=False):
+        record = storage.get_table(EVENT_FILE).find(3, event_code)
+        if record is None:
+            raise ServiceError(f"Invalid event code '{event_code}'.")
+        return record.copy()
+
+
+def book_tickets(username: str, bookings: list) -> list:
+    """
+    Book tickets for events and add them to the cart of a customer.
+
+    The seats of every booking are reserved in the same batch that adds the
+    tickets and the cart items, so either all of the tickets are booked with
+    their seats or none of them is, even if the session crashes. The seats
+    are held for CART_TTL seconds, after which unpaid items are removed by
+    the sweeper.
+
+    :param username: str
+    :param bookings: Mappings with the event_code, attendee_name, email_address,
+        contact_number and quantity of each booking.
+    :return: The ticket records as saved.
+    """
+    tickets = []
+    cart_items = []
+    reserved_at = str(int(time.time()))
+    for details in bookings:
+        event = find_event(get_field(details, "event_code"))
+        attendee_name = get_field(details, "attendee_name")
+        try:
+            email_address = ems.check_email(get_field(details, "email_address"))
+        except ValueError as error:
+            raise ServiceError(str(error)) from None
+        contact_number = get_field(details, "contact_number")
+        try:
+            quantity = int(details.get("quantity"))
+        except (TypeError, ValueError):
+            raise ServiceError("'quantity' must be an integer.") from None
+        if quantity < 1:
+            raise ServiceError("'quantity' must be at least 1.")
+
+        ticket_id = ids.generate_data_id()
+        tickets.append(
+            [
+                ticket_id,
+                event[1],
+                event[3],
+                username,
+                attendee_name,
+                email_address,
+                contact_number,
+                event[10],
+                event[6],
+                event[7],
+                event[4],
+                str(quantity),
+            ]
+        )
+        cart_items.append(
+            [
+                ticket_id,
+                event[1],
+                event[3],
+                username,
+                attendee_name,
+                event[4],
+                str(quantity),
+                f"{float(event[4]) * quantity:.2f}",
+                reserved_at,
+            ]
+        )
+
+    seat_counts = {}
+    for ticket in tickets:
+        seat_counts[ticket[2]] = seat_counts.get(ticket[2], 0) + int(ticket[-1])
+    create_event_tickets_file_headers()
+    create_cart_file_headers()
+    with storage.batch([TICKET_FILE, CART_FILE, EVENT_FILE]) as changes:
+        try:
+            inventory.reserve_seats(seat_counts, changes)
+        except inventory.InventoryError as error:
+            raise ServiceError(str(error)) from None
+        changes.append(TICKET_FILE, tickets)
+        changes.append(CART_FILE, cart_items)
+    return tickets
+
+
+def get_cart(username: str) -> list:
+    """
+    Get the items in the cart of a customer.
+
+    :param username: str
+    :return: The cart records.
+    """
+    with storage.file_lock(CART_FILE, exclusive=False):
+        return [
+            record.copy()
+            for record in storage.get_table(CART_FILE).find_all(3, username)
+        ]
+
+
+def remove_cart_items(username: str, ticket_ids: list) -> list:
+    """
+    Remove unpaid items from the cart of a customer and release their seats.
+
+    Each item is looked up by its ticket id, so removing items costs as much
+    as the items removed however large the cart file is. The items and their
+    tickets are only marked as deleted in the logs of their files, which are
+    folded into the files once enough deletions have piled up.
+
+    :param username: str
+    :param ticket_ids: list
+    :return: The cart records removed.
+    """
+    with storage.batch([CART_FILE, TICKET_FILE, EVENT_FILE]) as changes:
+        table = storage.get_table(CART_FILE)
+        cart_items = []
+        for ticket_id in dict.fromkeys(ticket_ids):
+            record = table.find(0, ticket_id)
+            if record is None or record[3] != username:
+                raise ServiceError(f"No item '{ticket_id}' in the cart.")
+            cart_items.append(record.copy())
+        cancel_cart_items(cart_items, changes)
+    return cart_items
+
+
+def expire_cart_items(now: float = None) -> list:
+    """
+    Remove the items of every cart that have been left unpaid for longer than
+    CART_TTL seconds, and release their seats.
+
+    The items are found through the sorted index of their reservation time,
+    so a sweep costs as much as the items that have expired. Items booked
+    before seats were reserved have no reservation time and never expire.
+
+    :param now: The current time in seconds since the epoch.
+    :return: The cart records removed.
+    """
+    now = time.time() if now is None else now
+    with storage.batch([CART_FILE, TICKET_FILE, EVENT_FILE]) as changes:
+        cart_items = [
+            record.copy()
+            for record in storage.get_table(CART_FILE).find_at_most(8, now - CART_TTL)
+        ]
+        cancel_cart_items(cart_items, changes)
+    return cart_items
+
+
+def cancel_cart_items(cart_items: list, changes) -> None:
+    """
+    Delete cart items along with their unpaid tickets and release their seats.
+
+    The items, their tickets and their seats are all changed in the same
+    batch, so that a crash never leaves a ticket out of the cart, which
+    would count as paid for, or seats that are never given back. Items
+    booked before seats were reserved never took any, so nothing is
+    released for them.
+
+    :param cart_items: list
+    :param changes: The storage.Batch holding the cart, ticket and event files.
+    :return: None
+    """
+    if not cart_items:
+        return
+    seat_counts = {}
+    for item in cart_items:
+        # Carts saved before reserved_at was added have no such column
+        if len(item) > 8 and item[8] != NOT_RESERVED:
+            seat_counts[item[2]] = seat_counts.get(item[2], 0) + int(item[6])
+    changes.delete(CART_FILE, [item[0] for item in cart_items])
+    changes.delete(TICKET_FILE, [item[0] for item in cart_items])
+    if seat_counts:
+        inventory.release_seats(seat_counts, changes)
+
+
+def get_tickets(username: str, event_code: str = None) -> list:
+    """
+    Get the tickets of a customer, optionally for one event only.
+
+    :param username: str
+    :param event_code: str
+    :return: The ticket records.
+    """
+    with storage.file_lock(TICKET_FILE, exclusive=False):
+        return [
+            record.copy()
+            for record in storage.get_table(TICKET_FILE).find_all(3, username)
+            if event_code is None or record[2] == event_code
+        ]
+
+
+async def checkout_async(
+    username: str,
+    bank_name: str,
+    payment_mode: str,
+    card_type: str,
+    event_codes: list = None,
+    write=None,
+) -> tuple:
+    """
+    Pay for the items in the cart of a customer, or for those of some events.
+
+    Every item is paid for by a transaction of its own. The transactions are
+    authorized by the payment gateway concurrently, and only once all of
+    them have gone through are they recorded and the items removed from the
+    cart, in one batch. If the cart changed in the meantime, the payments
+    are voided, and the error raised is noted with the payments that could
+    not be. The seats reserved when the tickets were booked stay taken.
+
+    :param username: str
+    :param bank_name: str
+    :param payment_mode: One of PAYMENT_MODES.
+    :param card_type: str
+    :param event_codes: The events to pay for, or None for the whole cart.
+    :param write: Coroutine function through which save_checkout is called,
+        or None to call it directly.
+    :return: The transaction records as saved and the tickets paid for.
+    """
+    bank_name = get_field({"bank_name": bank_name}, "bank_name")
+    card_type = get_field({"card_type": card_type}, "card_type").upper()
+    if payment_mode not in PAYMENT_MODES:
+        raise ServiceError(f"Invalid payment mode '{payment_mode}'.")
+    cart = await asyncio.get_running_loop().run_in_executor(None, get_cart, username)
+    cart_items = [
+        item for item in cart if event_codes is None or item[2] in event_codes
+    ]
+    if not cart_items:
+        raise ServiceError("No items to pay for in the cart.")
+
+    transaction_ids = ids.generate_data_ids(len(cart_items))
+    try:
+        bank_references = await payments.authorize_all(
+            [(tid, float(item[7])) for tid, item in zip(transaction_ids, cart_items)],
+            {
+                "bank_name": bank_name,
+                "payment_mode": payment_mode,
+                "card_type": card_type,
+            },
+        )
+    except payments.PaymentDeclined as error:
+        raise ServiceError(f"The payment was declined. {error}") from None
+    except payments.GatewayError as error:
+        raise ServiceError(f"The payment could not be made. {error}") from None
+
+    now = datetime.now()
+    transactions = [
+        [
+            transaction_id,
+            username,
+            bank_name,
+            bank_reference_number,
+            now.strftime("%Y-%m-%d"),
+            now.strftime("%H:%M"),
+            payment_mode,
+            card_type,
+            item[7],
+            TRANSACTION_STATUS,
+        ]
+        for transaction_id, bank_reference_number, item in zip(
+            transaction_ids, bank_references, cart_items
+        )
+    ]
+    try:
+        if write is None:
+            tickets = save_checkout(cart_items, transactions)
+        else:
+            tickets = await write(save_checkout, cart_items, transactions)
+    except BaseException as error:
+        try:
+            await payments.void_all(transaction_ids)
+        except payments.GatewayError as void_error:
+            error.add_note(
+                f"The payments of transactions {', '.join(transaction_ids)} "
+                f"could not be voided. {void_error}"
+            )
+        raise
+    return transactions, tickets
+
+
+def save_checkout(cart_items: list, transactions: list) -> list:
+    """
+    Record the transactions paid for cart items and remove the items from
+    the cart, all together or not at all.
+
+    :param cart_items: list
+    :param transactions: The transaction of each cart item.
+    :return: The tickets paid for.
+    :raises ServiceError: If an item has left the cart since it was paid for.
+    """
+    create_transaction_file_headers()
+    with storage.batch([CART_FILE, TRANSACTION_FILE]) as changes:
+        cart_table = storage.get_table(CART_FILE)
+        if any(cart_table.find(0, item[0]) is None for item in cart_items):
+            raise ServiceError("The cart changed during the payment. Nothing was paid.")
+        ticket_table = storage.get_table(TICKET_FILE)
+        tickets = [ticket_table.find(0, item[0]).copy() for item in cart_items]
+        # Out of the cart first, so that a batch cut short never leaves an
+        # item both paid for and still in the cart
+        changes.delete(CART_FILE, [item[0] for item in cart_items])
+        changes.append(TRANSACTION_FILE, transactions)
+    return tickets
+
+
+def checkout(
+    username: str,
+    bank_name: str,
+    payment_mode: str,
+    card_type: str,
+    event_codes: list = None,
+) -> tuple:
+    """
+    Pay for the items in the cart of a customer, waiting for the payments.
+
+    See checkout_async for the parameters.
+
+    :return: The transaction records as saved and the tickets paid for.
+    """
+    return asyncio.run(
+        checkout_async(username, bank_name, payment_mode, card_type, event_codes)
+    )
+
+
+def search_members(
+    username: str = None, nationality: str = None, birth_year: str = None
+) -> list:
+    """
+    Get the members matching every criterion given.
+
+    :param username: str
+    :param nationality: str
+    :param birth_year: The year of birth, as YYYY.
+    :return: The client records in file order.
+    """
+    table = storage.get_table(CLIENT_FILE)
+    matches = []
+    if username is not None:
+        matches.append(table.find_all(1, username))
+    if nationality is not None:
+        matches.append(table.find_all(7, nationality))
+    if birth_year is not None:
+        # Birthdates are stored as YYYY-MM-DD, so a year is a prefix
+        matches.append(table.find_prefix(6, birth_year))
+    return intersect(matches, table)
+
+
+def search_payments(
+    username: str = None, min_amount: float = None, month: str = None
+) -> list:
+    """
+    Get the payments matching every criterion given.
+
+    :param username: str
+    :param min_amount: The lowest transaction amount to include.
+    :param month: The month of the transaction, as YYYY-MM.
+    :return: The transaction records in file order.
+    """
+    table = storage.get_table(TRANSACTION_FILE)
+    matches = []
+    if username is not None:
+        matches.append(table.find_all(1, username))
+    if min_amount is not None:
+        if min_amount < 0:
+            raise ServiceError("The amount must not be negative.")
+        matches.append(table.find_at_least(-2, min_amount))
+    if month is not None:
+        matches.append(table.find_prefix(4, month))
+    return intersect(matches, table)
+
+
+def intersect(matches: list, table) -> list:
+    """
+    Keep the records found by every lookup, in file order.
+
+    :param matches: The records found by each lookup.
+    :param table: The table searched, whose records are all kept without lookups.
+    :return: Copies of the records.
+    """
+    if not matches:
+        return [record.copy() for record in table.records()]
+    matches.sort(key=len)
+    records = matches[0]
+    for other in matches[1:]:
+        record_ids = {record[0] for record in other}
+        records = [record for record in records if record[0] in record_ids]
+    return [record.copy() for record in records]
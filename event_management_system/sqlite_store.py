@@ -0,0 +1,509 @@
+"""SQLite backend for the record store, used in place of the data files."""
+
+from contextlib import contextmanager
+import os
+import sqlite3
+import sys
+import threading
+import storage
+
+DEFAULT_DATABASE = "event_management_system/data/ems.db"
+
+# Columns that are looked up often enough to be worth an index
+INDEXED_COLUMNS = {
+    "admin": ["username"],
+    "client": ["username", "nationality", "birthdate"],
+    "category": ["category_name"],
+    "events": ["event_code", "event_category"],
+    "tickets": ["ticket_id", "event_code", "username"],
+    "cart": ["ticket_id", "username"],
+    "transactions": ["username", "transaction_entry_date"],
+}
+# Columns holding amounts, indexed by their numeric value for range queries
+NUMERIC_COLUMNS = {
+    "transactions": ["transaction_amount"],
+    "cart": ["reserved_at"],
+}
+
+SEQUENCE_TABLE = "id_sequences"  # Highest id ever given in each table
+FETCH_SIZE = 1000  # Records fetched at a time when iterating over a table
+
+_connections = {}
+_connections_guard = threading.Lock()
+_batches = set()  # Connections whose changes are held until a batch ends
+
+
+def get_connection(database: str = None) -> tuple:
+    """
+    Get the connection to the database, opening it on first use.
+
+    :param database: The path of the database, taken from EMS_DATABASE by default.
+    :return: The connection and the lock that serialises its use across threads.
+    """
+    database = database or os.environ.get("EMS_DATABASE", DEFAULT_DATABASE)
+    with _connections_guard:
+        if database not in _connections:
+            connection = sqlite3.connect(database, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote(SEQUENCE_TABLE)} "
+                    "(name TEXT PRIMARY KEY, last_id INTEGER)"
+                )
+            _connections[database] = (connection, threading.RLock())
+        return _connections[database]
+
+
+@contextmanager
+def transaction(connection, lock):
+    """
+    Run statements in a transaction of their own, or in the enclosing batch.
+
+    :param connection: sqlite3.Connection
+    :param lock: The lock of the connection.
+    :return: None
+    """
+    with lock:
+        if connection in _batches:
+            yield
+        else:
+            with connection:
+                yield
+
+
+@contextmanager
+def batch():
+    """
+    Commit every change made within a with block in one transaction.
+
+    :return: None
+    """
+    connection, lock = get_connection()
+    with lock:
+        if connection in _batches:
+            yield
+            return
+        _batches.add(connection)
+        try:
+            with connection:
+                yield
+        finally:
+            _batches.discard(connection)
+
+
+def save_sequence(connection, name: str, last_id_query: str, *parameters) -> None:
+    """
+    Raise the highest id kept for a table, never lowering it.
+
+    :param connection: sqlite3.Connection
+    :param name: The name of the table.
+    :param last_id_query: Query selecting the highest id to keep.
+    :param parameters: The parameters of the query.
+    :return: None
+    """
+    connection.execute(
+        f"INSERT INTO {quote(SEQUENCE_TABLE)} (name, last_id) "
+        f"SELECT ?, IFNULL(({last_id_query}), 0) WHERE true "
+        "ON CONFLICT (name) DO UPDATE "
+        "SET last_id = MAX(last_id, excluded.last_id)",
+        (name, *parameters),
+    )
+
+
+def table_name(filename: str) -> str:
+    """
+    Get the name of the database table that replaces a data file.
+
+    :param filename: str
+    :return: str
+    """
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def quote(name: str) -> str:
+    """
+    Quote a table or column name for use in a query.
+
+    :param name: str
+    :return: str
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def create_table(filename: str, column_name: list, database: str = None) -> None:
+    """
+    Create the table of a data file along with the indexes of its columns.
+
+    :param filename: str
+    :param column_name: list
+    :param database: str
+    :return: None
+    """
+    connection, lock = get_connection(database)
+    name = table_name(filename)
+    columns = ", ".join(f"{quote(column)} TEXT" for column in column_name)
+    with lock:
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {quote(name)} ({columns})")
+        for column in INDEXED_COLUMNS.get(name, []):
+            if column in column_name:
+                connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {quote(f'{name}_{column}')} "
+                    f"ON {quote(name)} ({quote(column)})"
+                )
+        for column in NUMERIC_COLUMNS.get(name, []):
+            if column in column_name:
+                connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {quote(f'{name}_{column}_value')} "
+                    f"ON {quote(name)} (CAST({quote(column)} AS REAL))"
+                )
+
+
+def add_columns(filename: str, values: dict) -> None:
+    """
+    Add columns to the table of a data file, filled with the same value in
+    every row, along with their indexes.
+
+    :param filename: str
+    :param values: Mapping of the new column names to their values.
+    :return: None
+    """
+    connection, lock = get_connection()
+    name = table_name(filename)
+    with lock, connection:
+        for column, value in values.items():
+            connection.execute(
+                f"ALTER TABLE {quote(name)} ADD COLUMN {quote(column)} TEXT"
+            )
+            connection.execute(
+                f"UPDATE {quote(name)} SET {quote(column)} = ?", (value,)
+            )
+    create_table(filename, SqliteTable(filename).header)
+
+
+def ensure_header(
+    filename: str, column_name: list, default_values: dict = None
+) -> None:
+    """
+    Create the table of a data file, or check the columns of an existing one.
+
+    Columns missing at the end are added if they all have a default value.
+
+    :param filename: str
+    :param column_name: list
+    :param default_values: Mapping of column names to the value they are given
+        in the rows of an older table.
+    :return: None
+    """
+    try:
+        header = SqliteTable(filename).header
+    except FileNotFoundError:
+        create_table(filename, column_name)
+    else:
+        new_columns = column_name[len(header) :]
+        if header != column_name:
+            if column_name[: len(header)] != header or not all(
+                column in (default_values or {}) for column in new_columns
+            ):
+                raise AssertionError("Incorrect file headers detected.")
+            add_columns(
+                filename, {column: default_values[column] for column in new_columns}
+            )
+
+
+class SqliteTable:
+    """
+    Database table offering the same lookups and writes as storage.Table.
+
+    Records are returned as lists of strings in insertion order, just like
+    the rows of a data file.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.name = table_name(filename)
+        self.connection, self.lock = get_connection()
+        with self.lock:
+            columns = self.connection.execute(
+                f"PRAGMA table_info({quote(self.name)})"
+            ).fetchall()
+        if not columns:
+            raise FileNotFoundError(f"No table for '{filename}' in the database.")
+        self.header = [column[1] for column in columns]
+        self.changes = 0
+
+    def query(self, condition: str = "", parameters: tuple = ()) -> list:
+        """
+        Select the records matching a condition in insertion order.
+
+        :param condition: str
+        :param parameters: tuple
+        :return: list
+        """
+        where = f"WHERE {condition}" if condition else ""
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT * FROM {quote(self.name)} {where} ORDER BY rowid",
+                parameters,
+            ).fetchall()
+        return [list(row) for row in rows]
+
+    def column(self, column: int) -> str:
+        """
+        Get the quoted name of a column from its index.
+
+        :param column: int
+        :return: str
+        """
+        return quote(self.header[column])
+
+    def highest_id_query(self) -> str:
+        """
+        Get the query selecting the highest numeric id of the records left.
+
+        :return: str
+        """
+        return (
+            f"SELECT MAX(CAST({self.column(0)} AS INTEGER)) "
+            f"FROM {quote(self.name)} WHERE {self.column(0)} GLOB '[0-9]*'"
+        )
+
+    @property
+    def last_id(self) -> int:
+        """
+        Get the highest numeric id ever given in the table.
+
+        The ids of deleted records count too, so that they are never given
+        again.
+
+        :return: int
+        """
+        with self.lock:
+            (last_id,) = self.connection.execute(
+                f"SELECT MAX(IFNULL(({self.highest_id_query()}), 0), "
+                f"IFNULL((SELECT last_id FROM {quote(SEQUENCE_TABLE)} "
+                "WHERE name = ?), 0))",
+                (self.name,),
+            ).fetchone()
+        return last_id
+
+    @property
+    def version(self):
+        """
+        Get a value that changes whenever the table is written to.
+
+        The data version of SQLite only changes with commits made through
+        other connections, so it is paired with a count of our own writes.
+
+        :return: tuple
+        """
+        with self.lock:
+            (data_version,) = self.connection.execute("PRAGMA data_version").fetchone()
+        return self.changes, data_version
+
+    def records(self):
+        """
+        Iterate over every record of the table, fetching them in batches.
+
+        :return: Generator of records
+        """
+        with self.lock:
+            cursor = self.connection.execute(
+                f"SELECT * FROM {quote(self.name)} ORDER BY rowid"
+            )
+        while True:
+            with self.lock:
+                rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield list(row)
+
+    def page(self, page_number: int, page_size: int) -> list:
+        """
+        Get one page of records of the table.
+
+        :param page_number: The number of the page, starting from 0.
+        :param page_size: int
+        :return: list
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT * FROM {quote(self.name)} ORDER BY rowid LIMIT ? OFFSET ?",
+                (page_size, page_number * page_size),
+            ).fetchall()
+        return [list(row) for row in rows]
+
+    def page_count(self, page_size: int) -> int:
+        """
+        Get the number of pages needed to show every record of the table.
+
+        :param page_size: int
+        :return: int
+        """
+        with self.lock:
+            (row_count,) = self.connection.execute(
+                f"SELECT COUNT(*) FROM {quote(self.name)}"
+            ).fetchone()
+        return -(-row_count // page_size)
+
+    def find(self, column: int, value: str) -> list:
+        """
+        Get the first record holding the value in the given column.
+
+        :param column: int
+        :param value: str
+        :return: list
+        """
+        records = self.find_all(column, value)
+        return records[0] if records else None
+
+    def find_all(self, column: int, value: str) -> list:
+        """
+        Get every record holding the value in the given column.
+
+        :param column: int
+        :param value: str
+        :return: list
+        """
+        return self.query(f"{self.column(column)} = ?", (value,))
+
+    def find_prefix(self, column: int, prefix: str) -> list:
+        """
+        Get every record whose value in the given column starts with the prefix.
+
+        :param column: int
+        :param prefix: str
+        :return: list
+        """
+        return self.query(
+            f"{self.column(column)} >= ? AND {self.column(column)} < ?",
+            (prefix, prefix + "\U0010ffff"),
+        )
+
+    def find_at_least(self, column: int, amount: float) -> list:
+        """
+        Get every record whose amount in the given column is at least the amount.
+
+        Empty values hold no amount and are left out, as with the file backend.
+
+        :param column: int
+        :param amount: float
+        :return: list
+        """
+        return self.query(
+            f"CAST({self.column(column)} AS REAL) >= ? AND {self.column(column)} != ''",
+            (amount,),
+        )
+
+    def find_at_most(self, column: int, amount: float) -> list:
+        """
+        Get every record whose amount in the given column is at most the amount.
+
+        Empty values hold no amount and are left out, as with the file backend.
+
+        :param column: int
+        :param amount: float
+        :return: list
+        """
+        return self.query(
+            f"CAST({self.column(column)} AS REAL) <= ? AND {self.column(column)} != ''",
+            (amount,),
+        )
+
+    def append(self, records: list) -> None:
+        """
+        Insert records into the table.
+
+        :param records: list
+        :return: None
+        """
+        width = len(self.header)
+        placeholders = ", ".join("?" * width)
+        with transaction(self.connection, self.lock):
+            self.connection.executemany(
+                f"INSERT INTO {quote(self.name)} VALUES ({placeholders})",
+                [(list(record) + [""] * width)[:width] for record in records],
+            )
+            self.changes += 1
+
+    def update(self, changes: dict) -> None:
+        """
+        Replace the records with the given ids by their new versions.
+
+        :param changes: Mapping of record ids to their new records.
+        :return: None
+        """
+        assignments = ", ".join(f"{quote(column)} = ?" for column in self.header)
+        with transaction(self.connection, self.lock):
+            self.connection.executemany(
+                f"UPDATE {quote(self.name)} SET {assignments} "
+                f"WHERE {self.column(0)} = ?",
+                [(*record, key) for key, record in changes.items()],
+            )
+            self.changes += 1
+
+    def delete(self, keys: list) -> None:
+        """
+        Delete the records with the given ids.
+
+        The highest id is saved first, as it may be one of them.
+
+        :param keys: list
+        :return: None
+        """
+        with transaction(self.connection, self.lock):
+            save_sequence(self.connection, self.name, self.highest_id_query())
+            self.connection.executemany(
+                f"DELETE FROM {quote(self.name)} WHERE {self.column(0)} = ?",
+                [(key,) for key in keys],
+            )
+            self.changes += 1
+
+    def compact(self) -> None:
+        """
+        Nothing to fold back for a database table.
+
+        :return: None
+        """
+
+
+def import_text_files(data_directory: str, database: str = None) -> None:
+    """
+    Copy every data file of a directory into its own table of the database.
+
+    Tables that already exist are replaced.
+
+    :param data_directory: str
+    :param database: str
+    :return: None
+    """
+    connection, lock = get_connection(database)
+    for entry in sorted(os.listdir(data_directory)):
+        if not entry.endswith(".txt"):
+            continue
+        filename = os.path.join(data_directory, entry)
+        source = storage.Table(filename)
+        source.load()
+        with lock, connection:
+            connection.execute(f"DROP TABLE IF EXISTS {quote(table_name(filename))}")
+            connection.execute(
+                f"DELETE FROM {quote(SEQUENCE_TABLE)} WHERE name = ?",
+                (table_name(filename),),
+            )
+            save_sequence(connection, table_name(filename), "SELECT ?", source.last_id)
+        create_table(filename, source.header, database)
+        width = len(source.header)
+        placeholders = ", ".join("?" * width)
+        with lock, connection:
+            connection.executemany(
+                f"INSERT INTO {quote(table_name(filename))} VALUES ({placeholders})",
+                [(record + [""] * width)[:width] for record in source.records()],
+            )
+        print(f"Imported '{filename}'.")
+
+
+if __name__ == "__main__":
+    import_text_files(
+        sys.argv[1] if len(sys.argv) > 1 else "event_management_system/data",
+        sys.argv[2] if len(sys.argv) > 2 else None,
+    )
@@ -0,0 +1,1210 @@
+"""
+Loaded-once record store for the semicolon delimited data files.
+
+Inserts are appended to the data file itself, while updates and deletes are
+appended to a per-file log ("<file>.log") of operations keyed by the record
+id in the first column. The log is replayed on top of the data file when it
+is loaded and folded back into it by compaction.
+
+Changes to several files that must be made all together go through a
+batch, whose changes are written to a journal before any file is touched.
+
+Setting the EMS_STORAGE_BACKEND environment variable to "sqlite" keeps the
+records in a SQLite database (see sqlite_store) instead of the data files.
+"""
+
+from contextlib import ExitStack, contextmanager
+from itertools import groupby
+import bisect
+import os
+import shutil
+import tempfile
+import threading
+import sqlite_store
+
+try:
+    import fcntl
+except ImportError:  # Advisory file locks are not available on Windows
+    fcntl = None
+
+FILE_BACKEND = "file"
+SQLITE_BACKEND = "sqlite"
+BACKEND = os.environ.get("EMS_STORAGE_BACKEND", FILE_BACKEND)
+
+LOG_UPDATE = "U"
+LOG_DELETE = "D"
+LOG_APPEND = "A"  # Only found in batch journals, as appends go to the file
+LOG_COMPACTION_MINIMUM = 1000  # Log entries kept before compacting a file
+BATCH_JOURNAL = "batch.journal"  # Kept next to the data files during a batch
+
+_tables = {}
+_page_indexes = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def split_row(line: str) -> list:
+    """
+    Split a line of a data file into its values.
+
+    :param line: str
+    :return: list
+    """
+    return line.strip().split(";")
+
+
+def join_row(record: list) -> str:
+    """
+    Join the values of a record into a line of a data file.
+
+    :param record: list
+    :return: str
+    """
+    return f"{';'.join(record)}\n"
+
+
+def file_signature(filename: str) -> tuple:
+    """
+    Get the modification time and size of a file to detect changes made to it.
+
+    :param filename: str
+    :return: tuple
+    """
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def parse_amount(record: list, column: int) -> float:
+    """
+    Get the numeric value of a column, or None if it does not hold a number.
+
+    :param record: list
+    :param column: int
+    :return: float
+    """
+    try:
+        return float(record[column])
+    except (IndexError, ValueError):
+        return None
+
+
+def log_path(filename: str) -> str:
+    """
+    Get the path of the operation log of a data file.
+
+    :param filename: str
+    :return: str
+    """
+    return f"{filename}.log"
+
+
+def sequence_path(filename: str) -> str:
+    """
+    Get the path of the file keeping the highest id ever given in a data file.
+
+    :param filename: str
+    :return: str
+    """
+    return f"{filename}.seq"
+
+
+def read_sequence(filename: str) -> int:
+    """
+    Get the highest id ever given in a data file, as kept by its compaction.
+
+    :param filename: str
+    :return: int
+    """
+    try:
+        with open(sequence_path(filename), "r", encoding="utf-8") as file_reader:
+            return int(file_reader.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+@contextmanager
+def file_lock(filename: str, exclusive: bool = True):
+    """
+    Hold an advisory lock on a data file for the duration of a with block.
+
+    Readers take a shared lock and writers an exclusive one. The lock is
+    taken on a separate ".lock" file because atomic rewrites replace the data
+    file itself. Locks are re-entrant within a process, and a shared lock is
+    upgraded when an exclusive one is requested inside it.
+
+    :param filename: str
+    :param exclusive: bool
+    :return: None
+    """
+    lock_path = f"{os.path.abspath(filename)}.lock"
+    with _locks_guard:
+        state = _locks.setdefault(
+            lock_path,
+            {"thread_lock": threading.RLock(), "handle": None, "exclusive": False},
+        )
+
+    with state["thread_lock"]:
+        is_outermost = state["handle"] is None
+        if is_outermost:
+            state["handle"] = open(lock_path, "a")
+        if fcntl is not None and (is_outermost or exclusive and not state["exclusive"]):
+            fcntl.flock(state["handle"], fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            state["exclusive"] = exclusive
+        try:
+            yield
+        finally:
+            if is_outermost:
+                if fcntl is not None:
+                    fcntl.flock(state["handle"], fcntl.LOCK_UN)
+                state["handle"].close()
+                state["handle"] = None
+                state["exclusive"] = False
+
+
+def atomic_write(filename: str, data: bytes) -> None:
+    """
+    Replace the content of a file so that readers never see a partial write.
+
+    The data is written to a temporary file in the same directory which is
+    then moved over the original file.
+
+    :param filename: str
+    :param data: bytes
+    :return: None
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as file_writer:
+            file_writer.write(data)
+            file_writer.flush()
+            os.fsync(file_writer.fileno())
+        if os.path.exists(filename):
+            shutil.copymode(filename, temp_path)
+        os.replace(temp_path, filename)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_header(filename: str) -> list:
+    """
+    Read the column names of a file, or an empty list if the file is empty.
+
+    :param filename: str
+    :return: list
+    """
+    if BACKEND == SQLITE_BACKEND:
+        return get_table(filename).header
+    with file_lock(filename, exclusive=False):
+        with open(filename, "r", encoding="utf-8") as file_reader:
+            header_line = file_reader.readline()
+    return split_row(header_line) if header_line.strip() else []
+
+
+def iter_rows(filename: str):
+    """
+    Lazily iterate over the records of a file, without its header.
+
+    Rows are read and split one at a time so that memory use does not grow
+    with the size of the file, and a caller that stops early stops reading.
+    When the record store of the file is already loaded its rows are reused.
+    Pending log entries are applied to the rows as they are read.
+
+    :param filename: str
+    :return: Generator of records
+    """
+    table = _tables.get(os.path.abspath(filename))
+    if BACKEND == SQLITE_BACKEND or table is not None and not table.is_stale():
+        yield from get_table(filename).records()
+        return
+
+    with file_lock(filename, exclusive=False):
+        changes = read_log_changes(filename)
+        with open(filename, "r", encoding="utf-8") as file_reader:
+            file_reader.readline()  # Skip the header
+            for line in file_reader:
+                if not line.endswith("\n"):
+                    break  # Cut short by a crash
+                if not line.strip():
+                    continue
+                record = split_row(line)
+                if record[0] in changes:
+                    record = changes[record[0]]
+                    if record is None:
+                        continue
+                yield record
+
+
+def read_log_changes(filename: str) -> dict:
+    """
+    Read the latest logged version of every record changed in the log of a file.
+
+    :param filename: str
+    :return: Mapping of record ids to their new records, or None once deleted.
+    """
+    changes = {}
+    try:
+        with open(log_path(filename), "r", encoding="utf-8") as log_reader:
+            for entry in log_reader:
+                if entry.endswith("\n"):
+                    operation, key, *values = split_row(entry)
+                    changes[key] = values if operation == LOG_UPDATE else None
+    except FileNotFoundError:
+        pass
+    return changes
+
+
+def page_offsets(filename: str, page_size: int) -> list:
+    """
+    Get the byte offset of the first row of every page of a file.
+
+    The offsets are kept between calls and only the part of the file that was
+    appended since the last call is scanned. They are rebuilt when the file
+    is replaced, e.g. by compaction.
+
+    :param filename: str
+    :param page_size: int
+    :return: list
+    """
+    key = (os.path.abspath(filename), page_size)
+    stat = os.stat(filename)
+    state = _page_indexes.get(key)
+    if state is None or state["inode"] != stat.st_ino or state["end"] > stat.st_size:
+        state = {"inode": stat.st_ino, "end": 0, "rows": 0, "offsets": []}
+        _page_indexes[key] = state
+
+    if state["end"] < stat.st_size:
+        with open(filename, "rb") as file_reader:
+            file_reader.seek(state["end"])
+            if state["end"] == 0:
+                state["end"] = len(file_reader.readline())  # Skip the header
+            for line in file_reader:
+                if not line.endswith(b"\n"):
+                    break  # Cut short by a crash
+                if line.strip():
+                    if state["rows"] % page_size == 0:
+                        state["offsets"].append(state["end"])
+                    state["rows"] += 1
+                state["end"] += len(line)
+    return state["offsets"]
+
+
+def read_page(filename: str, page_number: int, page_size: int) -> tuple:
+    """
+    Read one page of records of a file by seeking straight to its first row.
+
+    Records deleted in the log are left out, so a page may hold fewer records
+    than the page size until the file is compacted.
+
+    :param filename: str
+    :param page_number: The number of the page, starting from 0.
+    :param page_size: int
+    :return: The records of the page and the total number of pages.
+    """
+    if page_size < 1:
+        raise ValueError(f"The page size must be at least 1, not {page_size}.")
+    if BACKEND == SQLITE_BACKEND:
+        table = get_table(filename)
+        return table.page(page_number, page_size), table.page_count(page_size)
+
+    with file_lock(filename, exclusive=False):
+        offsets = page_offsets(filename, page_size)
+        records = []
+        if 0 <= page_number < len(offsets):
+            changes = read_log_changes(filename)
+            with open(filename, "rb") as file_reader:
+                file_reader.seek(offsets[page_number])
+                row_count = 0
+                for line in file_reader:
+                    if not line.endswith(b"\n"):
+                        break  # Cut short by a crash
+                    if not line.strip():
+                        continue
+                    if row_count == page_size:
+                        break
+                    row_count += 1
+                    record = split_row(line.decode("utf-8"))
+                    record = changes.get(record[0], record)
+                    if record is not None:
+                        records.append(record)
+    return records, len(offsets)
+
+
+def sorted_slot(amounts: list, positions: list, amount: float, position: int) -> int:
+    """
+    Find where a row belongs in a sorted index.
+
+    Rows with the same amount are kept in the order of their positions, so
+    that a row is found by bisection however many rows share its amount.
+
+    :param amounts: list
+    :param positions: list
+    :param amount: float
+    :param position: int
+    :return: int
+    """
+    start = bisect.bisect_left(amounts, amount)
+    end = bisect.bisect_right(amounts, amount, start)
+    return bisect.bisect_left(positions, position, start, end)
+
+
+class Table:
+    """
+    In-memory copy of a data file with indexes on its columns.
+
+    Hash indexes map a column value to the positions of the rows holding
+    that value. Prefix indexes bucket the rows by the first characters of a
+    column (e.g. the year or year-month of a date), and sorted indexes keep
+    the numeric values of a column in order for range queries. Every index is
+    only built for the columns that are actually looked up.
+    Deleted rows are kept as None until the file is compacted so that the
+    positions of the other rows do not change. The highest numeric id in the
+    first column is kept as the sequence used to number new records. It never
+    goes down: compaction saves it next to the file ("<file>.seq") before
+    dropping the deleted rows, so the id of a deleted record is never given
+    again. The version is bumped on every change so that caches built from the rows
+    know when to rebuild.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.header = []
+        self.rows = []
+        self.offsets = []
+        self.indexes = {}
+        self.prefix_indexes = {}
+        self.sorted_indexes = {}
+        self.log_entries = 0
+        self.last_id = 0
+        self.signature = None
+        self.version = 0
+        self.data_size = 0
+        self.log_offset = 0
+        self.data_reader = None
+        self.log_reader = None
+
+    def load(self) -> None:
+        """
+        Read the data file into memory, replay its log and drop any index.
+
+        :return: None
+        """
+        self.close()
+        self.rows = []
+        self.offsets = []
+        self.indexes = {}
+        self.prefix_indexes = {}
+        self.sorted_indexes = {}
+        self.log_entries = 0
+        self.data_reader = open(self.filename, "rb")
+        header_line = self.data_reader.readline()
+        self.header = split_row(header_line.decode("utf-8"))
+        self.data_size = len(header_line)
+        self.read_data()
+        self.last_id = max(
+            (int(record[0]) for record in self.rows if record[0].isdigit()),
+            default=0,
+        )
+        self.last_id = max(self.last_id, read_sequence(self.filename))
+        self.log_offset = 0
+        self.replay_log()
+        if fcntl is None:
+            # Open files cannot be replaced on Windows, and without file locks
+            # there is no telling what changed anyway, so always reload
+            self.close()
+        self.signature = self.current_signature()
+        self.version += 1
+
+    def close(self) -> None:
+        """
+        Close the data file and the log kept open since they were read.
+
+        :return: None
+        """
+        for reader in (self.data_reader, self.log_reader):
+            if reader is not None:
+                reader.close()
+        self.data_reader = None
+        self.log_reader = None
+
+    def read_data(self) -> None:
+        """
+        Add the rows appended to the data file since it was last read.
+
+        A last line without a newline was cut short by a crash and is ignored,
+        like in the log. It is left for the next read, by when a writer has
+        dropped it.
+
+        :return: None
+        """
+        self.data_reader.seek(self.data_size)
+        offset = self.data_size
+        for line in self.data_reader:
+            if not line.endswith(b"\n"):
+                break
+            if line.strip():
+                self.rows.append(split_row(line.decode("utf-8")))
+                self.offsets.append(offset)
+            offset += len(line)
+        self.data_size = offset
+
+    def replay_log(self) -> None:
+        """
+        Apply the operations appended to the log since it was last read.
+
+        A last line without a newline was cut short by a crash and is ignored.
+        It is left for the next read, by when a writer has dropped it.
+
+        :return: None
+        """
+        if self.log_reader is None:
+            try:
+                self.log_reader = open(log_path(self.filename), "rb")
+            except FileNotFoundError:
+                return
+        self.log_reader.seek(self.log_offset)
+        for entry in self.log_reader:
+            if not entry.endswith(b"\n"):
+                break
+            self.apply_log_entry(split_row(entry.decode("utf-8")))
+            self.log_offset += len(entry)
+
+    def apply_log_entry(self, entry: list) -> None:
+        """
+        Apply a single log operation to the rows in memory.
+
+        :param entry: The operation, the record id and the new values if any.
+        :return: None
+        """
+        operation, key, values = entry[0], entry[1], entry[2:]
+        for position in list(self.index(0).get(key, [])):
+            if operation == LOG_UPDATE:
+                self.replace_row(position, values)
+            elif operation == LOG_DELETE:
+                self.replace_row(position, None)
+        self.log_entries += 1
+
+    def current_signature(self) -> tuple:
+        """
+        Get the signatures of both the data file and its log.
+
+        :return: tuple
+        """
+        return file_signature(self.filename), file_signature(log_path(self.filename))
+
+    def is_stale(self) -> bool:
+        """
+        Check whether the file or its log has been changed since it was loaded.
+
+        :return: bool
+        """
+        return self.signature != self.current_signature()
+
+    def is_replaced(self) -> bool:
+        """
+        Check whether the file or its log has been replaced since it was read.
+
+        Compaction moves a new data file over the old one and removes the log.
+        As the files read are kept open, a new file can never reuse their
+        inode, so a different inode means that the file was replaced.
+
+        :return: bool
+        """
+        if self.data_reader is None:
+            return True
+        try:
+            data_stat = os.stat(self.filename)
+        except FileNotFoundError:
+            return True
+        if (
+            data_stat.st_ino != os.fstat(self.data_reader.fileno()).st_ino
+            or data_stat.st_size < self.data_size
+        ):
+            return True
+        if self.log_reader is None:
+            return False
+        try:
+            log_stat = os.stat(log_path(self.filename))
+        except FileNotFoundError:
+            return True
+        return (
+            log_stat.st_ino != os.fstat(self.log_reader.fileno()).st_ino
+            or log_stat.st_size < self.log_offset
+        )
+
+    def refresh(self) -> None:
+        """
+        Catch up with the changes made to the file by other processes.
+
+        Only the rows appended to the data file and the operations appended
+        to the log since they were last read are applied, so keeping up with
+        another process costs as much as the changes it made. The file is read
+        again in full if it has been replaced, i.e. compacted.
+
+        :return: None
+        """
+        if self.is_replaced():
+            self.load()
+            return
+        first_position = len(self.rows)
+        self.read_data()
+        for position in range(first_position, len(self.rows)):
+            record = self.rows[position]
+            if record[0].isdigit():
+                self.last_id = max(self.last_id, int(record[0]))
+            self.index_row(position, record)
+        self.replay_log()
+        self.signature = self.current_signature()
+        self.version += 1
+
+    def column_position(self, column: int) -> int:
+        """
+        Convert a (possibly negative) column index into a positive one.
+
+        :param column: int
+        :return: int
+        """
+        return column % len(self.header) if column < 0 else column
+
+    def index(self, column: int) -> dict:
+        """
+        Get the index of a column, building it on first use.
+
+        :param column: int
+        :return: dict
+        """
+        column = self.column_position(column)
+        if column not in self.indexes:
+            column_index = {}
+            for position, record in enumerate(self.rows):
+                if record is not None and column < len(record):
+                    column_index.setdefault(record[column], []).append(position)
+            self.indexes[column] = column_index
+        return self.indexes[column]
+
+    def prefix_index(self, column: int, length: int) -> dict:
+        """
+        Get the index of the first characters of a column, building it on first use.
+
+        :param column: int
+        :param length: The number of characters the rows are bucketed by.
+        :return: dict
+        """
+        key = (self.column_position(column), length)
+        if key not in self.prefix_indexes:
+            column, bucket_index = key[0], {}
+            for position, record in enumerate(self.rows):
+                if record is not None and column < len(record):
+                    bucket = record[column][:length]
+                    bucket_index.setdefault(bucket, []).append(position)
+            self.prefix_indexes[key] = bucket_index
+        return self.prefix_indexes[key]
+
+    def sorted_index(self, column: int) -> tuple:
+        """
+        Get the numeric values of a column in ascending order with their positions.
+
+        :param column: int
+        :return: The sorted values and the positions of their rows.
+        """
+        column = self.column_position(column)
+        if column not in self.sorted_indexes:
+            pairs = sorted(
+                (amount, position)
+                for position, record in enumerate(self.rows)
+                if record is not None
+                and (amount := parse_amount(record, column)) is not None
+            )
+            self.sorted_indexes[column] = (
+                [amount for amount, _ in pairs],
+                [position for _, position in pairs],
+            )
+        return self.sorted_indexes[column]
+
+    def index_row(self, position: int, record: list) -> None:
+        """
+        Add a row to every index that has been built.
+
+        :param position: int
+        :param record: list
+        :return: None
+        """
+        for column, column_index in self.indexes.items():
+            if column < len(record):
+                bisect.insort(column_index.setdefault(record[column], []), position)
+        for (column, length), bucket_index in self.prefix_indexes.items():
+            if column < len(record):
+                bucket = record[column][:length]
+                bisect.insort(bucket_index.setdefault(bucket, []), position)
+        for column, (amounts, positions) in self.sorted_indexes.items():
+            amount = parse_amount(record, column)
+            if amount is not None:
+                slot = sorted_slot(amounts, positions, amount, position)
+                amounts.insert(slot, amount)
+                positions.insert(slot, position)
+
+    def unindex_row(self, position: int, record: list) -> None:
+        """
+        Remove a row from every index that has been built.
+
+        :param position: int
+        :param record: list
+        :return: None
+        """
+        keyed_indexes = [
+            (column_index, record[column])
+            for column, column_index in self.indexes.items()
+            if column < len(record)
+        ] + [
+            (bucket_index, record[column][:length])
+            for (column, length), bucket_index in self.prefix_indexes.items()
+            if column < len(record)
+        ]
+        for column_index, value in keyed_indexes:
+            column_index[value].remove(position)
+            if not column_index[value]:
+                del column_index[value]
+        for column, (amounts, positions) in self.sorted_indexes.items():
+            amount = parse_amount(record, column)
+            if amount is not None:
+                slot = sorted_slot(amounts, positions, amount, position)
+                del amounts[slot]
+                del positions[slot]
+
+    def records(self):
+        """
+        Iterate over the records that have not been deleted.
+
+        :return: Generator of records
+        """
+        return (record for record in self.rows if record is not None)
+
+    def find(self, column: int, value: str) -> list:
+        """
+        Get the first record holding the value in the given column.
+
+        :param column: int
+        :param value: str
+        :return: list
+        """
+        positions = self.index(column).get(value)
+        if positions:
+            return self.rows[positions[0]]
+        return None
+
+    def find_all(self, column: int, value: str) -> list:
+        """
+        Get every record holding the value in the given column.
+
+        :param column: int
+        :param value: str
+        :return: list
+        """
+        return [self.rows[position] for position in self.index(column).get(value, [])]
+
+    def find_prefix(self, column: int, prefix: str) -> list:
+        """
+        Get every record whose value in the given column starts with the prefix.
+
+        :param column: int
+        :param prefix: str
+        :return: list
+        """
+        positions = self.prefix_index(column, len(prefix)).get(prefix, [])
+        return [self.rows[position] for position in positions]
+
+    def find_at_least(self, column: int, amount: float) -> list:
+        """
+        Get every record whose amount in the given column is at least the amount.
+
+        :param column: int
+        :param amount: float
+        :return: list
+        """
+        amounts, positions = self.sorted_index(column)
+        start = bisect.bisect_left(amounts, amount)
+        return [self.rows[position] for position in sorted(positions[start:])]
+
+    def find_at_most(self, column: int, amount: float) -> list:
+        """
+        Get every record whose amount in the given column is at most the amount.
+
+        :param column: int
+        :param amount: float
+        :return: list
+        """
+        amounts, positions = self.sorted_index(column)
+        end = bisect.bisect_right(amounts, amount)
+        return [self.rows[position] for position in sorted(positions[:end])]
+
+    def append(self, records: list) -> None:
+        """
+        Append records to the data file.
+
+        The rows in memory are up to date when appending, so anything in the
+        file past the rows read is a partial row left behind by a crash. It is
+        dropped first so that the records are not glued onto it.
+
+        :param records: list
+        :return: None
+        """
+        with open(self.filename, "ab+") as file_writer:
+            if file_writer.seek(0, os.SEEK_END) > self.data_size:
+                file_writer.truncate(self.data_size)
+            if self.data_size > 0:
+                file_writer.seek(self.data_size - 1)
+                if file_writer.read(1) != b"\n":
+                    file_writer.write(b"\n")  # Header without a newline
+                    self.data_size += 1
+            offset = self.data_size
+            file_writer.write(
+                "".join(join_row(record) for record in records).encode("utf-8")
+            )
+            self.data_size = file_writer.tell()
+        self.add_rows(records, offset)
+        self.signature = self.current_signature()
+        self.version += 1
+
+    def update(self, changes: dict) -> None:
+        """
+        Log new versions of the records with the given ids.
+
+        :param changes: Mapping of record ids to their new records.
+        :return: None
+        """
+        self.write_log([[LOG_UPDATE, key, *record] for key, record in changes.items()])
+
+    def delete(self, keys: list) -> None:
+        """
+        Log the deletion of the records with the given ids.
+
+        :param keys: list
+        :return: None
+        """
+        self.write_log([[LOG_DELETE, key] for key in keys])
+
+    def add_rows(self, records: list, offset: int) -> None:
+        """
+        Add records that were appended to the file to the rows and indexes.
+
+        :param records: list
+        :param offset: The size of the file before the records were appended.
+        :return: None
+        """
+        for record in records:
+            position = len(self.rows)
+            self.rows.append(record)
+            self.offsets.append(offset)
+            offset += len(join_row(record).encode("utf-8"))
+            if record[0].isdigit():
+                self.last_id = max(self.last_id, int(record[0]))
+            self.index_row(position, record)
+
+    def replace_row(self, position: int, record: list) -> None:
+        """
+        Replace or delete a row in memory and update the indexes accordingly.
+
+        :param position: int
+        :param record: The new record, or None to delete the row.
+        :return: None
+        """
+        if self.rows[position] is not None:
+            self.unindex_row(position, self.rows[position])
+        if record is not None:
+            self.index_row(position, record)
+        self.rows[position] = record
+
+    def write_log(self, entries: list) -> None:
+        """
+        Append operations to the log and apply them to the rows in memory.
+
+        :param entries: list
+        :return: None
+        """
+        with open(log_path(self.filename), "ab+") as log_writer:
+            # Drop a partial entry left behind by a crash before appending
+            if log_writer.tell() > 0:
+                log_writer.seek(-1, os.SEEK_END)
+                if log_writer.read(1) != b"\n":
+                    log_writer.seek(0)
+                    content = log_writer.read()
+                    log_writer.truncate(content.rfind(b"\n") + 1)
+            log_writer.write(
+                "".join(join_row(entry) for entry in entries).encode("utf-8")
+            )
+            self.log_offset = log_writer.tell()
+        if self.log_reader is None and fcntl is not None:
+            self.log_reader = open(log_path(self.filename), "rb")
+        for entry in entries:
+            self.apply_log_entry(entry)
+        self.signature = self.current_signature()
+        self.version += 1
+
+        if self.log_entries >= max(LOG_COMPACTION_MINIMUM, len(self.rows) // 4):
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Fold the log back into the data file and remove the log.
+
+        The operations in the log are keyed by record id, so replaying a log
+        left behind by a crash during compaction gives the same result. The
+        highest id is saved first when the record holding it is dropped, so
+        that new records are never given it again once the file is reloaded.
+
+        :return: None
+        """
+        kept_last_id = max(
+            (int(record[0]) for record in self.records() if record[0].isdigit()),
+            default=0,
+        )
+        if self.last_id > max(kept_last_id, read_sequence(self.filename)):
+            atomic_write(
+                sequence_path(self.filename), f"{self.last_id}\n".encode("utf-8")
+            )
+        lines = [join_row(self.header)]
+        lines.extend(join_row(record) for record in self.records())
+        atomic_write(self.filename, "".join(lines).encode("utf-8"))
+        if os.path.exists(log_path(self.filename)):
+            os.remove(log_path(self.filename))
+        self.load()
+
+    def add_columns(self, values: dict) -> None:
+        """
+        Add columns after the last one, filled with the same value in every row.
+
+        :param values: Mapping of the new column names to their values.
+        :return: None
+        """
+        self.header = [*self.header, *values]
+        for record in self.records():
+            record.extend(values.values())
+        self.compact()
+
+
+def get_table(filename: str) -> Table:
+    """
+    Get the record store of a file, reloading it if the file has changed.
+
+    :param filename: str
+    :return: Table, or sqlite_store.SqliteTable with the SQLite backend
+    """
+    key = os.path.abspath(filename)
+    if BACKEND == SQLITE_BACKEND:
+        if key not in _tables:
+            _tables[key] = sqlite_store.SqliteTable(filename)
+        return _tables[key]
+
+    with file_lock(filename, exclusive=False):
+        table = _tables.get(key)
+        if table is None:
+            table = Table(filename)
+            _tables[key] = table
+            table.load()
+        elif table.is_stale():
+            table.refresh()
+    return table
+
+
+def invalidate(filename: str) -> None:
+    """
+    Forget the record store of a file so that it is reloaded on next use.
+
+    :param filename: str
+    :return: None
+    """
+    _tables.pop(os.path.abspath(filename), None)
+
+
+def ensure_header(
+    filename: str, column_name: list, default_values: dict = None
+) -> None:
+    """
+    Create a data file with its header, or check the header of an existing one.
+
+    A file missing some columns at the end of the header is upgraded by adding
+    them, provided that they all have a default value for the existing rows.
+
+    :param filename: str
+    :param column_name: list
+    :param default_values: Mapping of column names to the value they are given
+        in the rows of an older file.
+    :return: None
+    """
+    if BACKEND == SQLITE_BACKEND:
+        sqlite_store.ensure_header(filename, column_name, default_values)
+        table = _tables.get(os.path.abspath(filename))
+        if table is not None and table.header != column_name:
+            invalidate(filename)
+        return
+
+    with file_lock(filename):
+        try:
+            # Try to read the first line of the file
+            with open(filename, "r", encoding="utf-8") as file_reader:
+                old_column_name = file_reader.readline()
+        except FileNotFoundError:
+            old_column_name = ""
+        # Split by newline first and then by semicolon
+        old_header = old_column_name.split("\n")[0].split(";")
+        if not old_column_name:
+            atomic_write(filename, join_row(column_name).encode("utf-8"))
+        elif old_header != column_name:
+            new_columns = column_name[len(old_header) :]
+            if column_name[: len(old_header)] != old_header or not all(
+                column in (default_values or {}) for column in new_columns
+            ):
+                raise AssertionError(
+                    "Incorrect file headers detected."
+                )  # Detect incorrect column names
+            get_table(filename).add_columns(
+                {column: default_values[column] for column in new_columns}
+            )
+        elif not old_column_name.endswith("\n"):
+            # Append a newline if the column names are not terminated by a newline
+            with open(filename, "a", encoding="utf-8") as file_writer:
+                file_writer.write("\n")
+
+
+def append_rows(filename: str, records: list) -> None:
+    """
+    Append records to a file and keep its record store up to date.
+
+    :param filename: str
+    :param records: list
+    :return: None
+    """
+    with file_lock(filename):
+        get_table(filename).append(records)
+
+
+def append_numbered_rows(filename: str, records: list) -> list:
+    """
+    Append records to a file, numbering them after the highest existing id.
+
+    :param filename: str
+    :param records: list
+    :return: The records as written, with their ids.
+    """
+    with file_lock(filename):
+        table = get_table(filename)
+        first_id = table.last_id + 1
+        numbered_records = [
+            [str(first_id + data_id), *record] for data_id, record in enumerate(records)
+        ]
+        table.append(numbered_records)
+    return [record.copy() for record in numbered_records]
+
+
+def merge_record(current_record: list, old_record: list, new_record: list) -> list:
+    """
+    Apply the values changed between two versions of a record to its current one.
+
+    The old record may have been read long before the change is written, in
+    which case other columns of the record may have been changed since then,
+    e.g. the seats available of an event by bookings. Only the columns that
+    differ between the old and the new record are taken from the new one.
+
+    :param current_record: The record as it is now in the file.
+    :param old_record: The record the change was made from.
+    :param new_record: The record with the change made.
+    :return: list
+    """
+    merged_record = list(current_record)
+    for column, value in enumerate(new_record):
+        if column < len(old_record) and value == old_record[column]:
+            continue
+        if column < len(merged_record):
+            merged_record[column] = value
+        else:
+            merged_record.append(value)
+    return merged_record
+
+
+def update_rows(filename: str, data_difference: list) -> None:
+    """
+    Apply a batch of record changes, locating each record by its id.
+
+    Only the columns changed are written over the current version of each
+    record, so that the changes made to its other columns since the old
+    record was read are kept. Several changes to the same record are applied
+    in order, and all of them are written at once (appended to the log with
+    the file backend).
+
+    :param filename: str
+    :param data_difference: A list of [old_record, new_record] pairs.
+    :return: None
+    """
+    with file_lock(filename):
+        table = get_table(filename)
+        changes = {}
+        for old_record, new_record in data_difference:
+            current_record = changes.get(old_record[0]) or table.find(0, old_record[0])
+            if current_record is not None:
+                changes[old_record[0]] = merge_record(
+                    current_record, old_record, new_record
+                )
+        if changes:
+            table.update(changes)
+
+
+def delete_rows(filename: str, keys: list) -> None:
+    """
+    Delete the records with the given ids.
+
+    :param filename: str
+    :param keys: list
+    :return: None
+    """
+    with file_lock(filename):
+        if keys:
+            get_table(filename).delete(keys)
+
+
+def compact(filename: str) -> None:
+    """
+    Fold the log of a file back into the file on demand.
+
+    :param filename: str
+    :return: None
+    """
+    with file_lock(filename):
+        get_table(filename).compact()
+
+
+class Batch:
+    """
+    Changes to several files collected to be applied all together.
+
+    Each change is kept as a list of the operation, the file it applies to
+    and its values: the record to append, the id and the new record of an
+    update, or the id of the record to delete.
+    """
+
+    def __init__(self) -> None:
+        self.operations = []
+
+    def append(self, filename: str, records: list) -> None:
+        """
+        Append records to a file.
+
+        :param filename: str
+        :param records: list
+        :return: None
+        """
+        self.operations.extend([LOG_APPEND, filename, *record] for record in records)
+
+    def update(self, filename: str, changes: dict) -> None:
+        """
+        Replace the records of a file with the given ids.
+
+        :param filename: str
+        :param changes: Mapping of record ids to their new records.
+        :return: None
+        """
+        self.operations.extend(
+            [LOG_UPDATE, filename, key, *record] for key, record in changes.items()
+        )
+
+    def delete(self, filename: str, keys: list) -> None:
+        """
+        Delete the records of a file with the given ids.
+
+        :param filename: str
+        :param keys: list
+        :return: None
+        """
+        self.operations.extend([LOG_DELETE, filename, key] for key in keys)
+
+
+def apply_operations(operations: list, skip_applied: bool = False) -> None:
+    """
+    Apply the operations of a batch, writing each run of them on a file at once.
+
+    :param operations: list
+    :param skip_applied: Whether to skip the appends and deletes that have
+        already been made, when completing a batch cut short.
+    :return: None
+    """
+    for (operation, filename), entries in groupby(
+        operations, key=lambda entry: (entry[0], entry[1])
+    ):
+        values = [entry[2:] for entry in entries]
+        with file_lock(filename):
+            table = get_table(filename)
+            if skip_applied and operation == LOG_APPEND:
+                values = [value for value in values if table.find(0, value[0]) is None]
+            elif skip_applied and operation == LOG_DELETE:
+                values = [
+                    value for value in values if table.find(0, value[0]) is not None
+                ]
+            if not values:
+                continue
+            if operation == LOG_APPEND:
+                table.append(values)
+            elif operation == LOG_UPDATE:
+                table.update({value[0]: value[1:] for value in values})
+            elif operation == LOG_DELETE:
+                table.delete([value[0] for value in values])
+
+
+def recover_batch(journal: str) -> None:
+    """
+    Complete a batch whose journal was left behind by a crash.
+
+    The journal only exists once it has been written in full, so every
+    operation in it was meant to be applied.
+
+    :param journal: The path of the batch journal.
+    :return: None
+    """
+    try:
+        with open(journal, "r", encoding="utf-8") as journal_reader:
+            operations = [split_row(line) for line in journal_reader if line.strip()]
+    except FileNotFoundError:
+        return
+    apply_operations(operations, skip_applied=True)
+    os.remove(journal)
+
+
+@contextmanager
+def batch(filenames: list):
+    """
+    Lock files for changes that are made all together or not at all.
+
+    The changes collected in the yielded Batch are applied when the with
+    block ends without an error, and discarded otherwise. With the file
+    backend they are first written to a journal, which is removed once they
+    have all been applied. A batch cut short by a crash is completed by the
+    next one, before it makes any change of its own. With the SQLite backend
+    they are made in a single transaction.
+
+    :param filenames: The files changed by the batch.
+    :return: Batch
+    """
+    directory = os.path.dirname(os.path.abspath(filenames[0]))
+    journal = os.path.join(directory, BATCH_JOURNAL)
+    changes = Batch()
+    with ExitStack() as stack:
+        stack.enter_context(file_lock(journal))
+        if BACKEND != SQLITE_BACKEND:
+            recover_batch(journal)
+        for filename in sorted(set(filenames)):
+            stack.enter_context(file_lock(filename))
+
+        if BACKEND == SQLITE_BACKEND:
+            with sqlite_store.batch():
+                yield changes
+                apply_operations(changes.operations)
+        else:
+            yield changes
+            if changes.operations:
+                lines = "".join(join_row(entry) for entry in changes.operations)
+                atomic_write(journal, lines.encode("utf-8"))
+                apply_operations(changes.operations)
+                os.remove(journal)
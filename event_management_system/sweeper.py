@@ -0,0 +1,70 @@
+"""
+Background expiry of the cart items left unpaid, releasing their seats.
+
+Usage: python event_management_system/sweeper.py [interval]
+
+The booking server runs a sweep every SWEEP_INTERVAL seconds on its own,
+while the sweeper can be run on its side when the system is only used
+through the menus. Each sweep removes the expired items of every cart in
+one batch, and the cost of the sweeps is kept in the metrics.
+"""
+
+import os
+import sys
+import time
+import services
+
+SWEEP_INTERVAL = float(os.environ.get("EMS_SWEEP_INTERVAL", "30"))
+
+metrics = {
+    "sweeps": 0,
+    "items_expired": 0,
+    "seats_released": 0,
+    "last_sweep_seconds": 0.0,
+    "max_sweep_seconds": 0.0,
+    "total_sweep_seconds": 0.0,
+}
+
+
+def sweep(now: float = None) -> list:
+    """
+    Expire the cart items reserved for longer than the cart TTL.
+
+    :param now: The current time in seconds since the epoch.
+    :return: The cart records removed.
+    """
+    start = time.perf_counter()
+    cart_items = services.expire_cart_items(now)
+    duration = time.perf_counter() - start
+
+    metrics["sweeps"] += 1
+    metrics["items_expired"] += len(cart_items)
+    metrics["seats_released"] += sum(int(item[6]) for item in cart_items)
+    metrics["last_sweep_seconds"] = duration
+    metrics["max_sweep_seconds"] = max(metrics["max_sweep_seconds"], duration)
+    metrics["total_sweep_seconds"] += duration
+    return cart_items
+
+
+def run(interval: float = SWEEP_INTERVAL) -> None:
+    """
+    Sweep the carts at a regular interval until interrupted.
+
+    :param interval: The number of seconds between two sweeps.
+    :return: None
+    """
+    while True:
+        cart_items = sweep()
+        if cart_items:
+            print(
+                f"Expired {len(cart_items)} cart item(s) in "
+                f"{metrics['last_sweep_seconds'] * 1000:.1f} ms."
+            )
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    try:
+        run(float(sys.argv[1]) if len(sys.argv) > 1 else SWEEP_INTERVAL)
+    except KeyboardInterrupt:
+        pass
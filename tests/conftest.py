@@ -0,0 +1,49 @@
+"""
+Shared setup of the tests.
+
+The modules of the event management system import each other by name, so
+their directory is put on the import path. Every test gets its own data
+directory and starts with no file loaded.
+"""
+
+import os
+import shutil
+import sys
+import pytest
+
+PACKAGE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "event_management_system",
+)
+sys.path.insert(0, PACKAGE_DIR)
+
+import storage  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def empty_tables(monkeypatch):
+    """Forget the files loaded by other tests."""
+    monkeypatch.setattr(storage, "BACKEND", storage.FILE_BACKEND)
+    monkeypatch.setattr(storage, "_tables", {})
+    monkeypatch.setattr(storage, "_page_indexes", {})
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    """Get a data file with a header and three records."""
+    filename = str(tmp_path / "records.txt")
+    with open(filename, "w", encoding="utf-8") as file_writer:
+        file_writer.write("id;name;seats\n1;alpha;10\n2;beta;20\n3;gamma;30\n")
+    return filename
+
+
+@pytest.fixture
+def data_directory(tmp_path, monkeypatch):
+    """Work on a copy of the shipped data files, as the programs see them."""
+    shutil.copytree(
+        os.path.join(PACKAGE_DIR, "data"),
+        tmp_path / "event_management_system" / "data",
+        ignore=shutil.ignore_patterns("*.lock", "*.log", "*.journal", "*.db*"),
+    )
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,133 @@
+"""Tests of the service layer, on a copy of the shipped data files."""
+
+import pytest
+import ems
+import passwords
+import payments
+import services
+import storage
+
+
+def test_removing_an_item_from_a_cart_saved_before_reservations(data_directory):
+    assert len(storage.read_header(services.CART_FILE)) == 8
+    seats = services.find_event("EV002")[11]
+
+    (removed,) = services.remove_cart_items("smith_ryan", ["4110"])
+
+    assert removed[0] == "4110"
+    assert "4110" not in [item[0] for item in services.get_cart("smith_ryan")]
+    assert services.find_event("EV002")[11] == seats  # It held no seats
+
+
+class FailingVoidGateway(payments.SimulatedGateway):
+    """Gateway taking every payment and failing to give any back."""
+
+    async def void(self, idempotency_key: str) -> None:
+        raise payments.GatewayError("The payment gateway is unavailable.")
+
+
+def add_event(event_code: str, price: str) -> None:
+    """Add an event with ten seats."""
+    services.create_events(
+        [
+            {
+                "event_name": "Test Event",
+                "event_category": "Food and Drink",
+                "event_code": event_code,
+                "event_price": price,
+                "organizer": "Tests",
+                "start_date": "2030-01-01",
+                "start_time": "10:00",
+                "end_date": "2030-01-01",
+                "end_time": "12:00",
+                "venue": "Online",
+                "total_seats_available": "10",
+            }
+        ]
+    )
+
+
+def book(username: str, event_code: str) -> list:
+    """Book one seat of an event."""
+    return services.book_tickets(
+        username,
+        [
+            {
+                "event_code": event_code,
+                "attendee_name": "Test Attendee",
+                "email_address": "attendee@example.com",
+                "contact_number": "012-3456789",
+                "quantity": 1,
+            }
+        ],
+    )
+
+
+def test_free_event_can_be_paid_for(data_directory, monkeypatch):
+    monkeypatch.setitem(payments._gateway, "instance", payments.SimulatedGateway(0))
+    add_event("FREE", "0")
+    book("smith_ryan", "FREE")
+
+    transactions, tickets = services.checkout(
+        "smith_ryan", "Maybank", "eWallet", "VISA", ["FREE"]
+    )
+
+    assert [transaction[8] for transaction in transactions] == ["0.00"]
+    assert [ticket[2] for ticket in tickets] == ["FREE"]
+
+
+def test_void_failure_is_noted_on_the_original_error(data_directory, monkeypatch):
+    monkeypatch.setitem(payments._gateway, "instance", FailingVoidGateway(0))
+    add_event("PAID", "10")
+    book("smith_ryan", "PAID")
+
+    def cart_changed(cart_items, transactions):
+        raise services.ServiceError("The cart changed during the payment.")
+
+    monkeypatch.setattr(services, "save_checkout", cart_changed)
+    with pytest.raises(services.ServiceError) as raised:
+        services.checkout("smith_ryan", "Maybank", "eWallet", "VISA", ["PAID"])
+
+    assert str(raised.value) == "The cart changed during the payment."
+    assert "could not be voided" in raised.value.__notes__[0]
+
+
+def test_payment_gateway_is_abstract():
+    with pytest.raises(TypeError):
+        payments.PaymentGateway()
+
+
+def test_removing_an_item_releases_its_seats(data_directory):
+    add_event("SEATS", "10")
+    (ticket,) = book("smith_ryan", "SEATS")
+    assert services.find_event("SEATS")[11] == "9"
+
+    services.remove_cart_items("smith_ryan", [ticket[0]])
+
+    assert services.find_event("SEATS")[11] == "10"
+    assert storage.get_table(services.TICKET_FILE).find(0, ticket[0]) is None
+
+
+def test_booking_too_many_seats_books_nothing(data_directory):
+    add_event("FULL", "10")
+    booking = {
+        "event_code": "FULL",
+        "attendee_name": "Test Attendee",
+        "email_address": "attendee@example.com",
+        "contact_number": "012-3456789",
+        "quantity": 11,
+    }
+
+    with pytest.raises(services.ServiceError):
+        services.book_tickets("smith_ryan", [booking])
+
+    assert services.find_event("FULL")[11] == "10"
+    assert storage.get_table(services.TICKET_FILE).find_all(2, "FULL") == []
+
+
+def test_default_admin_password_is_only_hashed_once(data_directory, monkeypatch):
+    hashed = []
+    monkeypatch.setattr(passwords, "hash_password", hashed.append)
+
+    assert ems.create_default_admin_account() == []  # admin.txt has an admin
+    assert hashed == []
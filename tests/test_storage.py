@@ -0,0 +1,181 @@
+"""Tests of the file backend of the record store."""
+
+from multiprocessing import get_context
+import os
+import pytest
+import storage
+
+
+def reload(filename: str) -> list:
+    """
+    Read a file again from scratch, as a new process would.
+
+    :param filename: str
+    :return: The records that have not been deleted.
+    """
+    table = storage.Table(filename)
+    table.load()
+    records = list(table.records())
+    table.close()
+    return records
+
+
+def run_in_process(target, *args) -> None:
+    """
+    Run a function in another process and wait for it to succeed.
+
+    :param target: The function to run.
+    :param args: Its arguments.
+    :return: None
+    """
+    process = get_context("fork").Process(target=target, args=args)
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+
+def test_torn_log_tail_is_ignored_on_replay(data_file):
+    storage.update_rows(data_file, [[["2", "beta", "20"], ["2", "beta", "19"]]])
+    with open(storage.log_path(data_file), "ab") as log_writer:
+        log_writer.write(b"U;3;gamma;")  # Cut short by a crash
+
+    assert reload(data_file) == [
+        ["1", "alpha", "10"],
+        ["2", "beta", "19"],
+        ["3", "gamma", "30"],
+    ]
+
+
+def test_torn_log_tail_is_dropped_by_the_next_write(data_file):
+    storage.get_table(data_file)
+    with open(storage.log_path(data_file), "ab") as log_writer:
+        log_writer.write(b"D;1")  # Cut short by a crash
+    storage.update_rows(data_file, [[["3", "gamma", "30"], ["3", "gamma", "29"]]])
+
+    with open(storage.log_path(data_file), "rb") as log_reader:
+        assert log_reader.read() == b"U;3;3;gamma;29\n"
+    assert reload(data_file)[0] == ["1", "alpha", "10"]
+
+
+def test_torn_row_is_dropped_before_appending(data_file):
+    storage.get_table(data_file)
+    with open(data_file, "ab") as file_writer:
+        file_writer.write(b"4;del")  # Cut short by a crash
+    assert reload(data_file)[-1] == ["3", "gamma", "30"]
+
+    storage.append_numbered_rows(data_file, [["delta", "40"]])
+
+    assert reload(data_file)[-2:] == [["3", "gamma", "30"], ["4", "delta", "40"]]
+
+
+def compact_with_changes(filename: str) -> None:
+    """Change a file, compact it and change it again, as another process."""
+    storage.update_rows(filename, [[["1", "alpha", "10"], ["1", "alpha", "9"]]])
+    storage.delete_rows(filename, ["2"])
+    storage.compact(filename)
+    storage.append_numbered_rows(filename, [["delta", "40"]])
+
+
+def test_table_catches_up_with_compaction_in_another_process(data_file):
+    table = storage.get_table(data_file)
+    storage.update_rows(data_file, [[["3", "gamma", "30"], ["3", "gamma", "29"]]])
+
+    run_in_process(compact_with_changes, data_file)
+
+    assert storage.get_table(data_file) is table
+    assert list(table.records()) == reload(data_file)
+    assert list(table.records()) == [
+        ["1", "alpha", "9"],
+        ["3", "gamma", "29"],
+        ["4", "delta", "40"],
+    ]
+    assert table.find(0, "2") is None
+
+
+def test_write_after_compaction_in_another_process_is_kept(data_file):
+    storage.get_table(data_file)
+
+    run_in_process(compact_with_changes, data_file)
+    storage.update_rows(data_file, [[["3", "gamma", "30"], ["3", "gamma", "29"]]])
+    storage.append_numbered_rows(data_file, [["epsilon", "50"]])
+
+    assert reload(data_file) == [
+        ["1", "alpha", "9"],
+        ["3", "gamma", "29"],
+        ["4", "delta", "40"],
+        ["5", "epsilon", "50"],
+    ]
+
+
+def test_deleted_highest_id_is_not_reused_after_compaction(data_file):
+    storage.delete_rows(data_file, ["3"])
+    storage.compact(data_file)
+    storage.invalidate(data_file)
+
+    (record,) = storage.append_numbered_rows(data_file, [["delta", "40"]])
+
+    assert record[0] == "4"
+
+
+def write_journal(filename: str, operations: list) -> str:
+    """
+    Write the journal of a batch as a crash would leave it behind.
+
+    :param filename: A file changed by the batch.
+    :param operations: list
+    :return: The path of the journal.
+    """
+    journal = os.path.join(os.path.dirname(filename), storage.BATCH_JOURNAL)
+    lines = "".join(storage.join_row(entry) for entry in operations)
+    storage.atomic_write(journal, lines.encode("utf-8"))
+    return journal
+
+
+def test_replaying_a_journal_twice_changes_nothing_more(data_file):
+    operations = [
+        [storage.LOG_APPEND, data_file, "4", "delta", "40"],
+        [storage.LOG_UPDATE, data_file, "1", "1", "alpha", "9"],
+        [storage.LOG_DELETE, data_file, "2"],
+    ]
+    expected = [["1", "alpha", "9"], ["3", "gamma", "30"], ["4", "delta", "40"]]
+
+    journal = write_journal(data_file, operations)
+    storage.recover_batch(journal)
+    assert not os.path.exists(journal)
+    assert reload(data_file) == expected
+
+    write_journal(data_file, operations)
+    storage.recover_batch(journal)
+    assert reload(data_file) == expected
+
+
+def test_journal_cut_short_is_completed_by_the_next_batch(data_file):
+    operations = [
+        [storage.LOG_APPEND, data_file, "4", "delta", "40"],
+        [storage.LOG_DELETE, data_file, "2"],
+    ]
+    write_journal(data_file, operations)
+    storage.apply_operations(operations[:1])  # The crash came after the append
+
+    with storage.batch([data_file]) as changes:
+        changes.update(data_file, {"3": ["3", "gamma", "29"]})
+
+    assert reload(data_file) == [
+        ["1", "alpha", "10"],
+        ["3", "gamma", "29"],
+        ["4", "delta", "40"],
+    ]
+
+
+def test_pages_hold_page_size_records(data_file):
+    assert storage.read_page(data_file, 0, 2) == (
+        [["1", "alpha", "10"], ["2", "beta", "20"]],
+        2,
+    )
+    assert storage.read_page(data_file, 1, 2) == ([["3", "gamma", "30"]], 2)
+
+
+@pytest.mark.parametrize("page_size", [0, -1])
+def test_page_size_below_one_is_rejected(data_file, page_size):
+    with pytest.raises(ValueError):
+        storage.read_page(data_file, 0, page_size)